@@ -0,0 +1,3 @@
+"""@defgroup benchmarks benchmarks
+Performance benchmarks for the hot paths of vigilance, run with `python -m benchmarks`.
+"""
@@ -0,0 +1,189 @@
+"""@ingroup benchmarks
+@file
+Runs the vigilance benchmarks and compares them against the stored baselines.
+Usage: python -m benchmarks [--update] [--tolerance FRACTION] [NAME ...]
+"""
+from __future__ import print_function
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import timeit
+
+from benchmarks import generators
+from vigilance import cli
+from vigilance.cache import ConfigurationCache
+from vigilance.error import QualityViolationsDetected
+from vigilance.plugin import get_configured_plugins, load_suites
+from vigilance.representation import QualityReport
+from vigilance.suite import QualitySuite
+
+## The file that baseline timings are stored in, relative to this package.
+BaselineFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+## The dimensions of the synthetic Cobertura report used by the benchmarks.
+ReportSize = {'packages': 20, 'classes': 25, 'lines': 100}
+## The number of each kind of stanza in the synthetic configuration used by the benchmarks.
+ConfigurationSize = {'files': 200, 'packages': 40, 'ignores': 50}
+
+class Fixture(object):
+    """The inputs shared by all benchmarks, generated once per run.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.report = generators.cobertura_report(**ReportSize)
+        self.reportPath = self.write('coverage.xml', self.report)
+        self.doxygenLog = generators.doxygen_log(files=200, warnings=50000)
+        configuration = generators.configuration(self.reportPath, reportPackages=ReportSize['packages'],
+                                                 reportClasses=ReportSize['classes'], **ConfigurationSize)
+        self.configPath = self.write('vigilance.yaml', configuration.encode('utf-8'))
+        self.configuration = configuration
+        load_suites(get_configured_plugins())
+        self.cobertura = QualitySuite.get_suite('cobertura')
+        self.doxygen = QualitySuite.get_suite('doxygen')
+        self.constraints = cli.load_configuration(configuration)['cobertura']['constraints']
+        self.items = self.cobertura.reportParser.parse(self.report).items
+
+    def write(self, name, contents):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as output:
+            output.write(contents)
+        return path
+
+def bench_cobertura_parse(fixture):
+    """CoberturaParser.parse of a report with 50k lines."""
+    return lambda: fixture.cobertura.reportParser.parse(fixture.report)
+
+def bench_doxygen_parse(fixture):
+    """DoxygenParser.parse of a log with 50k warnings."""
+    return lambda: fixture.doxygen.reportParser.parse(fixture.doxygenLog)
+
+def bench_constraints_for(fixture):
+    """ConstraintSet.constraints_for of every item under 290 file/package/ignore overrides."""
+    constraintsFor = fixture.constraints.constraints_for
+    return lambda: [constraintsFor(item) for item in fixture.items]
+
+def bench_scrutinize(fixture):
+    """QualityReport.scrutinize of every item under 290 file/package/ignore overrides."""
+    return lambda: QualityReport(fixture.items).scrutinize(fixture.constraints)
+
+def bench_cached_configuration(fixture):
+    """cli.load_configuration of the 290 stanza configuration from a ConfigurationCache entry, as in a new process."""
+    cache = ConfigurationCache(os.path.join(fixture.directory, 'cache'))
+    cli.load_configuration(fixture.configuration, cache)
+    def run():
+        re.purge()
+        return cli.load_configuration(fixture.configuration, cache)
+    return run
+
+def bench_cli_main(fixture):
+    """cli.main end to end without the cache, including plugin registration and configuration loading."""
+    def run():
+        with open(fixture.configPath) as configFile, _silenced():
+            try:
+                cli.main.main(['--config', configFile.name, '--no-cache'], standalone_mode=False)
+            except QualityViolationsDetected:
+                pass
+    return run
+
+## All benchmarks in the order that they are run.
+Benchmarks = [('cobertura_parse', bench_cobertura_parse),
+              ('doxygen_parse', bench_doxygen_parse),
+              ('constraints_for', bench_constraints_for),
+              ('scrutinize', bench_scrutinize),
+              ('cached_configuration', bench_cached_configuration),
+              ('cli_main', bench_cli_main)]
+
+@contextlib.contextmanager
+def _silenced():
+    stdout = sys.stdout
+    sys.stdout = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+def measure(function, repeat=5, minimumTime=0.2):
+    """Measures the duration of a function call.
+    The function is called in batches large enough to take at least minimumTime seconds, and the fastest batch wins.
+    @param function The function to measure.
+    @param repeat The number of batches.
+    @param minimumTime The minimum duration of a batch in seconds.
+    @returns The duration of a single call in seconds.
+    """
+    timer = timeit.Timer(function)
+    number, duration = timer.autorange() if hasattr(timer, 'autorange') else (1, timer.timeit(1))
+    while duration < minimumTime:
+        number *= 2
+        duration = timer.timeit(number)
+    return min(timer.repeat(repeat, number)) / number
+
+def load_baselines(path=BaselineFile):
+    """Loads the stored baseline timings.
+    @param path The path of the baseline file.
+    @returns A dictionary mapping benchmark names to durations in seconds.
+    """
+    try:
+        with open(path) as baselineFile:
+            return json.load(baselineFile)
+    except (IOError, ValueError):
+        return {}
+
+def save_baselines(baselines, path=BaselineFile):
+    """Stores baseline timings.
+    @param baselines A dictionary mapping benchmark names to durations in seconds.
+    @param path The path of the baseline file.
+    """
+    with open(path, 'w') as baselineFile:
+        json.dump(baselines, baselineFile, indent=2, sort_keys=True)
+        baselineFile.write('\n')
+
+def main(arguments=None):
+    """Runs the benchmarks and reports their durations relative to the baselines.
+    @param arguments The command line arguments, excluding the program name; defaults to sys.argv.
+    @returns The exit code: 1 if any benchmark regressed beyond the tolerance, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[2])
+    parser.add_argument('names', nargs='*', help='The benchmarks to run; defaults to all of them')
+    parser.add_argument('--update', action='store_true', help='Store the measured durations as the new baselines')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='The fraction by which a benchmark may exceed its baseline before it counts as a regression')
+    parser.add_argument('--repeat', type=int, default=5, help='The number of measurements of each benchmark')
+    options = parser.parse_args(arguments)
+    unknown = set(options.names) - set(name for name, _ in Benchmarks)
+    if unknown:
+        parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+    baselines = load_baselines()
+    regressions = []
+    directory = tempfile.mkdtemp()
+    try:
+        fixture = Fixture(directory)
+        print('{:<20} {:>12} {:>12} {:>8}'.format('benchmark', 'time (ms)', 'baseline', 'ratio'))
+        for name, benchmark in Benchmarks:
+            if options.names and name not in options.names:
+                continue
+            duration = measure(benchmark(fixture), options.repeat)
+            baseline = baselines.get(name)
+            ratio = duration / baseline if baseline else None
+            print('{:<20} {:>12.2f} {:>12} {:>8}'.format(name, duration * 1000, '{:.2f}'.format(baseline * 1000) if baseline else '-',
+                                                         '{:.2f}x'.format(ratio) if ratio else '-'))
+            if ratio is not None and ratio > 1 + options.tolerance:
+                regressions.append(name)
+            if options.update:
+                baselines[name] = round(duration, 6)
+    finally:
+        shutil.rmtree(directory)
+    if options.update:
+        save_baselines(baselines)
+    elif regressions:
+        print('Regressed beyond {:.0%} of the baseline: {}'.format(options.tolerance, ', '.join(regressions)))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""@ingroup benchmarks
+@file
+Contains generators for synthetic quality reports and configurations of arbitrary size.
+All generators are deterministic for a given seed, so that benchmark inputs are identical between runs.
+"""
+import random
+
+import yaml
+
+def package_name(package):
+    """Names a synthetic package.
+    Packages are nested two levels deep so that package names share dotted prefixes, as in real code bases.
+    @param package The index of the package.
+    @returns The dotted name of the package.
+    """
+    return 'lib{}.pkg{}'.format(package % 3, package)
+
+def file_path(package, cls):
+    """Names the source file of a synthetic class.
+    @param package The index of the package containing the class.
+    @param cls The index of the class within its package.
+    @returns The path of the file.
+    """
+    return '{}/module{}.py'.format(package_name(package).replace('.', '/'), cls)
+
+def _rate(covered, total):
+    return '{:.4f}'.format(float(covered) / total if total else 1.0)
+
+def cobertura_report(packages=10, classes=10, lines=100, branchEvery=5, coverage=0.9, seed=0): #pylint: disable=too-many-arguments, too-many-locals
+    """Generates a Cobertura coverage report.
+    The line and branch rates of each class and package are consistent with its lines.
+    @param packages The number of packages in the report.
+    @param classes The number of classes in each package.
+    @param lines The number of lines in each class.
+    @param branchEvery Every n-th line of a class is a branch with two conditions.
+    @param coverage The probability that a line or branch condition is covered.
+    @param seed The seed of the random number generator.
+    @returns The report as bytes.
+    """
+    generator = random.Random(seed)
+    parts = ['<?xml version="1.0" ?>\n<coverage line-rate="0" branch-rate="0" version="4.5"><packages>\n']
+    for package in range(packages):
+        classParts = []
+        packageCounts = [0, 0, 0, 0]
+        for cls in range(classes):
+            lineParts = []
+            counts = [0, 0, 0, 0]
+            for number in range(1, lines + 1):
+                hit = generator.random() < coverage
+                counts[0] += 1
+                counts[1] += hit
+                if branchEvery and number % branchEvery == 0:
+                    covered = sum(generator.random() < coverage for _ in range(2)) if hit else 0
+                    counts[2] += 2
+                    counts[3] += covered
+                    lineParts.append('<line number="{}" hits="{}" branch="true" condition-coverage="{}% ({}/2)"/>'.format(
+                        number, int(hit), covered * 50, covered))
+                else:
+                    lineParts.append('<line number="{}" hits="{}"/>'.format(number, int(hit)))
+            packageCounts = [total + count for total, count in zip(packageCounts, counts)]
+            classParts.append('<class name="module{}" filename="{}" line-rate="{}" branch-rate="{}" complexity="{}">'
+                              '<methods/><lines>{}</lines></class>\n'.format(cls, file_path(package, cls), _rate(counts[1], counts[0]),
+                                                                            _rate(counts[3], counts[2]), generator.randint(0, 10),
+                                                                            ''.join(lineParts)))
+        parts.append('<package name="{}" line-rate="{}" branch-rate="{}" complexity="0"><classes>\n'.format(
+            package_name(package), _rate(packageCounts[1], packageCounts[0]), _rate(packageCounts[3], packageCounts[2])))
+        parts.extend(classParts)
+        parts.append('</classes></package>\n')
+    parts.append('</packages></coverage>\n')
+    return ''.join(parts).encode('utf-8')
+
+## Templates of the doxygen warnings generated by doxygen_log; {0} is a running number.
+DoxygenWarnings = ['Member m{0}() (function) of class C{0} is not documented.',
+                   'Compound C{0} is not documented.',
+                   'The following parameters of f{0}(int a) are not documented:\n  parameter \'a\'',
+                   'return type of member g{0} is not documented',
+                   'argument \'b{0}\' of command @param is not found in the argument list of h{0}(int a)',
+                   'Found unknown command \'\\x{0}\'']
+
+def doxygen_log(files=100, warnings=10000, seed=0):
+    """Generates a doxygen warning log in the default WARN_FORMAT.
+    @param files The number of distinct files that warnings are reported for.
+    @param warnings The number of warnings in the log. Some warnings are followed by indented continuation lines.
+    @param seed The seed of the random number generator.
+    @returns The log as bytes.
+    """
+    generator = random.Random(seed)
+    lines = []
+    for number in range(warnings):
+        message = generator.choice(DoxygenWarnings).format(number)
+        lines.append('/src/include/file{}.h:{}: warning: {}\n'.format(generator.randrange(files), number, message))
+    return ''.join(lines).encode('utf-8')
+
+def configuration(report='coverage.xml', files=0, packages=0, ignores=0, reportPackages=10, reportClasses=10): #pylint: disable=too-many-arguments
+    """Generates a vigilance configuration for the cobertura suite with many file, package and ignore stanzas.
+    Stanzas refer to the packages and files of a report generated by cobertura_report with the given dimensions.
+    @param report The path of the coverage report.
+    @param files The number of file stanzas.
+    @param packages The number of package stanzas.
+    @param ignores The number of paths in the ignore stanza, if any.
+    @param reportPackages The number of packages in the report.
+    @param reportClasses The number of classes in each package of the report.
+    @returns The configuration as a YAML string.
+    """
+    constraints = [{'type': 'global', 'line': 80, 'branch': 70, 'complexity': 8}]
+    totalFiles = reportPackages * reportClasses
+    for index in range(files):
+        position = (index * 7) % totalFiles
+        constraints.append({'type': 'file', 'path': file_path(position // reportClasses, position % reportClasses).replace('.', r'\.') + '$',
+                            'line': 70 + index % 20})
+    for index in range(packages):
+        constraints.append({'type': 'package', 'name': package_name(index % reportPackages), 'branch': 50 + index % 40})
+    if ignores:
+        constraints.append({'type': 'ignore', 'paths': [file_path(index % reportPackages, (index * 3) % reportClasses) for index in range(ignores)]})
+    return yaml.safe_dump({'suites': {'cobertura': {'report': report, 'constraints': constraints}}}, default_flow_style=False)
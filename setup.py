@@ -45,7 +45,7 @@ def get_tagged_version():
 if __name__ == '__main__':
     thirdPartyPackages = open('required_packages.req').read().splitlines()
     testPackages = open('test_required_packages.req').read().splitlines()
-    consoleScripts = ['vigilance = vigilance.cli:main']
+    consoleScripts = ['vigilance = vigilance.cli:cli', 'vigilance-query = vigilance.client:main']
 
     setup(name='vigilance',
           version=get_tagged_version(),
@@ -0,0 +1,142 @@
+#pylint: skip-file
+import os
+import re
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+import mock
+
+from util import VigilanceTestCase
+
+class FakeParser(object):
+    pass
+
+class ReportCacheTest(VigilanceTestCase):
+    def setUp(self):
+        super(ReportCacheTest, self).setUp()
+        from vigilance.cache import ReportCache
+        from vigilance.representation import QualityReport
+        self.directory = tempfile.mkdtemp()
+        self.cache = ReportCache(os.path.join(self.directory, 'cache'))
+        self.report = QualityReport(['one', 'two'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(ReportCacheTest, self).tearDown()
+
+    def test_key_should_depend_on_report_contents(self):
+        self.assertEqual(self.cache.key(FakeParser(), b'abc'), self.cache.key(FakeParser(), BytesIO(b'abc')))
+        self.assertNotEqual(self.cache.key(FakeParser(), b'abc'), self.cache.key(FakeParser(), b'abd'))
+
+    def test_key_should_depend_on_parser_options(self):
+        self.assertNotEqual(self.cache.key(FakeParser(), b'abc'), self.cache.key(FakeParser(), b'abc', {'columnar': True}))
+
+    def test_key_with_multiple_reports_should_depend_on_each_report(self):
+        key = self.cache.key(FakeParser(), [b'ab', BytesIO(b'c')])
+        self.assertNotEqual(key, self.cache.key(FakeParser(), [b'a', b'bc']))
+        self.assertNotEqual(key, self.cache.key(FakeParser(), b'abc'))
+        self.assertEqual(key, self.cache.key(FakeParser(), [b'ab', b'c']))
+
+    def test_key_should_rewind_streams(self):
+        stream = BytesIO(b'abc')
+        self.cache.key(FakeParser(), stream)
+        self.assertEqual(b'abc', stream.read())
+
+    def test_load_without_entry_should_return_None(self):
+        self.assertIsNone(self.cache.load('missing'))
+
+    def test_store_should_round_trip_report(self):
+        self.cache.store('key', self.report)
+        self.assertEqual(['one', 'two'], self.cache.load('key').items)
+        self.assertEqual(['key.report'], os.listdir(self.cache.directory))
+
+    def test_load_with_corrupt_entry_should_discard_entry(self):
+        self.cache.store('key', self.report)
+        with open(os.path.join(self.cache.directory, 'key.report'), 'wb') as entry:
+            entry.write(b'garbage')
+        self.assertIsNone(self.cache.load('key'))
+        self.assertEqual([], os.listdir(self.cache.directory))
+
+    def test_store_should_evict_least_recently_used_entries(self):
+        self.cache.store('old', self.report)
+        self.cache.store('new', self.report)
+        entrySize = os.path.getsize(os.path.join(self.cache.directory, 'old.report'))
+        past = time.time() - 100
+        os.utime(os.path.join(self.cache.directory, 'new.report'), (past, past))
+        os.utime(os.path.join(self.cache.directory, 'old.report'), (past - 100, past - 100))
+        self.cache.load('old')
+        self.cache.maxSize = entrySize * 2
+        self.cache.store('newest', self.report)
+        self.assertEqual(['newest.report', 'old.report'], sorted(os.listdir(self.cache.directory)))
+
+    def test_stream_should_store_entry_once_items_are_consumed(self):
+        self.cache.BatchSize = 2
+        items = self.cache.stream('key', iter(['one', 'two', 'three']))
+        self.assertEqual('one', next(items))
+        self.assertFalse(os.path.exists(os.path.join(self.cache.directory, 'key.report')))
+        self.assertEqual(['two', 'three'], list(items))
+        self.assertEqual(['key.report'], os.listdir(self.cache.directory))
+        quality = self.cache.load('key')
+        self.assertEqual(['one', 'two', 'three'], list(quality.items))
+        quality.close()
+
+    def test_stream_stopped_early_should_discard_entry(self):
+        items = self.cache.stream('key', iter(['one', 'two']))
+        self.assertEqual('one', next(items))
+        items.close()
+        self.assertEqual([], os.listdir(self.cache.directory))
+        self.assertIsNone(self.cache.load('key'))
+
+    def test_stream_with_unpicklable_item_should_still_yield_items(self):
+        items = [lambda: None, 'two']
+        self.assertEqual(items, list(self.cache.stream('key', iter(items))))
+        self.assertEqual([], os.listdir(self.cache.directory))
+        self.log.warning.assert_called_once_with('Unable to write cache entry "%s"', mock.ANY)
+
+class ConfigurationCacheTest(VigilanceTestCase):
+    def setUp(self):
+        super(ConfigurationCacheTest, self).setUp()
+        from vigilance.cache import ConfigurationCache, ReportCache
+        self.directory = tempfile.mkdtemp()
+        self.cache = ConfigurationCache(self.directory)
+        self.reportCache = ReportCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(ConfigurationCacheTest, self).tearDown()
+
+    def test_key_should_depend_on_configuration_contents(self):
+        self.assertEqual(self.cache.key(u'suites: {}'), self.cache.key(b'suites: {}'))
+        self.assertNotEqual(self.cache.key('suites: {}'), self.cache.key('suites: []'))
+
+    def test_store_should_not_conflict_with_report_entries(self):
+        key = self.cache.key('suites: {}')
+        self.cache.store(key, ({}, {}))
+        self.assertEqual(({}, {}), self.cache.load(key))
+        self.assertIsNone(self.reportCache.load(key))
+
+    def test_load_should_compile_path_regexes_only_when_they_are_used(self):
+        from vigilance.configuration import ConfigurationParser
+        from vigilance.constraint import ConstraintSuite
+        from vigilance.default_suites.cobertura import FileUnderTest, LineCoverage
+        from vigilance.plugin.tooling import DefaultStanzas
+        constraintSuite = ConstraintSuite({'line': LineCoverage})
+        parser = ConfigurationParser({key: stanza(constraintSuite) for key, stanza in DefaultStanzas.items()}, constraintSuite)
+        stanzas = [{'type': 'global', 'line': 50}, {'type': 'file', 'path': '^src/.*/main', 'line': 70},
+                   {'type': 'file', 'path': 'legacy|old', 'line': 10}, {'type': 'file', 'path': '(?i)GENERATED', 'line': 0}]
+        key = self.cache.key('suites: {}')
+        self.cache.store(key, parser.parse(stanzas))
+        with mock.patch('re._compile', side_effect=re._compile) as compile:
+            constraints = self.cache.load(key)
+            compile.assert_not_called()
+            item = FileUnderTest('src/pkg/main.py', 60.0)
+            self.assertEqual(['Line coverage too low for file src/pkg/main.py (60.0/70)'],
+                             [constraint.satisfied_by(item).message for constraint in constraints.constraints_for(item)])
+            self.assertTrue(compile.called)
+
+    def test_cache_should_not_provide_report_api(self):
+        from vigilance.cache import ReportCache
+        self.assertFalse(isinstance(self.cache, ReportCache))
+        self.assertFalse(hasattr(self.cache, 'stream'))
@@ -1,11 +1,17 @@
 #pylint: skip-file
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
 import mock
+import yaml # The LibYAML bindings cannot be re-imported once the test case removes them from sys.modules
 from nose_parameterized import parameterized
 from six import StringIO
 
 from util import VigilanceTestCase, mock_decorator
 
-@mock.patch('yaml.full_load')
+@mock.patch('yaml.load')
 @mock.patch('vigilance.cli.open', create=True)
 class CliTest(VigilanceTestCase):
     @property
@@ -13,63 +19,298 @@ class CliTest(VigilanceTestCase):
         self.suite = mock.MagicMock()
         return {'click': mock.MagicMock(ClickException=Exception,
             command=mock_decorator,
-            option=mock_decorator),
+            option=mock_decorator,
+            argument=mock_decorator),
         'vigilance.suite': self.suite,
         'vigilance.plugin': mock.MagicMock()}
 
     def setUp(self):
         super(CliTest, self).setUp()
-        global ConfigurationParsingError, UnknownSuite, ReportParsingError, YAMLError, Invalid, main
-        from vigilance.error import ConfigurationParsingError, UnknownSuite, ReportParsingError
+        global ConfigurationParsingError, UnknownSuite, ReportParsingError, QualityViolationsDetected, YAMLError, Invalid, main
+        from vigilance.error import ConfigurationParsingError, UnknownSuite, ReportParsingError, QualityViolationsDetected
         from voluptuous.error import Invalid
         from yaml import YAMLError
         from vigilance.cli import main
+        patcher = mock.patch('vigilance.cli.ConfigurationCache')
+        self.configurationCache = patcher.start().return_value
+        self.configurationCache.load.return_value = None
+        self.addCleanup(patcher.stop)
 
     def test_main_raises_ConfigurationParsingError_on_load_YAMLError(self, mockOpen, mockYamlLoad):
         mockYamlLoad.side_effect = YAMLError('boom')
         with self.assertRaises(ConfigurationParsingError):
-            main('file')
+            main(StringIO('file'))
 
     def test_main_raises_ConfigurationParsingError_on_load_Invalid(self, mockOpen, mockYamlLoad):
         mockYamlLoad.side_effect = Invalid('boom')
         with self.assertRaises(ConfigurationParsingError):
-            main('file')
+            main(StringIO('file'))
 
     def test_main_raises_UnknownSuite_when_not_in_availble_suites(self, mockOpen, mockYamlLoad):
         mockYamlLoad.return_value = {'suites': {'test': {'report': 'test.txt', 'constraints': [{'type': 'bob'}]}}}
-        self.suite.available_suites.return_value = ['otherNonTest']
+        self.suite.QualitySuite.has_suite.side_effect = ['otherNonTest'].__contains__
         with self.assertRaises(UnknownSuite):
-            main('file')
+            main(StringIO('file'))
 
     def test_main_raises_ReportParsingError_on_IOError(self, mockOpen, mockYamlLoad):
         mockYamlLoad.return_value = {'suites': {'test': {'report': 'test.txt', 'constraints': [{'type': 'bob'}]}}}
-        self.suite.QualitySuite.available_suites.return_value = ['test']
-        self.suite.QualitySuite.get_suite.return_value = {}
+        self.suite.QualitySuite.has_suite.side_effect = ['test'].__contains__
         mockOpen.side_effect = IOError('boom')
         with self.assertRaises(ReportParsingError):
-            main('file')
+            main(StringIO('file'))
 
     def test_main_suite_runs_for_1_suite(self, mockOpen, mockYamlLoad):
         mockYamlLoad.return_value = {'suites': {'test': {'report': 'test.txt', 'constraints': [{'type': 'bob'}]}}}
-        self.suite.QualitySuite.available_suites.return_value = ['test']
-        mockOpen.return_value.__enter__.return_value = StringIO('reportTxt')
-        main('file')
-        self.suite.QualitySuite.get_suite.return_value.run.assert_called_once_with([{'type': 'bob'}], 'reportTxt')
+        self.suite.QualitySuite.has_suite.side_effect = ['test'].__contains__
+        report = StringIO('reportTxt')
+        mockOpen.return_value.__enter__.return_value = report
+        main(StringIO('file'))
+        mockOpen.assert_called_once_with('test.txt', 'rb')
+        suite = self.suite.QualitySuite.get_suite.return_value
+        suite.parse_constraints.assert_called_once_with([{'type': 'bob'}])
+        suite.run.assert_called_once_with(suite.parse_constraints.return_value, report, None, output=None, cache=mock.ANY, scope=None, limit=None, writer=mock.ANY, snapshot=None)
 
     def test_main_suite_runs_for_multiple_suite(self, mockOpen, mockYamlLoad):
         mockYamlLoad.return_value = {'suites':
                 {'test': {'report': 'test.txt', 'constraints': [{'type': 'bob'}]},
                  'otherTest': {'report': 'yay.txt', 'constraints': [{'type': 'other'}]},
                  'lastTest': {'report': 'last.txt', 'constraints': [{'type': 'last'}]}}}
-        self.suite.QualitySuite.available_suites.return_value = ['test', 'otherTest', 'lastTest']
-        mockFileContents = {'test.txt': 'testTxt', 'yay.txt': 'otherTxt', 'last.txt': 'lastTxt'}
+        self.suite.QualitySuite.has_suite.side_effect = ['test', 'otherTest', 'lastTest'].__contains__
+        mockFiles = {'test.txt': StringIO('testTxt'), 'yay.txt': StringIO('otherTxt'), 'last.txt': StringIO('lastTxt')}
         def mockFileOpen(filename, *_):
             openMock = mock.MagicMock()
-            openMock.__enter__.return_value = StringIO(mockFileContents[filename])
+            openMock.__enter__.return_value = mockFiles[filename]
             return openMock
         mockOpen.side_effect = mockFileOpen
-        main('file')
-        self.assertEqual(self.suite.QualitySuite.get_suite.return_value.run.call_count, 3)
-        self.suite.QualitySuite.get_suite.return_value.run.assert_any_call([{'type': 'bob'}], 'testTxt')
-        self.suite.QualitySuite.get_suite.return_value.run.assert_any_call([{'type': 'other'}], 'otherTxt')
-        self.suite.QualitySuite.get_suite.return_value.run.assert_any_call([{'type': 'last'}], 'lastTxt')
+        main(StringIO('file'))
+        suite = self.suite.QualitySuite.get_suite.return_value
+        self.assertEqual(suite.run.call_count, 3)
+        suite.parse_constraints.assert_any_call([{'type': 'bob'}])
+        suite.run.assert_any_call(suite.parse_constraints.return_value, mockFiles['test.txt'], None, output=None, cache=mock.ANY, scope=None, limit=None, writer=mock.ANY, snapshot=None)
+        suite.parse_constraints.assert_any_call([{'type': 'other'}])
+        suite.run.assert_any_call(suite.parse_constraints.return_value, mockFiles['yay.txt'], None, output=None, cache=mock.ANY, scope=None, limit=None, writer=mock.ANY, snapshot=None)
+        suite.parse_constraints.assert_any_call([{'type': 'last'}])
+        suite.run.assert_any_call(suite.parse_constraints.return_value, mockFiles['last.txt'], None, output=None, cache=mock.ANY, scope=None, limit=None, writer=mock.ANY, snapshot=None)
+
+    def test_main_should_memory_map_regular_report_files(self, mockOpen, mockYamlLoad):
+        mockYamlLoad.return_value = {'suites': {'test': {'report': 'test.txt', 'constraints': [{'type': 'bob'}]}}}
+        self.suite.QualitySuite.has_suite.side_effect = ['test'].__contains__
+        with mock.patch('mmap.mmap') as mockMmap:
+            main(StringIO('file'))
+        run = self.suite.QualitySuite.get_suite.return_value.run
+        run.assert_called_once_with(self.suite.QualitySuite.get_suite.return_value.parse_constraints.return_value, mockMmap.return_value, None, output=None, cache=mock.ANY, scope=None, limit=None, writer=mock.ANY, snapshot=None)
+        mockMmap.return_value.close.assert_called_once_with()
+
+    def test_main_with_report_list_should_run_suite_on_all_reports(self, mockOpen, mockYamlLoad):
+        mockYamlLoad.return_value = {'suites': {'test': {'report': ['one.xml', 'two.xml'], 'constraints': [{'type': 'bob'}]}}}
+        self.suite.QualitySuite.has_suite.side_effect = ['test'].__contains__
+        with mock.patch('mmap.mmap') as mockMmap:
+            main(StringIO('file'))
+        run = self.suite.QualitySuite.get_suite.return_value.run
+        run.assert_called_once_with(mock.ANY, [mockOpen.return_value, mockOpen.return_value], None, output=None, cache=mock.ANY, scope=None, limit=None, writer=mock.ANY, snapshot=None)
+        self.assertEqual(2, mockOpen.return_value.close.call_count)
+        mockMmap.assert_not_called()
+        mockOpen.assert_any_call('one.xml', 'rb')
+        mockOpen.assert_any_call('two.xml', 'rb')
+
+    def configure_failing_suites(self, mockYamlLoad, mockOpen, failures):
+        mockYamlLoad.return_value = {'suites': OrderedDict((name, {'report': name, 'constraints': []}) for name in ['one', 'two', 'three'])}
+        self.suite.QualitySuite.has_suite.side_effect = ['one', 'two', 'three'].__contains__
+        mockOpen.return_value.__enter__.return_value = StringIO('report')
+        suites = {name: mock.MagicMock() for name in ['one', 'two', 'three']}
+        for name, failure in failures.items():
+            suites[name].run.side_effect = failure
+        self.suite.QualitySuite.get_suite.side_effect = lambda name: suites[name]
+        return suites
+
+    def test_main_should_run_every_suite_when_one_fails(self, mockOpen, mockYamlLoad):
+        suites = self.configure_failing_suites(mockYamlLoad, mockOpen, {'one': QualityViolationsDetected('bad')})
+        with self.assertRaises(QualityViolationsDetected):
+            main(StringIO('file'))
+        for suite in suites.values():
+            self.assertEqual(1, suite.run.call_count)
+
+    def test_main_should_prefer_errors_over_quality_violations(self, mockOpen, mockYamlLoad):
+        self.configure_failing_suites(mockYamlLoad, mockOpen, {'one': QualityViolationsDetected('bad'), 'three': ReportParsingError('worse')})
+        with self.assertRaises(ReportParsingError):
+            main(StringIO('file'))
+
+    def test_main_should_aggregate_quality_violations_from_multiple_suites(self, mockOpen, mockYamlLoad):
+        self.configure_failing_suites(mockYamlLoad, mockOpen, {'one': QualityViolationsDetected('bad'), 'two': QualityViolationsDetected('bad')})
+        with self.assertRaises(QualityViolationsDetected) as context:
+            main(StringIO('file'))
+        self.assertIn('one, two', str(context.exception))
+
+    def test_main_with_multiple_jobs_should_write_suite_output_in_configuration_order(self, mockOpen, mockYamlLoad):
+        suites = self.configure_failing_suites(mockYamlLoad, mockOpen, {})
+        def run(name):
+            def fake_run(*_, **kwargs):
+                kwargs['output'].write(name + '\n')
+            return fake_run
+        for name, suite in suites.items():
+            suite.run.side_effect = run(name)
+        with mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            main(StringIO('file'), jobs=3)
+        self.assertEqual('one\ntwo\nthree\n', stdout.getvalue())
+
+    def test_main_with_changed_files_should_scope_suites(self, mockOpen, mockYamlLoad):
+        mockYamlLoad.return_value = {'suites': {'test': {'report': 'test.txt', 'constraints': [{'type': 'bob'}]}}}
+        self.suite.QualitySuite.has_suite.side_effect = ['test'].__contains__
+        main(StringIO('file'), changedFiles=StringIO('a.py\nb/c.py\n'))
+        scope = self.suite.QualitySuite.get_suite.return_value.run.call_args[1]['scope']
+        self.assertEqual(frozenset(['a.py', 'b/c.py']), scope.paths)
+
+    def test_main_with_cached_configuration_should_not_parse_configuration(self, mockOpen, mockYamlLoad):
+        suite = self.suite.QualitySuite.get_suite.return_value
+        self.suite.QualitySuite.has_suite.return_value = True
+        self.configurationCache.load.return_value = ({'test': suite.version.return_value},
+                                                     {'test': {'report': 'test.txt', 'constraints': 'compiled'}})
+        main(StringIO('file'))
+        mockYamlLoad.assert_not_called()
+        suite.run.assert_called_once_with('compiled', mock.ANY, None, output=None, cache=mock.ANY, scope=None, limit=None, writer=mock.ANY, snapshot=None)
+
+    def test_main_with_outdated_cached_configuration_should_parse_and_store_configuration(self, mockOpen, mockYamlLoad):
+        mockYamlLoad.return_value = {'suites': {'test': {'report': 'test.txt', 'constraints': [{'type': 'bob'}]}}}
+        suite = self.suite.QualitySuite.get_suite.return_value
+        self.suite.QualitySuite.has_suite.return_value = True
+        self.configurationCache.load.return_value = ({'test': 'old version'}, {})
+        main(StringIO('file'))
+        self.configurationCache.store.assert_called_once_with(
+            self.configurationCache.key.return_value,
+            ({'test': suite.version.return_value},
+             {'test': {'report': 'test.txt', 'constraints': suite.parse_constraints.return_value}}))
+
+    def test_main_with_fail_fast_should_not_run_suites_after_a_failure(self, mockOpen, mockYamlLoad):
+        suites = self.configure_failing_suites(mockYamlLoad, mockOpen, {'two': QualityViolationsDetected('bad')})
+        with self.assertRaises(QualityViolationsDetected):
+            main(StringIO('file'), failFast=True)
+        self.assertEqual(1, suites['one'].run.call_count)
+        self.assertEqual(0, suites['three'].run.call_count)
+        self.assertEqual(1, suites['two'].run.call_args[1]['limit'])
+
+    def test_main_with_max_violations_should_limit_suites(self, mockOpen, mockYamlLoad):
+        suites = self.configure_failing_suites(mockYamlLoad, mockOpen, {})
+        main(StringIO('file'), maxViolations=5)
+        for suite in suites.values():
+            self.assertEqual(5, suite.run.call_args[1]['limit'])
+
+class CliRunTest(VigilanceTestCase):
+    def setUp(self):
+        super(CliRunTest, self).setUp()
+        global cli
+        from click.testing import CliRunner
+        from vigilance.cli import cli
+        mock.patch('vigilance.plugin._iter_entry_points', return_value=[]).start()
+        self.addCleanup(mock.patch.stopall)
+        self.runner = CliRunner()
+        self.directory = tempfile.mkdtemp()
+        self.reportPath = self.path('coverage.xml')
+        with open(self.reportPath, 'wb') as reportFile:
+            reportFile.write(b'<coverage><packages><package name="pkg" line-rate="0.5"><classes>'
+                             b'<class filename="pkg/a.py" line-rate="0.5"/></classes></package></packages></coverage>')
+        self.configPath = self.path('vigilance.yaml')
+        self.configure(self.reportPath)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(CliRunTest, self).tearDown()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def configure(self, reportPath):
+        with open(self.configPath, 'w') as configFile:
+            configFile.write('suites:\n  cobertura:\n    report: {}\n    constraints:\n      - type: global\n        line: 40\n'.format(reportPath))
+
+    def invoke(self, *arguments):
+        return self.runner.invoke(cli, ['--config', self.configPath, '--no-cache'] + list(arguments))
+
+    def test_main_should_run_repeatedly_within_one_process(self):
+        for _ in range(2):
+            result = self.invoke()
+            self.assertEqual(0, result.exit_code, result.output)
+
+    def test_main_with_truncated_columnar_report_should_report_parsing_error(self):
+        result = self.runner.invoke(cli, ['convert', self.reportPath, '-o', self.path('coverage.vcol')])
+        self.assertEqual(0, result.exit_code, result.output)
+        with open(self.path('coverage.vcol'), 'rb') as columnar, open(self.path('truncated.vcol'), 'wb') as truncated:
+            truncated.write(columnar.read()[:-1])
+        self.configure(self.path('truncated.vcol'))
+        result = self.invoke()
+        self.assertEqual(-2, result.exit_code, result.output)
+        self.assertIn('Truncated binary columnar report', result.output)
+
+    def test_main_with_unwritable_output_should_report_output_error(self):
+        result = self.invoke('--output', self.path(os.path.join('missing', 'results.txt')))
+        self.assertEqual(-6, result.exit_code, result.output)
+        self.assertIn('Unable to write results to', result.output)
+
+class ExpandReportsTest(VigilanceTestCase):
+    def setUp(self):
+        super(ExpandReportsTest, self).setUp()
+        global expand_reports
+        from vigilance.cli import expand_reports
+        self.directory = tempfile.mkdtemp()
+        for name in ['b.xml', 'a.xml', 'c.txt']:
+            open(os.path.join(self.directory, name), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(ExpandReportsTest, self).tearDown()
+
+    def test_expand_reports_should_expand_globs_in_order(self):
+        self.assertEqual([os.path.join(self.directory, 'a.xml'), os.path.join(self.directory, 'b.xml'), os.path.join(self.directory, 'c.txt')],
+                         expand_reports([os.path.join(self.directory, '*.xml'), os.path.join(self.directory, 'c.txt')]))
+
+    def test_expand_reports_should_keep_unmatched_paths(self):
+        self.assertEqual(['missing.xml'], expand_reports('missing.xml'))
+
+class ConvertTest(VigilanceTestCase):
+    @property
+    def modulesToPatch(self):
+        self.suite = mock.MagicMock()
+        return {'click': mock.MagicMock(ClickException=Exception,
+            command=mock_decorator,
+            option=mock_decorator,
+            argument=mock_decorator),
+        'vigilance.suite': self.suite,
+        'vigilance.plugin': mock.MagicMock()}
+
+    def setUp(self):
+        super(ConvertTest, self).setUp()
+        global ReportParsingError, convert
+        from vigilance.error import ReportParsingError
+        from vigilance.cli import convert
+        self.directory = tempfile.mkdtemp()
+        self.reportPath = os.path.join(self.directory, 'coverage.xml')
+        self.outputPath = os.path.join(self.directory, 'coverage.vcol')
+        with open(self.reportPath, 'wb') as reportFile:
+            reportFile.write(b'<coverage/>')
+        self.parser = self.suite.QualitySuite.get_suite.return_value.reportParser
+        self.parser.convert.side_effect = lambda report, output, processes: output.write(bytes(report[:])) and 1
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(ConvertTest, self).tearDown()
+
+    def test_convert_should_write_converted_report(self):
+        convert([self.reportPath], self.outputPath)
+        self.suite.QualitySuite.get_suite.assert_called_once_with('cobertura')
+        with open(self.outputPath, 'rb') as output:
+            self.assertEqual(b'<coverage/>', output.read())
+        self.assertEqual(['coverage.vcol', 'coverage.xml'], sorted(os.listdir(self.directory)))
+
+    def test_convert_with_parsing_error_should_not_write_output(self):
+        self.parser.convert.side_effect = ReportParsingError('broken')
+        with self.assertRaises(ReportParsingError):
+            convert([self.reportPath], self.outputPath)
+        self.assertEqual(['coverage.xml'], os.listdir(self.directory))
+
+    def test_convert_with_missing_report_should_raise_ReportParsingError(self):
+        with self.assertRaises(ReportParsingError):
+            convert([os.path.join(self.directory, 'missing.xml')], self.outputPath)
+
+    def test_convert_with_suite_without_converter_should_raise_ReportParsingError(self):
+        del self.parser.convert
+        with self.assertRaises(ReportParsingError):
+            convert([self.reportPath], self.outputPath, 'doxygen')
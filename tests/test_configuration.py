@@ -13,7 +13,7 @@ class ConfigurationParserTest(VigilanceTestCase):
         from vigilance.constraint import ConstraintSuite
         self.mockSuite = mock.MagicMock(spec=ConstraintSuite, **{'group_constraints.side_effect': lambda c: c})
         self.globalMock = mock.MagicMock(spec=ConfigurationStanza)
-        self.filteredMock = mock.MagicMock(spec=ConfigurationStanza, **{'parse.return_value': ['asdf']})
+        self.filteredMock = mock.MagicMock(spec=ConfigurationStanza, Defaults=False, **{'parse.return_value': ['asdf']})
         self.parser = ConfigurationParser({'nicetype': self.filteredMock, 'global': self.globalMock}, self.mockSuite)
 
     def test_parse_with_unknown_stanza_type_should_skip_and_log_warning(self):
@@ -27,3 +27,10 @@ class ConfigurationParserTest(VigilanceTestCase):
         self.assertEqual(self.globalMock.parse.return_value, constraintSet.globalConstraints)
         self.assertEqual(['asdf'], constraintSet.filteredConstraints)
         self.log.warning.assert_called_once_with('Skipping duplicate global configuration stanza')
+
+    def test_parse_with_defaults_stanza_should_parse_as_global_constraints(self):
+        from vigilance.configuration import ConfigurationStanza
+        self.parser.stanzas['defaulttype'] = mock.MagicMock(spec=ConfigurationStanza, Defaults=True, **{'parse.return_value': ['default']})
+        constraintSet = self.parser.parse([{"type": "defaulttype"}, {"type": "nicetype"}])
+        self.assertEqual(['default'], constraintSet.globalConstraints)
+        self.assertEqual(['asdf'], constraintSet.filteredConstraints)
@@ -7,6 +7,7 @@ from nose_parameterized import parameterized
 from util import VigilanceTestCase
 
 FakePackage = namedtuple('FakePackage', ['name'])
+FakeFile = namedtuple('FakeFile', ['filePath'])
 
 class PackageConstraintTest(VigilanceTestCase):
     def setUp(self):
@@ -29,6 +30,9 @@ class PackageConstraintTest(VigilanceTestCase):
 
     @parameterized.expand([
         ('return True when name matches', 'vigilance', True),
+        ('return True when name matches case insensitively', 'Vigilance', True),
+        ('return True for sub-packages', 'vigilance.plugin', True),
+        ('return False when name only shares a prefix', 'vigilance2', False),
         ('return False when name mismatches', 'asdf', False),
         ('return False when no name', None, False)
     ])
@@ -39,6 +43,23 @@ class PackageConstraintTest(VigilanceTestCase):
             item.name = name
         self.assertEqual(expected, self.constraint.applies_to(item))
 
+    @parameterized.expand([
+        ('return True for files in the package', 'vigilance/cli.py', True),
+        ('return True for files in sub-packages', './vigilance/plugin/tooling.py', True),
+        ('return False for files outside the package', 'tests/vigilance/test.py', False),
+        ('return False for files named after the package', 'vigilance.py', False)
+    ])
+    def test_applies_to_files_should(self, _, filePath, expected):
+        self.assertEqual(expected, self.constraint.applies_to(FakeFile(filePath)))
+
+    def test_signature_should_describe_package_and_inner_constraint(self):
+        self.mockConstraint.signature.return_value = 'inner'
+        self.assertEqual("PackageConstraint('vigilance', inner)", self.constraint.signature())
+
+    def test_signature_without_inner_signature_should_return_None(self):
+        self.mockConstraint.signature.return_value = None
+        self.assertEqual(None, self.constraint.signature())
+
 class FileConstraintTest(VigilanceTestCase):
     def setUp(self):
         super(FileConstraintTest, self).setUp()
@@ -70,6 +91,30 @@ class FileConstraintTest(VigilanceTestCase):
             item.filePath = pathRegex
         self.assertEqual(expected, self.constraint.applies_to(item))
 
+class ConstraintSignatureTest(VigilanceTestCase):
+    def setUp(self):
+        super(ConstraintSignatureTest, self).setUp()
+        global Constraint
+        from vigilance.constraint import Constraint
+
+    def test_signature_should_describe_type_and_attributes(self):
+        class Threshold(Constraint):
+            def __init__(self, minimum):
+                self.minimum = minimum
+            def satisfied_by(self, item):
+                pass
+        self.assertEqual(Threshold(5).signature(), Threshold(5).signature())
+        self.assertNotEqual(Threshold(5).signature(), Threshold(6).signature())
+        self.assertTrue(Threshold(5).signature().endswith(".Threshold[('minimum', 5)]"))
+
+    def test_signature_of_aggregate_constraint_should_return_None(self):
+        class Aggregate(Constraint):
+            def satisfied_by(self, item):
+                pass
+            def reset(self):
+                pass
+        self.assertEqual(None, Aggregate().signature())
+
 class IgnoreFilesTest(VigilanceTestCase):
     def setUp(self):
         super(IgnoreFilesTest, self).setUp()
@@ -116,3 +161,215 @@ class ConstraintSuiteTest(VigilanceTestCase):
         constraints = [mock1, mock2]
         grouped = self.suite.group_constraints(constraints)
         self.assertEqual(grouped, {1: [mock1], 2: [mock2]})
+
+class PackageTrieTest(VigilanceTestCase):
+    def setUp(self):
+        super(PackageTrieTest, self).setUp()
+        from vigilance.constraint import PackageTrie
+        self.trie = PackageTrie()
+
+    def test_lookup_should_return_matching_packages_most_specific_first(self):
+        self.trie.insert(['a'], 0)
+        self.trie.insert(['a', 'b', 'c'], 1)
+        self.trie.insert(['a', 'b', 'c'], 2)
+        self.trie.insert(['a', 'x'], 3)
+        self.assertEqual([[1, 2], [0]], self.trie.lookup(['a', 'b', 'c', 'd']))
+        self.assertEqual([[0]], self.trie.lookup(['a', 'b']))
+        self.assertEqual([], self.trie.lookup(['b', 'a']))
+
+    def test_empty_trie_should_be_falsy(self):
+        self.assertFalse(self.trie)
+        self.trie.insert(['a'], 0)
+        self.assertTrue(self.trie)
+
+class PatternTreeTest(VigilanceTestCase):
+    def setUp(self):
+        super(PatternTreeTest, self).setUp()
+        from vigilance.constraint import PatternTree
+        self.patterns = [(re.compile(pattern), [index]) for index, pattern in enumerate(['legacy', r'^src/.*/test_', r'\.c$', 'old/'])]
+        self.tree = PatternTree(self.patterns)
+
+    def test_init_should_not_compile_combined_regexes(self):
+        self.assertIsNone(self.tree.children)
+
+    def test_search_should_only_build_nodes_that_it_reaches(self):
+        from vigilance.constraint import PatternTree
+        mock.patch.object(PatternTree, 'Branching', 2).start()
+        self.addCleanup(mock.patch.stopall)
+        positions = []
+        self.tree.search('src/pkg/test_a.py', positions)
+        self.assertEqual([1], positions)
+        left, right = self.tree.children
+        self.assertEqual([(), ()], [child.children for child in left.children])
+        self.assertEqual([None, None], [child.children for child in right.children])
+
+    def test_search_should_find_every_matching_regex(self):
+        for path in ['legacy/old/a.c', 'src/pkg/test_a.py', 'nothing.txt']:
+            positions = []
+            self.tree.search(path, positions)
+            self.assertEqual([position for regex, (position,) in self.patterns if regex.search(path)], sorted(positions), path)
+
+class PathLiteralsTest(VigilanceTestCase):
+    def setUp(self):
+        super(PathLiteralsTest, self).setUp()
+        global PathLiterals
+        from vigilance.constraint import PathLiterals
+
+    @parameterized.expand([
+        ('exact_path', r'^src/main\.py$', ('src/main.py', True, True)),
+        ('suffix', r'/generated\.py$', ('/generated.py', False, True)),
+        ('prefix', r'^vendor/', ('vendor/', True, False)),
+        ('escaped_dollar', r'^a\$', ('a$', True, False)),
+        ('unanchored_literal', r'legacy', None),
+        ('character_class', r'^src/\w+\.py$', None),
+        ('wildcard', r'^src/.*$', None),
+        ('inner_dollar', r'^a$b', None),
+    ])
+    def test_parse_should_recognize(self, _, pattern, expected):
+        self.assertEqual(expected, PathLiterals.parse(pattern))
+
+    def test_match_should_find_literals_like_their_regexes(self):
+        literals = PathLiterals()
+        patterns = [r'^a/b\.py$', r'b\.py$', r'^a/', r'^$', r'$']
+        for position, pattern in enumerate(patterns):
+            literals.add(*(PathLiterals.parse(pattern) + ([position],)))
+        for path in ['a/b.py', 'a/b.py\n', 'x/b.py', 'a/c.py', '', 'b.py']:
+            positions = []
+            literals.match(path, positions)
+            self.assertEqual([position for position, pattern in enumerate(patterns) if re.search(pattern, path)], sorted(positions), path)
+
+class ConstraintSetTest(VigilanceTestCase):
+    def setUp(self):
+        super(ConstraintSetTest, self).setUp()
+        global Constraint, FileConstraint, PackageConstraint, IgnoreFiles, ConstraintSet
+        from vigilance.constraint import Constraint, ConstraintSet, ConstraintSuite, FileConstraint, IgnoreFiles, PackageConstraint
+        class Low(Constraint):
+            def satisfied_by(self, item):
+                pass
+        class High(Constraint):
+            def satisfied_by(self, item):
+                pass
+        class OddOnly(Low):
+            def applies_to(self, item):
+                return getattr(item, 'filePath', '').endswith('odd.py')
+        self.Low, self.High, self.OddOnly = Low, High, OddOnly
+        self.suite = ConstraintSuite({'low': Low, 'high': High})
+        self.globalLow, self.globalHigh = Low(), High()
+
+    def make_set(self, filtered):
+        return ConstraintSet(self.suite, [self.globalLow, self.globalHigh], filtered)
+
+    def expected_constraints(self, constraintSet, item):
+        constraints = []
+        for ctype in self.suite.all_types():
+            filtered = [c for c in constraintSet.filteredConstraints[ctype] if c.applies_to(item)]
+            packages = [c for c in filtered if isinstance(c, PackageConstraint)]
+            deepest = max([len(c.segments) for c in packages] or [0])
+            constraints.extend([c for c in filtered if not isinstance(c, PackageConstraint)]
+                               or [c for c in packages if len(c.segments) == deepest]
+                               or constraintSet.globalConstraints[ctype])
+        return constraints
+
+    def test_constraints_for_with_no_filters_should_return_global_constraints(self):
+        constraintSet = self.make_set([])
+        item = mock.MagicMock(filePath='any/file.py')
+        self.assertEqual(set([self.globalLow, self.globalHigh]), set(constraintSet.constraints_for(item)))
+
+    def test_constraints_for_should_match_override_semantics(self):
+        filtered = [FileConstraint(self.Low(), re.compile(r'^src/.*\.py$')),
+                    FileConstraint(self.High(), re.compile('legacy')),
+                    FileConstraint(self.Low(), re.compile(r'(a)\1')),
+                    FileConstraint(self.High(), re.compile('(?i)GENERATED')),
+                    PackageConstraint(self.High(), 'Vigilance'),
+                    IgnoreFiles(['src/ignored.py', 'other.py']),
+                    self.OddOnly()]
+        constraintSet = self.make_set(filtered)
+        items = [FakeFile('src/main.py'), FakeFile('src/legacy/old.py'), FakeFile('aa.c'), FakeFile('lib/generated.c'),
+                 FakeFile('src/ignored.py'), FakeFile('other.py'), FakeFile('lib/odd.py'), FakeFile('nothing.txt'),
+                 FakePackage('vigilance'), FakePackage('VIGILANCE'), FakePackage('unrelated')]
+        for item in items:
+            self.assertEqual(self.expected_constraints(constraintSet, item), constraintSet.constraints_for(item), item)
+
+    def test_constraints_for_with_nested_packages_should_prefer_the_most_specific_package(self):
+        filtered = [PackageConstraint(self.Low(), 'a'),
+                    PackageConstraint(self.High(), 'a'),
+                    PackageConstraint(self.Low(), 'a.b'),
+                    PackageConstraint(self.Low(), 'a.b.c'),
+                    PackageConstraint(self.High(), 'a.b.c'),
+                    FileConstraint(self.High(), 'special'),
+                    PackageConstraint(self.Low(), 'x.y')]
+        constraintSet = self.make_set(filtered)
+        items = [FakePackage('a'), FakePackage('a.b'), FakePackage('a.b.c'), FakePackage('a.b.c.d'), FakePackage('a.bc'),
+                 FakePackage('x'), FakePackage('x.y.z'), FakeFile('a/b/file.py'), FakeFile('a/b/c/d/file.py'),
+                 FakeFile('a/b/special.py'), FakeFile('a.py'), FakeFile('x/y/file.py'), FakeFile('other/a/b/file.py')]
+        for item in items:
+            self.assertEqual(self.expected_constraints(constraintSet, item), constraintSet.constraints_for(item), item)
+        self.assertEqual(set([filtered[2], filtered[1]]), set(constraintSet.constraints_for(FakeFile('a/b/file.py'))))
+        self.assertEqual(set([filtered[2], filtered[5]]), set(constraintSet.constraints_for(FakeFile('a/b/special.py'))))
+        self.assertEqual(set([self.globalLow, self.globalHigh]), set(constraintSet.constraints_for(FakeFile('other/a/b/file.py'))))
+
+    def test_constraints_for_should_memoize_package_lookups_by_directory(self):
+        constraintSet = self.make_set([PackageConstraint(self.Low(), 'a.b')])
+        trie = type(constraintSet.index.packages)
+        with mock.patch.object(trie, 'lookup', autospec=True, side_effect=trie.lookup) as lookup:
+            for item in [FakeFile('a/b/one.py'), FakeFile('a/b/two.py'), FakePackage('a.b'), FakePackage('a.b'), FakeFile('a\\b/three.py')]:
+                self.assertEqual(self.expected_constraints(constraintSet, item), constraintSet.constraints_for(item), item)
+        self.assertEqual(3, lookup.call_count)
+
+    def test_constraints_for_name_should_match_constraints_for(self):
+        filtered = [PackageConstraint(self.Low(), 'a'),
+                    PackageConstraint(self.High(), 'a.b'),
+                    FileConstraint(self.Low(), 'special'),
+                    FileConstraint(self.High(), re.compile('(?i)GENERATED')),
+                    IgnoreFiles(['a/ignored.py'])]
+        constraintSet = self.make_set(filtered)
+        self.assertTrue(constraintSet.resolves_names())
+        for item in [FakeFile('a/b/file.py'), FakeFile('a/special.py'), FakeFile('A/Generated.py'), FakeFile('a/ignored.py'),
+                     FakeFile('other.py')]:
+            self.assertEqual(constraintSet.constraints_for(item), constraintSet.constraints_for_name(item.filePath), item)
+        for item in [FakePackage('a'), FakePackage('A.B.c'), FakePackage('b')]:
+            self.assertEqual(constraintSet.constraints_for(item), constraintSet.constraints_for_name(item.name, package=True), item)
+
+    def test_resolves_names_with_dynamic_constraints_should_be_false(self):
+        self.assertFalse(self.make_set([self.OddOnly()]).resolves_names())
+
+    def test_constraints_for_should_share_lists_between_items_with_the_same_constraints(self):
+        constraintSet = self.make_set([PackageConstraint(self.Low(), 'a'), FileConstraint(self.High(), 'special')])
+        self.assertIs(constraintSet.constraints_for(FakeFile('a/b/file.py')), constraintSet.constraints_for(FakeFile('a/other.py')))
+        self.assertIsNot(constraintSet.constraints_for(FakeFile('a/b/file.py')), constraintSet.constraints_for(FakeFile('a/special.py')))
+
+    def test_constraints_for_with_many_path_regexes_should_match_override_semantics(self):
+        patterns = [r'^src/main\.py$', r'main\.py$', r'^lib/', r'legacy', r'(?:old|new)/', r'\.c$', r'^src/.*/test_',
+                    r'GENERATED', r'x{', r'(a)\1', r'^$']
+        filtered = [FileConstraint(self.Low() if index % 2 else self.High(), pattern) for index, pattern in enumerate(patterns)]
+        constraintSet = self.make_set(filtered)
+        literals = constraintSet.index.literals
+        self.assertEqual(5, len(literals.exact) + len(literals.suffixes) + len(literals.prefixes))
+        items = [FakeFile(path) for path in ['src/main.py', 'other/main.py', 'lib/legacy/old/a.c', 'src/pkg/test_a.py',
+                                              'GENERATED.c', 'x{', 'aa', '', 'nothing.txt', 'src/main.py\n']]
+        for item in items:
+            self.assertEqual(self.expected_constraints(constraintSet, item), constraintSet.constraints_for(item), item)
+
+    def test_constraints_for_with_string_path_regexes_should_match_override_semantics(self):
+        constraintSet = self.make_set([FileConstraint(self.Low(), 'Thing.*'), FileConstraint(self.High(), 'one$')])
+        for item in [FakeFile('Thing one'), FakeFile('asdf')]:
+            self.assertEqual(self.expected_constraints(constraintSet, item), constraintSet.constraints_for(item))
+
+    def test_reset_should_reset_global_and_filtered_constraints(self):
+        self.globalLow.reset = mock.MagicMock()
+        filtered = self.High()
+        filtered.reset = mock.MagicMock()
+        self.make_set([FileConstraint(filtered, 'legacy')]).reset()
+        self.globalLow.reset.assert_called_once_with()
+        filtered.reset.assert_called_once_with()
+
+    def test_constraints_for_with_single_ignore_path_should_ignore_only_that_path(self):
+        constraintSet = self.make_set([IgnoreFiles('src/setup.py')])
+        for item in [FakeFile('src/setup.py'), FakeFile('setup.py'), FakeFile('s')]:
+            self.assertEqual(self.expected_constraints(constraintSet, item), constraintSet.constraints_for(item))
+        self.assertEqual(['src/setup.py'], list(constraintSet.index.paths))
+
+    def test_constraints_for_with_unhashable_ignore_paths_should_fall_back_to_applies_to(self):
+        constraintSet = self.make_set([IgnoreFiles([['weird'], 'plain.py'])])
+        for item in [FakeFile('plain.py'), FakeFile('asdf')]:
+            self.assertEqual(self.expected_constraints(constraintSet, item), constraintSet.constraints_for(item))
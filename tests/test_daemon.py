@@ -0,0 +1,131 @@
+#pylint: skip-file
+import os
+import shutil
+import tempfile
+import threading
+
+import mock
+
+from util import VigilanceTestCase
+
+class QualityServerTest(VigilanceTestCase):
+    def setUp(self):
+        super(QualityServerTest, self).setUp()
+        global QualityViolationsDetected, ConfigurationParsingError
+        from vigilance.daemon import QualityServer
+        from vigilance.error import QualityViolationsDetected, ConfigurationParsingError
+        self.directory = tempfile.mkdtemp()
+        self.configPath = self.write('vigilance.yaml', 'config')
+        self.reportPath = self.write('report.xml', 'report')
+        patcher = mock.patch('vigilance.daemon.load_configuration')
+        self.loadConfiguration = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.loadConfiguration.return_value = {'cobertura': {'report': self.reportPath, 'constraints': []}}
+        patcher = mock.patch('vigilance.daemon.run_suites')
+        self.runSuites = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.runSuites.side_effect = lambda *args: args[-1].write('checked\n')
+        self.server = QualityServer(self.configPath)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(QualityServerTest, self).tearDown()
+
+    def write(self, name, contents):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as output:
+            output.write(contents)
+        return path
+
+    def test_check_should_report_output_and_success(self):
+        self.assertEqual({'output': 'checked\n', 'message': None, 'exitCode': 0}, self.server.check())
+
+    def test_check_should_report_violations(self):
+        self.runSuites.side_effect = QualityViolationsDetected('bad')
+        self.assertEqual({'output': '', 'message': 'bad', 'exitCode': 1}, self.server.check())
+
+    def test_check_should_reuse_result_while_files_are_unchanged(self):
+        self.server.check()
+        self.server.check()
+        self.assertEqual(1, self.runSuites.call_count)
+        self.assertEqual(1, self.loadConfiguration.call_count)
+
+    def test_check_should_rerun_when_report_changes(self):
+        self.server.check()
+        self.write('report.xml', 'changed report')
+        self.server.check()
+        self.assertEqual(2, self.runSuites.call_count)
+        self.assertEqual(1, self.loadConfiguration.call_count)
+
+    def test_check_should_reload_configuration_when_it_changes(self):
+        self.server.check()
+        self.write('vigilance.yaml', 'changed config')
+        self.server.check()
+        self.assertEqual(2, self.loadConfiguration.call_count)
+        self.assertEqual('changed config', self.loadConfiguration.call_args[0][0])
+
+    def test_check_should_distinguish_queries(self):
+        self.server.check()
+        self.server.check(failFast=True)
+        self.server.check(changedFiles=['a.py'])
+        self.server.check(changedFiles=['./a.py'])
+        self.assertEqual(3, self.runSuites.call_count)
+        suites, jobs, cache, scope, maxViolations, failFast, output = self.runSuites.call_args[0]
+        self.assertEqual(frozenset(['a.py']), scope.paths)
+
+    def test_check_should_report_configuration_errors(self):
+        self.loadConfiguration.side_effect = ConfigurationParsingError('broken')
+        self.assertEqual({'output': '', 'message': 'broken', 'exitCode': -3}, self.server.check())
+        self.runSuites.assert_not_called()
+
+    def test_check_should_report_missing_configuration(self):
+        os.remove(self.configPath)
+        self.assertEqual(-3, self.server.check()['exitCode'])
+
+    def test_handle_should_reject_unknown_commands(self):
+        self.assertEqual(-5, self.server.handle({'command': 'explode'})['exitCode'])
+
+    def test_serve_should_answer_queries_until_stopped(self):
+        from vigilance.client import query
+        socketPath = os.path.join(self.directory, 'vigilance.sock')
+        open(socketPath, 'w').close()
+        self.server.interval = 0.01
+        thread = threading.Thread(target=self.server.serve, args=(socketPath,))
+        thread.start()
+        try:
+            for _ in range(100):
+                try:
+                    response = query({'command': 'check', 'maxViolations': 2}, socketPath)
+                    break
+                except EnvironmentError:
+                    self.server.stopped.wait(0.01)
+            self.assertEqual({'output': 'checked\n', 'message': None, 'exitCode': 0}, response)
+            self.assertEqual(2, self.runSuites.call_args[0][4])
+        finally:
+            query({'command': 'stop'}, socketPath)
+            thread.join()
+        self.assertFalse(os.path.exists(socketPath))
+
+    @mock.patch('vigilance.daemon.RequestTimeout', 0.05)
+    def test_serve_should_disconnect_stalled_clients_and_restrict_the_socket_to_its_owner(self):
+        import socket
+        import stat
+        from vigilance.client import query
+        socketPath = os.path.join(self.directory, 'vigilance.sock')
+        thread = threading.Thread(target=self.server.serve, args=(socketPath,))
+        thread.start()
+        stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            for _ in range(100):
+                try:
+                    stalled.connect(socketPath)
+                    break
+                except EnvironmentError:
+                    self.server.stopped.wait(0.01)
+            self.assertEqual(0, stat.S_IMODE(os.stat(socketPath).st_mode) & 0o077)
+            self.assertEqual(0, query({'command': 'check'}, socketPath)['exitCode'])
+        finally:
+            stalled.close()
+            query({'command': 'stop'}, socketPath)
+            thread.join()
+        self.log.warning.assert_called_once_with('Failed to answer vigilance client: %s', mock.ANY)
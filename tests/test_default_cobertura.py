@@ -1,6 +1,13 @@
 #pylint: skip-file
+import mmap
 import mock
+import multiprocessing.pool # The process pool must not be re-imported while its worker threads and processes are alive
+import numpy # NumPy cannot be re-imported once the test case removes it from sys.modules
+import pickle
+import tempfile
 from nose_parameterized import parameterized
+from io import BytesIO
+from six import StringIO
 
 from util import VigilanceTestCase
 
@@ -13,6 +20,10 @@ class FileUnderTestTest(VigilanceTestCase):
     def test_identifier_should_return_human_readable_representation(self):
         self.assertEqual('file /my/file', self.item.identifier)
 
+    def test_item_should_not_have_instance_dictionaries(self):
+        self.assertFalse(hasattr(self.item, '__dict__'))
+        self.assertFalse(hasattr(self.item.metrics, '__dict__'))
+
 class PackageUnderTestTest(VigilanceTestCase):
     def setUp(self):
         super(PackageUnderTestTest, self).setUp()
@@ -46,10 +57,111 @@ class CoberturaParserTest(VigilanceTestCase):
         report = self.parser.parse(reportText)
         self.assertEqual([FileUnderTest('asdf'), PackageUnderTest('packman')], report.items)
 
+    def test_parse_should_return_items_in_document_order(self):
+        reportText = ('<coverage><packages>\n'
+                      '<package name="one" line-rate="0.5"><classes>\n'
+                      '<class filename="one/a.py" line-rate="0.25"><methods/><lines><line hits="1" number="1"/></lines></class>\n'
+                      '</classes></package>\n'
+                      '<package name="two"><classes>\n'
+                      '<class filename="two/b.py"><lines><line hits="0" number="3"/></lines></class>\n'
+                      '</classes></package>\n'
+                      '</packages></coverage>')
+        report = self.parser.parse(reportText)
+        self.assertEqual([FileUnderTest('one/a.py'), PackageUnderTest('one'), FileUnderTest('two/b.py'), PackageUnderTest('two')],
+                         report.items)
+        self.assertEqual(25, report.items[0].metrics.lineCoverage)
+        self.assertEqual(50, report.items[1].metrics.lineCoverage)
+
+    def test_parse_should_share_equal_attribute_values_between_items(self):
+        report = self.parser.parse('<report><class filename="pkg/a.py" line-rate="0.5"/><class filename="pkg/a.py" line-rate="0.5"/></report>')
+        first, second = report.items
+        self.assertIs(first.filePath, second.filePath)
+        self.assertIs(first.metrics.lineCoverage, second.metrics.lineCoverage)
+
+    def test_iterparse_should_yield_items_before_the_report_is_fully_read(self):
+        self.parser.ChunkSize = 8
+        stream = StringIO('<report><class filename="first"></class>' + '<class filename="later"></class>' * 50 + '</report>')
+        items = self.parser.iterparse(stream)
+        self.assertEqual(FileUnderTest('first'), next(items))
+        self.assertTrue(stream.tell() < len(stream.getvalue()))
+
+    def test_parse_report_with_lazy_option_should_stop_parsing_when_closed(self):
+        self.parser.ChunkSize = 8
+        stream = StringIO('<report>' + '<class filename="file"></class>' * 50 + '</report>')
+        report = self.parser.parse_report(stream, lazy=True)
+        self.assertEqual(FileUnderTest('file'), next(report.items))
+        report.close()
+        self.assertTrue(stream.tell() < len(stream.getvalue()))
+        self.assertEqual([], list(report.items))
+
+    def test_parse_report_with_binary_stream_should_return_items(self):
+        report = self.parser.parse_report(BytesIO(b'<?xml version="1.0" encoding="utf-8"?>\n'
+                                                  b'<report><class filename="asdf" line-rate="1"/></report>'))
+        self.assertEqual([FileUnderTest('asdf')], report.items)
+
+    def test_iterparse_with_truncated_xml_should_raise_ReportParsingError(self):
+        with self.assertRaises(ReportParsingError):
+            list(self.parser.iterparse(StringIO('<report><class filename="a">')))
+
+    def test_parse_report_with_scope_should_return_changed_files_and_their_packages(self):
+        from vigilance.scope import ChangedFiles
+        reportText = ('<coverage><packages>'
+                      '<package name="one"><classes><class filename="one/a.py"/><class filename="one/b.py"/></classes></package>'
+                      '<package name="two"><classes><class filename="two/c.py"/></classes></package>'
+                      '</packages></coverage>')
+        report = self.parser.parse_report(reportText, scope=ChangedFiles(['one/b.py']))
+        self.assertEqual([FileUnderTest('one/b.py'), PackageUnderTest('one')], report.items)
+
+    def test_iter_scoped_chunks_should_cut_out_unchanged_classes(self):
+        from vigilance.scope import ChangedFiles
+        report = (b'<package name="p"><classes><class filename="a"><lines><line number="1"/></lines></class>'
+                  b'<class filename="b"/><class filename="c"></class></classes></package>')
+        self.assertEqual(b'<package name="p"><classes><class filename="b"/></classes></package>',
+                         b''.join(self.parser.iter_scoped_chunks(report, ChangedFiles(['b']))))
+
+    def test_iter_scoped_chunks_should_keep_classes_with_undecodable_file_names(self):
+        from vigilance.scope import ChangedFiles
+        report = u'<classes><class filename="caf\xe9"/><class filename="a&amp;b"/></classes>'.encode('utf-8')
+        self.assertEqual(report, b''.join(self.parser.iter_scoped_chunks(report, ChangedFiles(['other']))))
+
+    def test_parse_report_with_scope_and_buffer_should_match_stream(self):
+        from vigilance.scope import ChangedFiles
+        report = (b'<?xml version="1.0" encoding="utf-8"?>\n<coverage><packages><package name="p"><classes>'
+                  b'<class filename="a" line-rate="0.1"/><class filename="caf\xc3\xa9" line-rate="0.2"></class>'
+                  b'<class filename="b" line-rate="0.3"><lines/></class></classes></package></packages></coverage>')
+        scope = ChangedFiles([u'caf\xe9', 'b'])
+        expected = self.parser.parse_report(BytesIO(report), scope=scope).items
+        self.assertEqual([FileUnderTest(u'caf\xe9'), FileUnderTest('b'), PackageUnderTest('p')], expected)
+        self.assertEqual(expected, self.parser.parse_report(report, scope=scope).items)
+
+    def test_parse_report_with_scope_should_resolve_file_names_against_sources(self):
+        from vigilance.scope import ChangedFiles
+        report = (b'<coverage><sources><source>/build/repo/src</source></sources><packages><package name="p"><classes>'
+                  b'<class filename="setup.py"/><class filename="pkg/a.py"/><class filename="pkg/b/a.py"/>'
+                  b'</classes></package></packages></coverage>')
+        scope = ChangedFiles(['src/pkg/a.py', 'a.py'])
+        expected = [FileUnderTest('pkg/a.py'), PackageUnderTest('p')]
+        self.assertEqual(expected, self.parser.parse_report(BytesIO(report), scope=scope).items)
+        self.assertEqual(expected, self.parser.parse_report(report, scope=scope).items)
+        self.assertEqual(expected, self.parser.parse_report([report, report], scope=scope, processes=1).items)
+
+    def test_find_sources_should_read_sources_ahead_of_packages(self):
+        report = (b'<coverage><sources><source>/a</source><source>b&amp;c</source><source>/d</source></sources>'
+                  b'<packages><package name="p"><source>/e</source></package></packages></coverage>')
+        self.assertEqual(['/a', '/d'], self.parser.find_sources(report))
+        self.assertEqual([], self.parser.find_sources(BytesIO(report)))
+
+    @mock.patch('vigilance.default_suites.cobertura.CoberturaParser._xml_class_to_file')
+    def test_parse_report_with_scope_should_not_convert_unchanged_classes(self, classToFile):
+        from vigilance.scope import ChangedFiles
+        self.parser.parse_report('<report><class filename="a"/><class filename="b"/></report>', scope=ChangedFiles(['b']))
+        classToFile.assert_called_once_with({'filename': 'b'}, mock.ANY)
+
 class LineCoverageTest(VigilanceTestCase):
     def setUp(self):
         super(LineCoverageTest, self).setUp()
-        from vigilance.default_suites.cobertura import LineCoverage
+        global FileUnderTest
+        from vigilance.default_suites.cobertura import FileUnderTest, LineCoverage
         self.constraint = LineCoverage(22)
 
     @parameterized.expand([
@@ -62,6 +174,14 @@ class LineCoverageTest(VigilanceTestCase):
         result = self.constraint.satisfied_by(item)
         self.assertEqual(expected, result.satisfied)
 
+    def test_satisfied_by_should_return_shared_result_when_satisfied(self):
+        from vigilance.representation import Satisfied
+        self.assertIs(Satisfied, self.constraint.satisfied_by(FileUnderTest('a', 30)))
+
+    def test_satisfied_by_should_describe_failures(self):
+        result = self.constraint.satisfied_by(FileUnderTest('a', 10))
+        self.assertEqual('Line coverage too low for file a (10/22)', result.message)
+
 class BranchCoverageTest(VigilanceTestCase):
     def setUp(self):
         super(BranchCoverageTest, self).setUp()
@@ -93,3 +213,351 @@ class ComplexityText(VigilanceTestCase):
         item.metrics.complexity = coverage
         result = self.constraint.satisfied_by(item)
         self.assertEqual(expected, result.satisfied)
+
+class ColumnarReportTest(VigilanceTestCase):
+    def setUp(self):
+        super(ColumnarReportTest, self).setUp()
+        global ColumnarReport, QualityReport, FileUnderTest, PackageUnderTest
+        from vigilance.configuration import ConfigurationParser
+        from vigilance.constraint import ConstraintSuite, Constraint
+        from vigilance.default_suites.cobertura import (BranchCoverage, ColumnarReport, Complexity, FileUnderTest, LineCoverage,
+                                                        PackageUnderTest, CoberturaParser)
+        from vigilance.plugin.tooling import DefaultStanzas
+        from vigilance.representation import QualityReport, Satisfaction
+        class NamedAfterB(Constraint):
+            def __init__(self, _):
+                pass
+            def satisfied_by(self, item):
+                return Satisfaction(not item.identifier.startswith('file b'), 'custom failure for {}'.format(item.identifier))
+        suite = ConstraintSuite({'line': LineCoverage, 'branch': BranchCoverage, 'complexity': Complexity, 'custom': NamedAfterB})
+        stanzas = {key: stanza(suite) for key, stanza in DefaultStanzas.items()}
+        self.constraints = ConfigurationParser(stanzas, suite).parse([
+            {'type': 'global', 'line': 50, 'branch': 50, 'complexity': 5},
+            {'type': 'file', 'path': '^b', 'line': 10, 'custom': True},
+            {'type': 'package', 'name': 'pkg', 'branch': 90},
+            {'type': 'ignore', 'paths': ['ignored']}])
+        self.items = [FileUnderTest('a', 40, 60, 1), FileUnderTest('b1', 20, 10, 7), FileUnderTest('b2', 5, 90, 0),
+                      FileUnderTest('ignored', 0, 0, 100), PackageUnderTest('pkg', 80, 80, 2), PackageUnderTest('other', 80, 80, 9)]
+        self.parser = CoberturaParser()
+
+    def test_items_should_round_trip(self):
+        report = ColumnarReport(self.items)
+        self.assertEqual(self.items, report.items)
+        self.assertEqual([item.metrics.complexity for item in self.items], [item.metrics.complexity for item in report.items])
+
+    def test_scrutinize_should_match_item_by_item_evaluation(self):
+        expected = [failure.message for failure in QualityReport(self.items).scrutinize(self.constraints)]
+        actual = [failure.message for failure in ColumnarReport(self.items).scrutinize(self.constraints)]
+        self.assertEqual(8, len(expected))
+        self.assertEqual(expected, actual)
+
+    def test_scrutinize_should_only_materialize_rows_that_fail_or_need_item_by_item_evaluation(self):
+        report = ColumnarReport(self.items + [FileUnderTest('good', 90, 90, 1)])
+        with mock.patch.object(ColumnarReport, 'item', autospec=True, side_effect=ColumnarReport.item) as item:
+            report.scrutinize(self.constraints)
+        self.assertEqual([0, 1, 2, 4, 5], sorted(set(call[0][1] for call in item.call_args_list)))
+
+    def test_scrutinize_with_limit_should_match_item_by_item_evaluation(self):
+        for limit in range(1, 9):
+            expected = [failure.message for failure in QualityReport(self.items).scrutinize(self.constraints, limit)]
+            actual = [failure.message for failure in ColumnarReport(self.items).scrutinize(self.constraints, limit)]
+            self.assertEqual(expected, actual)
+
+    def test_scrutinize_with_limit_should_not_check_blocks_after_the_limit(self):
+        report = ColumnarReport(self.items)
+        report.BlockSize = 2
+        with mock.patch.object(ColumnarReport, 'item', autospec=True, side_effect=ColumnarReport.item) as item:
+            self.assertEqual(1, len(report.scrutinize(self.constraints, 1)))
+        self.assertEqual(set([0]), set(call[0][1] for call in item.call_args_list))
+
+    def test_scrutinize_in_blocks_should_match_item_by_item_evaluation(self):
+        report = ColumnarReport(self.items)
+        report.BlockSize = 4
+        expected = [failure.message for failure in QualityReport(self.items).scrutinize(self.constraints)]
+        self.assertEqual(expected, [failure.message for failure in report.scrutinize(self.constraints)])
+
+    def test_scrutinize_with_dynamic_constraints_should_match_item_by_item_evaluation(self):
+        from vigilance.constraint import Constraint
+        from vigilance.representation import Satisfaction
+        class EveryOtherPackage(Constraint):
+            def satisfied_by(self, item):
+                return Satisfaction(False, 'dynamic failure for {}'.format(item.identifier))
+            def applies_to(self, item):
+                return getattr(item, 'name', None) == 'other'
+        self.constraints.index = type(self.constraints.index)(self.constraints.index.constraints + [EveryOtherPackage()])
+        self.constraints.constraintTypes.append(list(self.constraints.constraintSuite.all_types())[:1])
+        expected = [failure.message for failure in QualityReport(self.items).scrutinize(self.constraints)]
+        actual = [failure.message for failure in ColumnarReport(self.items).scrutinize(self.constraints)]
+        self.assertIn('dynamic failure for package other', actual)
+        self.assertEqual(expected, actual)
+
+    def test_scrutinize_with_empty_report_should_return_no_dissatisfactions(self):
+        self.assertEqual([], ColumnarReport([]).scrutinize(self.constraints))
+
+    def test_parse_report_with_columnar_option_should_return_columnar_report(self):
+        report = self.parser.parse_report('<report><class filename="asdf" line-rate="0.5"/></report>', columnar=True)
+        self.assertTrue(isinstance(report, ColumnarReport))
+        self.assertEqual([FileUnderTest('asdf')], report.items)
+
+    @mock.patch('vigilance.default_suites.cobertura.numpy', None)
+    def test_parse_report_with_columnar_option_without_numpy_should_log_warning(self):
+        report = self.parser.parse_report('<report><class filename="asdf"/></report>', columnar=True)
+        self.assertFalse(isinstance(report, ColumnarReport))
+        self.log.warning.assert_any_call('NumPy is not installed; ignoring columnar option')
+
+class MappedColumnarReportTest(ColumnarReportTest):
+    def setUp(self):
+        super(MappedColumnarReportTest, self).setUp()
+        global MappedColumnarReport
+        from vigilance.default_suites.cobertura import MappedColumnarReport
+        self.items[1] = FileUnderTest('b1', 20.0, 10.0, 7.5)
+
+    def convert(self, items):
+        stream = BytesIO()
+        self.assertEqual(len(items), ColumnarReport(items).write(stream))
+        return stream.getvalue()
+
+    def test_write_should_round_trip_metrics_and_integer_defaults(self):
+        self.items.append(FileUnderTest(u'caf\u00e9', 20.0, 10.0, 7.5))
+        report = MappedColumnarReport(self.convert(self.items))
+        self.assertEqual(self.items, report.items)
+        for expected, actual in zip(self.items, report.items):
+            self.assertEqual(type(expected), type(actual))
+            for metric in ('lineCoverage', 'branchCoverage', 'complexity'):
+                self.assertEqual(getattr(expected.metrics, metric), getattr(actual.metrics, metric))
+                self.assertEqual(type(getattr(expected.metrics, metric)), type(getattr(actual.metrics, metric)))
+        report.close()
+
+    def test_scrutinize_should_match_item_by_item_evaluation(self):
+        expected = [failure.message for failure in QualityReport(self.items).scrutinize(self.constraints)]
+        actual = [failure.message for failure in MappedColumnarReport(self.convert(self.items)).scrutinize(self.constraints)]
+        self.assertEqual(expected, actual)
+
+    @mock.patch('vigilance.default_suites.cobertura.numpy', None)
+    def test_iter_dissatisfactions_without_numpy_should_match_item_by_item_evaluation(self):
+        expected = [failure.message for failure in QualityReport(self.items).scrutinize(self.constraints)]
+        actual = [failure.message for failure in MappedColumnarReport(self.convert(self.items)).iter_dissatisfactions(self.constraints)]
+        self.assertEqual(expected, actual)
+
+    def test_close_should_release_memory_mapped_report(self):
+        with tempfile.TemporaryFile() as reportFile:
+            reportFile.write(self.convert(self.items))
+            reportFile.flush()
+            buffer = mmap.mmap(reportFile.fileno(), 0, access=mmap.ACCESS_READ)
+            report = self.parser.parse_report(buffer)
+            self.assertTrue(isinstance(report, MappedColumnarReport))
+            report.scrutinize(self.constraints)
+            report.close()
+            buffer.close()
+
+    def test_parse_report_should_load_columnar_file_objects(self):
+        report = self.parser.parse_report(BytesIO(self.convert(self.items)))
+        self.assertEqual(self.items, report.items)
+
+    def test_parse_report_with_scope_should_only_load_changed_files_and_their_packages(self):
+        from vigilance.scope import ChangedFiles
+        items = [FileUnderTest('a'), FileUnderTest('b'), PackageUnderTest('p1'), FileUnderTest('c'), PackageUnderTest('p2')]
+        report = self.parser.parse_report(self.convert(items), scope=ChangedFiles(['b']))
+        self.assertEqual([FileUnderTest('b'), PackageUnderTest('p1')], report.items)
+
+    def test_parse_report_with_truncated_columnar_report_should_raise_ReportParsingError(self):
+        from vigilance.error import ReportParsingError
+        self.assertRaises(ReportParsingError, self.parser.parse_report, self.convert(self.items)[:-1])
+
+    def test_parse_report_with_other_columnar_version_should_raise_ReportParsingError(self):
+        from vigilance.error import ReportParsingError
+        report = self.convert(self.items)
+        with self.assertRaises(ReportParsingError) as context:
+            self.parser.parse_report(report[:7] + b'\x02' + report[8:])
+        self.assertIn('Unsupported version 2', str(context.exception))
+
+    def test_parse_report_with_truncated_columnar_mmap_should_leave_mmap_closable(self):
+        from vigilance.error import ReportParsingError
+        with tempfile.TemporaryFile() as reportFile:
+            reportFile.write(self.convert(self.items)[:-1])
+            reportFile.flush()
+            mapped = mmap.mmap(reportFile.fileno(), 0, access=mmap.ACCESS_READ)
+            with self.assertRaises(ReportParsingError):
+                try:
+                    self.parser.parse_report(mapped)
+                finally:
+                    mapped.close()
+
+    def test_parse_report_with_columnar_reports_to_merge_should_raise_ReportParsingError(self):
+        from vigilance.error import ReportParsingError
+        self.assertRaises(ReportParsingError, self.parser.parse_report, [self.convert(self.items), b'<coverage/>'])
+
+    def test_is_cacheable_should_reject_columnar_reports(self):
+        self.assertFalse(self.parser.is_cacheable(self.convert(self.items)))
+        self.assertTrue(self.parser.is_cacheable(b'<coverage/>'))
+
+    def test_convert_should_write_parsed_report(self):
+        stream = BytesIO()
+        self.assertEqual(2, self.parser.convert(b'<coverage><packages><package name="p" line-rate="0.5"><classes>'
+                                                b'<class filename="f" line-rate="0.25"/></classes></package></packages></coverage>', stream))
+        report = MappedColumnarReport(stream.getvalue())
+        self.assertEqual([FileUnderTest('f'), PackageUnderTest('p')], report.items)
+        self.assertEqual(25.0, report.items[0].metrics.lineCoverage)
+
+class ShardedCoberturaParserTest(VigilanceTestCase):
+    def setUp(self):
+        super(ShardedCoberturaParserTest, self).setUp()
+        global ReportParsingError
+        from vigilance.error import ReportParsingError
+        from vigilance.default_suites.cobertura import CoberturaParser
+        self.parser = CoberturaParser()
+        self.parser.MinimumShardSize = 0
+        self.parser.ShardsPerProcess = 2
+        packages = ''.join('<package name="p{0}" line-rate="0.{0}"><classes>'
+                           '<class filename="p{0}/a.py" line-rate="0.5"><lines><line hits="1" number="1"/></lines></class>'
+                           '<class filename="p{0}/b.py" branch-rate="0.25"/>'
+                           '</classes></package>\n'.format(i) for i in range(10))
+        self.report = ('<?xml version="1.0" encoding="utf-8"?>\n<coverage><sources><source>/src</source></sources>'
+                       '<packages>\n' + packages + '</packages></coverage>').encode('utf-8')
+
+    def assertItemsMatchSerialParse(self, report):
+        expected = self.parser.parse_report(self.report).items
+        actual = report.items
+        self.assertEqual(expected, actual)
+        self.assertEqual([i.metrics.lineCoverage for i in expected], [i.metrics.lineCoverage for i in actual])
+
+    def test_find_shards_should_split_at_package_boundaries(self):
+        shards = self.parser.find_shards(self.report, 2)
+        self.assertEqual(4, len(shards))
+        for declaration, report, start, end in shards:
+            self.assertEqual(b'<?xml version="1.0" encoding="utf-8"?>', declaration)
+            self.assertTrue(report[start:end].startswith(b'<package '))
+            self.assertTrue(report[start:end].rstrip().endswith(b'</package>'))
+
+    def test_find_shards_with_stream_should_return_None(self):
+        self.assertIsNone(self.parser.find_shards(BytesIO(self.report), 2))
+
+    def test_find_shards_with_class_outside_of_package_should_return_None(self):
+        report = self.report.replace(b'</packages>', b'</packages><class filename="stray"/>')
+        self.assertIsNone(self.parser.find_shards(report, 2))
+
+    def test_find_shards_with_small_report_should_return_None(self):
+        self.parser.MinimumShardSize = len(self.report) + 1
+        self.assertIsNone(self.parser.find_shards(self.report, 2))
+
+    def test_parse_report_with_processes_should_match_serial_parse(self):
+        self.assertItemsMatchSerialParse(self.parser.parse_report(self.report, processes=2))
+
+    def test_parse_report_with_processes_and_mmap_should_match_serial_parse(self):
+        with tempfile.TemporaryFile() as reportFile:
+            reportFile.write(self.report)
+            reportFile.flush()
+            mapped = mmap.mmap(reportFile.fileno(), 0, access=mmap.ACCESS_READ)
+            self.assertItemsMatchSerialParse(self.parser.parse_report(mapped, processes=3))
+            mapped.close()
+
+    def test_parse_report_with_processes_and_scope_should_match_serial_parse(self):
+        from vigilance.scope import ChangedFiles
+        scope = ChangedFiles(['p2/a.py', 'p7/b.py'])
+        expected = self.parser.parse_report(self.report, scope=scope).items
+        self.assertEqual(4, len(expected))
+        self.assertEqual(expected, self.parser.parse_report(self.report, scope=scope, processes=2).items)
+
+    def test_parse_report_with_processes_and_invalid_shard_should_raise_ReportParsingError(self):
+        with self.assertRaises(ReportParsingError):
+            self.parser.parse_report(self.report.replace(b'<classes><class filename="p3', b'<classes><clas filename="p3'), processes=2)
+
+class MergedCoberturaParserTest(VigilanceTestCase):
+    def setUp(self):
+        super(MergedCoberturaParserTest, self).setUp()
+        global ReportParsingError
+        from vigilance.error import ReportParsingError
+        from vigilance.default_suites.cobertura import CoberturaParser
+        self.parser = CoberturaParser()
+        self.first = (b'<coverage><packages><package name="pkg" complexity="0"><classes>'
+                      b'<class filename="pkg/a.py" complexity="0.01"><methods><method name="f"><lines><line number="1" hits="9"/></lines></method></methods>'
+                      b'<lines><line number="1" hits="1"/><line number="2" hits="0"/>'
+                      b'<line number="3" hits="1" branch="true" condition-coverage="50% (1/2)"/><line number="4" hits="0"/></lines></class>'
+                      b'<class filename="pkg/b.py"><lines><line number="1" hits="0"/></lines></class>'
+                      b'</classes></package></packages></coverage>')
+        self.second = (b'<coverage><packages><package name="pkg"><classes>'
+                       b'<class filename="pkg/a.py" complexity="0.02"><lines><line number="1" hits="0"/><line number="2" hits="3"/>'
+                       b'<line number="3" hits="1" branch="true" condition-coverage="0% (0/2)"/><line number="4" hits="0"/></lines></class>'
+                       b'</classes></package><package name="other"><classes>'
+                       b'<class filename="other/c.py"><lines><line number="1" hits="2"/></lines></class>'
+                       b'</classes></package></packages></coverage>')
+
+    def coverage(self, report):
+        return [(item.identifier, item.metrics.lineCoverage, item.metrics.branchCoverage, item.metrics.complexity) for item in report.items]
+
+    def test_parse_report_with_multiple_reports_should_merge_line_hits(self):
+        report = self.parser.parse_report([self.first, BytesIO(self.second)], processes=1)
+        self.assertEqual([('file pkg/a.py', 75.0, 50.0, 2.0), ('file pkg/b.py', 0.0, 100.0, 0),
+                          ('package pkg', 60.0, 50.0, 0), ('file other/c.py', 100.0, 100.0, 0), ('package other', 100.0, 100.0, 0)],
+                         self.coverage(report))
+
+    def test_parse_report_with_multiple_reports_and_processes_should_match_serial_merge(self):
+        expected = self.coverage(self.parser.parse_report([self.first, self.second], processes=1))
+        self.assertEqual(expected, self.coverage(self.parser.parse_report([self.first, self.second, self.first], processes=2)))
+
+    def test_parse_report_with_report_files_and_processes_should_reopen_files_by_path(self):
+        from vigilance.default_suites.cobertura import _line_task, _parse_line_file
+        expected = self.coverage(self.parser.parse_report([self.first, self.second], processes=1))
+        with tempfile.NamedTemporaryFile() as first, tempfile.NamedTemporaryFile() as second:
+            first.write(self.first)
+            second.write(b'ignored' + self.second)
+            first.flush()
+            second.flush()
+            with open(first.name, 'rb') as firstReport, open(second.name, 'rb') as secondReport:
+                secondReport.seek(len(b'ignored'))
+                self.assertEqual((_parse_line_file, (second.name, len(b'ignored'))), _line_task(secondReport))
+                self.assertEqual(expected, self.coverage(self.parser.parse_report([firstReport, secondReport], processes=2)))
+
+    def test_parse_report_with_single_report_list_should_parse_report(self):
+        self.assertEqual(self.parser.parse_report(self.first).items, self.parser.parse_report([self.first]).items)
+
+    def test_parse_report_with_multiple_reports_and_scope_should_report_affected_packages(self):
+        from vigilance.scope import ChangedFiles
+        report = self.parser.parse_report([self.first, self.second], scope=ChangedFiles(['pkg/b.py']), processes=1)
+        self.assertEqual([('file pkg/b.py', 0.0, 100.0, 0), ('package pkg', 60.0, 50.0, 0)], self.coverage(report))
+
+    def test_parse_report_with_multiple_reports_and_invalid_report_should_raise_ReportParsingError(self):
+        with self.assertRaises(ReportParsingError):
+            self.parser.parse_report([self.first, b'<coverage>'], processes=2)
+
+class LineHitsTest(VigilanceTestCase):
+    def setUp(self):
+        super(LineHitsTest, self).setUp()
+        global LineHits
+        from vigilance.default_suites.cobertura import LineHits
+        self.first = LineHits.from_lines([(1, 1), (2, 0), (3, 4), (4, 0)], [(3, 1, 2)])
+        self.second = LineHits.from_lines([(1, 0), (2, 2), (3, 0), (5, 0)], [(3, 2, 2), (5, 0, 4)])
+
+    def test_counts_should_count_lines_and_conditions(self):
+        self.assertEqual((2, 4, 1, 2), self.first.counts())
+        self.assertEqual((50.0, 50.0), (self.first.line_rate(), self.first.branch_rate()))
+
+    def test_union_should_keep_covered_lines_and_most_covered_conditions(self):
+        self.assertEqual((3, 5, 2, 6), (self.first | self.second).counts())
+
+    def test_intersection_should_keep_common_lines_and_least_covered_conditions(self):
+        self.assertEqual((0, 3, 1, 2), (self.first & self.second).counts())
+
+    def test_exclude_should_remove_line_range(self):
+        excluded = self.first.exclude(2, 3)
+        self.assertEqual((1, 2, 0, 0), excluded.counts())
+        self.assertEqual(LineHits.from_lines([(1, 1), (4, 0)]), excluded)
+
+    def test_rates_without_lines_should_be_full_coverage(self):
+        self.assertEqual((100.0, 100.0), (LineHits().line_rate(), LineHits().branch_rate()))
+
+    def test_from_lines_with_many_conditions_should_count_every_condition(self):
+        lines = LineHits.from_lines([(1, 1), (2, 1)], [(1, 100, 1000), (2, 70, 70)])
+        self.assertEqual((170, 1070), lines.counts()[2:])
+
+    def test_union_and_intersection_with_many_conditions_should_keep_exact_counts(self):
+        many = LineHits.from_lines([(3, 1)], [(3, 65, 300)])
+        self.assertEqual((65, 300), (self.first | many).counts()[2:])
+        self.assertEqual((1, 2), (self.first & many).counts()[2:])
+
+    def test_equality_should_ignore_width_of_condition_counts(self):
+        many = LineHits.from_lines([(1, 1)], [(1, 1, 300)])
+        self.assertEqual(LineHits.from_lines([(1, 1)], [(1, 1, 2)]), many & LineHits.from_lines([(1, 1)], [(1, 1, 2)]))
+
+    def test_line_hits_should_be_picklable(self):
+        self.assertEqual(self.first, pickle.loads(pickle.dumps(self.first, pickle.HIGHEST_PROTOCOL)))
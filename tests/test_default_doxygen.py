@@ -1,4 +1,7 @@
 #pylint: skip-file
+import re
+from io import BytesIO
+
 import mock
 
 from util import VigilanceTestCase
@@ -12,6 +15,10 @@ class DocumentationErrorTest(VigilanceTestCase):
     def test_identifier_should_return_error_message(self):
         self.assertEqual('documentation failure: this was the error', self.item.identifier)
 
+    def test_identifier_with_grouped_errors_should_count_similar_errors(self):
+        self.item.count = 3
+        self.assertEqual('documentation failure: this was the error (and 2 similar warning(s))', self.item.identifier)
+
 class DoxygenParserTest(VigilanceTestCase):
     def setUp(self):
         super(DoxygenParserTest, self).setUp()
@@ -22,6 +29,40 @@ class DoxygenParserTest(VigilanceTestCase):
         report = self.parser.parse('a\nb\nc\n\n\n')
         self.assertEqual(['a', 'b', 'c'], [item.metrics for item in report.items])
 
+    def test_parse_report_should_group_warnings_by_file_and_kind(self):
+        report = self.parser.parse_report(BytesIO(b'a.h:1: warning: Member f() (function) of class A is not documented.\n'
+                                                  b'a.h:2: warning: Member g (variable) of class A is not documented.\n'
+                                                  b"a.h:3: warning: Found unknown command '\\foo'\n"
+                                                  b'b.h:4: warning: Member h() (function) of class B is not documented.\n'
+                                                  b"a.h:5: warning: Found unknown command '\\bar'\n"))
+        self.assertEqual([('a.h', 'undocumented member', 2), ('a.h', "Found unknown command ''", 2), ('b.h', 'undocumented member', 1)],
+                         [(item.filePath, item.kind, item.count) for item in report.items])
+        self.assertEqual('a.h:1: warning: Member f() (function) of class A is not documented.', report.items[0].metrics)
+
+    def test_parse_report_should_not_report_continuation_lines(self):
+        report = self.parser.parse_report(b'a.h:1: warning: The following parameters of f(int x, int y) are not documented:\n'
+                                          b"  parameter 'x'\n"
+                                          b"  parameter 'y'\n")
+        self.assertEqual(1, len(report.items))
+
+    def test_parse_report_with_scope_should_skip_warnings_for_unchanged_files(self):
+        from vigilance.scope import ChangedFiles
+        report = self.parser.parse_report(b'/src/a.h:1: warning: Compound A is not documented.\n'
+                                          b"  detail\n"
+                                          b'/src/b.h:1: warning: Compound B is not documented.\n'
+                                          b'  detail\n'
+                                          b'warning: ignoring unknown tag\n', scope=ChangedFiles(['a.h'], roots=['/src']))
+        self.assertEqual(['/src/a.h', None], [item.filePath for item in report.items])
+
+    def test_parse_report_with_multiple_reports_should_group_warnings_of_all_reports(self):
+        report = self.parser.parse_report([b'a.h:1: warning: Compound A is not documented.\n',
+                                           BytesIO(b'a.h:1: warning: Compound B is not documented.\n')])
+        self.assertEqual([2], [item.count for item in report.items])
+
+    def test_parse_report_with_lazy_option_should_return_iterator(self):
+        report = self.parser.parse_report(b'a\n', lazy=True)
+        self.assertEqual(['a'], [item.metrics for item in report.items])
+
 class DocumentationTest(VigilanceTestCase):
     def setUp(self):
         super(DocumentationTest, self).setUp()
@@ -34,6 +75,56 @@ class DocumentationTest(VigilanceTestCase):
         self.assertFalse(result.satisfied)
         self.assertEqual('documentation failure: bad', result.message)
 
+class BudgetTest(VigilanceTestCase):
+    def setUp(self):
+        super(BudgetTest, self).setUp()
+        global DocumentationError
+        from vigilance.default_suites.doxygen import Budget, DocumentationError
+        self.constraint = Budget(3, 'undocumented member', re.compile('^src/legacy/'))
+
+    def test_applies_to_should_match_kind_and_path(self):
+        self.assertTrue(self.constraint.applies_to(DocumentationError('a', 'src/legacy/a.h', 'undocumented member')))
+        self.assertFalse(self.constraint.applies_to(DocumentationError('a', 'src/legacy/a.h', 'undocumented compound')))
+        self.assertFalse(self.constraint.applies_to(DocumentationError('a', 'src/new/a.h', 'undocumented member')))
+        self.assertFalse(self.constraint.applies_to(DocumentationError('a', None, 'undocumented member')))
+
+    def test_satisfied_by_should_fail_once_when_budget_is_exceeded(self):
+        results = [self.constraint.satisfied_by(DocumentationError('a.h:1: warning', 'a.h', 'undocumented member', count))
+                   for count in (2, 1, 1, 5)]
+        self.assertEqual([True, True, False, True], [result.satisfied for result in results])
+        self.assertEqual('Documentation budget of 3 undocumented member warning(s) matching "^src/legacy/" exceeded by '
+                         'documentation failure: a.h:1: warning', results[2].message)
+
+    def test_reset_should_restore_budget(self):
+        self.constraint.satisfied_by(DocumentationError('a', count=4))
+        self.constraint.reset()
+        self.assertTrue(self.constraint.satisfied_by(DocumentationError('a', count=3)).satisfied)
+
+class DoxygenSuiteTest(VigilanceTestCase):
+    def setUp(self):
+        super(DoxygenSuiteTest, self).setUp()
+        from vigilance.default_suites.doxygen import Default
+        from vigilance.suite import QualitySuite
+        self.suite = QualitySuite(*Default().get_suite_components())
+        self.report = (b'src/legacy/a.h:1: warning: Member f() (function) of class A is not documented.\n'
+                       b'src/legacy/b.h:1: warning: Member g() (function) of class B is not documented.\n'
+                       b'src/legacy/b.h:2: warning: Compound B is not documented.\n'
+                       b'src/new/c.h:1: warning: Member h() (function) of class C is not documented.\n')
+
+    def test_scrutinize_with_budget_should_only_report_unbudgeted_warnings(self):
+        constraints = self.suite.parse_constraints([{'type': 'documentation'},
+                                                    {'type': 'budget', 'path': '^src/legacy/', 'kind': 'undocumented member', 'max': 2}])
+        messages = [failure.message for failure in self.suite.parse_report(self.report).scrutinize(constraints)]
+        self.assertEqual(['documentation failure: src/legacy/b.h:2: warning: Compound B is not documented.',
+                          'documentation failure: src/new/c.h:1: warning: Member h() (function) of class C is not documented.'],
+                         messages)
+        self.assertEqual(messages, [failure.message for failure in self.suite.parse_report(self.report).scrutinize(constraints)])
+
+    def test_scrutinize_with_exceeded_budget_should_report_budget(self):
+        constraints = self.suite.parse_constraints([{'type': 'documentation'}, {'type': 'budget', 'path': '^src/legacy/', 'max': 2}])
+        failure, _ = self.suite.parse_report(self.report).scrutinize(constraints)
+        self.assertTrue(failure.message.startswith('Documentation budget of 2 warning(s) matching "^src/legacy/" exceeded by'))
+
 class DocumentationStanzaTest(VigilanceTestCase):
     def setUp(self):
         super(DocumentationStanzaTest, self).setUp()
@@ -44,3 +135,32 @@ class DocumentationStanzaTest(VigilanceTestCase):
     def test_parse_should_return_single_documentation_constraint(self):
         constraint, = self.configuration.parse(None)
         self.assertTrue(isinstance(constraint, Documentation))
+
+class BudgetStanzaTest(VigilanceTestCase):
+    def setUp(self):
+        super(BudgetStanzaTest, self).setUp()
+        global ConfigurationParsingError
+        from vigilance.default_suites.doxygen import BudgetStanza
+        from vigilance.error import ConfigurationParsingError
+        self.configuration = BudgetStanza(None)
+
+    def test_parse_should_return_budget(self):
+        constraint, = self.configuration.parse({'max': 5, 'kind': 'undocumented member', 'path': 'legacy'})
+        self.assertEqual((5, 'undocumented member', 'legacy'), (constraint.maximum, constraint.kind, constraint.pathRegex.pattern))
+
+    def test_parse_without_max_should_raise_ConfigurationParsingError(self):
+        with self.assertRaises(ConfigurationParsingError):
+            self.configuration.parse({'path': 'legacy'})
+
+    def test_parse_with_invalid_max_should_raise_ConfigurationParsingError(self):
+        for maximum in [-1, 2.5, '5', True, None]:
+            with self.assertRaises(ConfigurationParsingError):
+                self.configuration.parse({'max': maximum})
+
+    def test_parse_with_invalid_path_should_raise_ConfigurationParsingError(self):
+        with self.assertRaises(ConfigurationParsingError):
+            self.configuration.parse({'max': 0, 'path': 'legacy('})
+
+    def test_parse_with_unknown_kind_should_raise_ConfigurationParsingError(self):
+        with self.assertRaises(ConfigurationParsingError):
+            self.configuration.parse({'max': 0, 'kind': 'undocumented membr'})
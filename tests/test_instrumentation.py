@@ -0,0 +1,80 @@
+#pylint: skip-file
+import json
+import os
+import shutil
+import tempfile
+
+from util import VigilanceTestCase
+
+class InstrumentationTest(VigilanceTestCase):
+    def setUp(self):
+        super(InstrumentationTest, self).setUp()
+        global instrumentation
+        from vigilance import instrumentation
+        self.recorder = instrumentation.Recorder()
+
+    def test_span_without_recorder_should_discard_measurements(self):
+        with instrumentation.span('phase') as span:
+            span.count('items', 3)
+        self.assertIsNone(instrumentation.active())
+        self.assertEqual({}, self.recorder.spans)
+
+    def test_span_should_accumulate_calls_and_counters(self):
+        with instrumentation.recording(self.recorder):
+            for _ in range(2):
+                with instrumentation.span('phase') as span:
+                    span.count('items', 3)
+        span = self.recorder.spans[(None, 'phase')]
+        self.assertEqual(2, span.calls)
+        self.assertEqual({'items': 6}, dict(span.counters))
+        self.assertGreaterEqual(span.duration, 0)
+        self.assertIsNone(instrumentation.active())
+
+    def test_span_within_suite_should_be_attributed_to_suite(self):
+        with instrumentation.recording(self.recorder), instrumentation.suite('doxygen'):
+            with instrumentation.span('phase'):
+                pass
+            with instrumentation.span('other', suite='cobertura'):
+                pass
+        self.assertEqual([('doxygen', 'phase'), ('cobertura', 'other')], list(self.recorder.spans))
+        self.assertIsNone(instrumentation.current_suite())
+
+    def test_timed_should_record_each_call(self):
+        timed = self.recorder.timed('double', lambda value: value * 2)
+        self.assertEqual([2, 4], [timed(1), timed(2)])
+        self.assertEqual(2, self.recorder.spans[(None, 'double')].calls)
+
+    def test_timed_iter_should_record_each_element(self):
+        self.assertEqual([1, 2, 3], list(self.recorder.timed_iter('parse', iter([1, 2, 3]))))
+        self.assertEqual(3, self.recorder.spans[(None, 'parse')].calls)
+
+    def test_to_json_should_list_spans(self):
+        with instrumentation.recording(self.recorder), instrumentation.span('phase', suite='doxygen') as span:
+            span.count('items')
+        phase, = json.loads(self.recorder.to_json())
+        self.assertEqual(('doxygen', 'phase', 1, {'items': 1}), (phase['suite'], phase['phase'], phase['calls'], phase['counters']))
+
+    def test_to_text_should_list_spans(self):
+        self.recorder.get_span('phase').count('items', 2)
+        header, row = self.recorder.to_text().splitlines()
+        self.assertEqual(['-', 'phase', '0.00', '0', '-', 'items=2'], row.split())
+
+    def test_profiling_with_uncreatable_directory_should_log_warning_and_run_block(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        blocker = os.path.join(directory, 'file')
+        open(blocker, 'w').close()
+        ran = []
+        with instrumentation.profiling(os.path.join(blocker, 'profile')):
+            ran.append(True)
+        self.assertEqual([True], ran)
+        self.log.warning.assert_called_once_with('Unable to create profile directory "%s"; the run is not profiled',
+                                                 os.path.join(blocker, 'profile'))
+
+    def test_profiling_should_write_profile_and_snapshot(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        target = os.path.join(directory, 'profile')
+        with instrumentation.profiling(target):
+            sum(range(10))
+        self.assertIn('vigilance.pstats', os.listdir(target))
@@ -0,0 +1,125 @@
+#pylint: skip-file
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ElementTree
+
+from six import StringIO
+
+from util import VigilanceTestCase
+
+class ResultWriterTest(VigilanceTestCase):
+    def setUp(self):
+        super(ResultWriterTest, self).setUp()
+        global output
+        from vigilance import output
+        self.stream = StringIO()
+
+    def run_suite(self, writer, messages, limit=None):
+        writer.begin()
+        for message in messages:
+            writer.violation('cobertura', message)
+        writer.finish_suite('cobertura', len(messages), limit)
+        writer.end()
+        return self.stream.getvalue()
+
+    def test_text_writer_should_write_messages_and_result(self):
+        self.assertEqual('a\nb\n', self.run_suite(output.TextWriter(self.stream), ['a', 'b']))
+
+    def test_text_writer_without_violations_should_report_completion(self):
+        self.assertEqual('Quality validation complete for cobertura\n', self.run_suite(output.TextWriter(self.stream), []))
+
+    def test_text_writer_with_limit_should_report_truncation(self):
+        self.assertEqual('a\nStopped checking cobertura after 1 quality violation(s); further violations may exist\n',
+                         self.run_suite(output.TextWriter(self.stream), ['a'], limit=1))
+
+    def test_writer_should_buffer_until_suite_finishes(self):
+        writer = output.TextWriter(self.stream)
+        writer.violation('cobertura', 'a')
+        self.assertEqual('', self.stream.getvalue())
+        writer.finish_suite('cobertura', 1)
+        self.assertEqual('a\n', self.stream.getvalue())
+
+    def test_writer_should_flush_full_buffer(self):
+        writer = output.TextWriter(self.stream)
+        writer.BufferSize = 5
+        writer.violation('cobertura', 'abc')
+        self.assertEqual('', self.stream.getvalue())
+        writer.violation('cobertura', 'def')
+        self.assertEqual('abc\ndef\n', self.stream.getvalue())
+
+    def test_dedupe_should_drop_repeated_violations_per_suite(self):
+        writer = output.TextWriter(self.stream, dedupe=True)
+        self.assertEqual('a\nb\nOmitted 2 duplicate quality violation(s) of cobertura\n', self.run_suite(writer, ['a', 'b', 'a', 'a']))
+        self.assertTrue(writer.violation('cobertura', 'a'))
+
+    def test_summary_writer_should_only_write_counts(self):
+        self.assertEqual('2 quality violation(s) detected for cobertura\n', self.run_suite(output.SummaryWriter(self.stream), ['a', 'b']))
+
+    def test_json_lines_writer_should_write_records(self):
+        records = [json.loads(line) for line in self.run_suite(output.JsonLinesWriter(self.stream), ['a "quoted"']).splitlines()]
+        self.assertEqual([{'type': 'violation', 'suite': 'cobertura', 'message': 'a "quoted"'},
+                          {'type': 'result', 'suite': 'cobertura', 'violations': 1, 'truncated': False, 'duplicates': 0}], records)
+
+    def test_json_lines_writer_should_write_errors(self):
+        writer = output.JsonLinesWriter(self.stream)
+        writer.error('doxygen', 'unreadable')
+        self.assertEqual({'type': 'error', 'suite': 'doxygen', 'message': 'unreadable'}, json.loads(self.stream.getvalue()))
+
+    def test_junit_writer_should_write_failures_per_violation(self):
+        writer = output.JUnitWriter(self.stream)
+        writer.begin()
+        writer.violation('cobertura', 'low <coverage> & more')
+        writer.finish_suite('cobertura', 1)
+        writer.finish_suite('doxygen', 0)
+        writer.error('pylint', 'broken')
+        writer.end()
+        suites = ElementTree.fromstring(self.stream.getvalue())
+        self.assertEqual(['cobertura', 'doxygen', 'pylint'], [suite.get('name') for suite in suites])
+        failure = suites[0].find('testcase/failure')
+        self.assertEqual('low <coverage> & more', failure.get('message'))
+        self.assertEqual(1, len(suites[1].findall('testcase')))
+        self.assertIsNone(suites[1].find('testcase/failure'))
+        self.assertEqual('broken', suites[2].find('testcase/error').get('message'))
+
+    def test_fork_should_keep_format_and_options(self):
+        fork = output.JsonLinesWriter(self.stream, dedupe=True).fork(StringIO())
+        self.assertIsInstance(fork, output.JsonLinesWriter)
+        self.assertTrue(fork.dedupe)
+
+class OpenOutputTest(VigilanceTestCase):
+    def setUp(self):
+        super(OpenOutputTest, self).setUp()
+        global open_output
+        from vigilance.output import open_output
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(OpenOutputTest, self).tearDown()
+
+    def test_open_output_should_write_file(self):
+        path = os.path.join(self.directory, 'results.txt')
+        stream = open_output(path)
+        stream.write('results\n')
+        stream.close()
+        with open(path) as results:
+            self.assertEqual('results\n', results.read())
+
+    def test_open_output_with_gz_suffix_should_compress(self):
+        path = os.path.join(self.directory, 'results.jsonl.gz')
+        stream = open_output(path)
+        stream.write('results\n')
+        stream.close()
+        with gzip.open(path, 'rb') as results:
+            self.assertEqual(b'results\n', results.read())
+
+    def test_open_output_should_encode_unicode_as_utf8(self):
+        path = os.path.join(self.directory, 'results.txt')
+        stream = open_output(path)
+        stream.write(u'caf\xe9\n')
+        stream.close()
+        with open(path, 'rb') as results:
+            self.assertEqual(u'caf\xe9\n'.encode('utf-8'), results.read())
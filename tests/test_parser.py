@@ -0,0 +1,83 @@
+#pylint: skip-file
+import mmap
+import mock
+import tempfile
+from io import BytesIO
+from six import StringIO, ensure_str
+
+from util import VigilanceTestCase
+
+class IterChunksTest(VigilanceTestCase):
+    def setUp(self):
+        super(IterChunksTest, self).setUp()
+        global iter_chunks
+        from vigilance.parser import iter_chunks
+
+    def test_iter_chunks_with_string_should_yield_whole_string(self):
+        self.assertEqual(['abc'], list(iter_chunks('abc', 1)))
+
+    def test_iter_chunks_with_empty_string_should_yield_nothing(self):
+        self.assertEqual([], list(iter_chunks('')))
+
+    def test_iter_chunks_with_stream_should_yield_chunks(self):
+        self.assertEqual([b'ab', b'cd', b'e'], list(iter_chunks(BytesIO(b'abcde'), 2)))
+
+    def test_iter_chunks_with_memoryview_should_yield_chunks(self):
+        self.assertEqual([b'ab', b'cd', b'e'], list(iter_chunks(memoryview(b'abcde'), 2)))
+
+    def test_iter_chunks_with_mmap_should_yield_chunks(self):
+        with tempfile.TemporaryFile() as reportFile:
+            reportFile.write(b'abcde')
+            reportFile.flush()
+            mapped = mmap.mmap(reportFile.fileno(), 0, access=mmap.ACCESS_READ)
+            self.assertEqual([b'abc', b'de'], list(iter_chunks(mapped, 3)))
+            self.assertEqual([b'abcde'], list(iter_chunks(mapped)))
+            mapped.close()
+
+class IterLinesTest(VigilanceTestCase):
+    def setUp(self):
+        super(IterLinesTest, self).setUp()
+        global iter_lines
+        from vigilance.parser import iter_lines
+
+    def test_iter_lines_should_join_lines_split_across_chunks(self):
+        self.assertEqual(['ab', 'cd', '', 'e'], list(iter_lines(BytesIO(b'ab\r\ncd\n\ne'), 3)))
+
+    def test_iter_lines_should_decode_characters_split_across_chunks(self):
+        self.assertEqual([ensure_str(u'\xe9t\xe9')], list(iter_lines(BytesIO(u'\xe9t\xe9\n'.encode('utf-8')), 1)))
+
+    def test_iter_lines_with_string_should_yield_lines(self):
+        self.assertEqual(['a', 'b'], list(iter_lines('a\nb\n')))
+
+class ParserTest(VigilanceTestCase):
+    def setUp(self):
+        super(ParserTest, self).setUp()
+        from vigilance.parser import Parser
+        class StringParser(Parser):
+            def parse(self, fileContents):
+                return fileContents
+        self.parser = StringParser()
+
+    def test_parse_report_with_binary_stream_should_pass_decoded_string_to_parse(self):
+        self.assertEqual(ensure_str(u'caf\xe9'), self.parser.parse_report(BytesIO(u'caf\xe9'.encode('utf-8'))))
+
+    def test_parse_report_with_bytes_should_pass_decoded_string_to_parse(self):
+        self.assertEqual('report', self.parser.parse_report(b'report'))
+
+    def test_parse_report_with_text_stream_should_pass_string_to_parse(self):
+        self.assertEqual('report', self.parser.parse_report(StringIO('report')))
+
+    def test_parse_report_with_multiple_reports_should_raise_ReportParsingError(self):
+        from vigilance.error import ReportParsingError
+        with self.assertRaises(ReportParsingError):
+            self.parser.parse_report([b'one', b'two'])
+
+    def test_parse_report_with_scope_should_filter_parsed_items(self):
+        from vigilance.parser import Parser
+        from vigilance.representation import QualityReport
+        from vigilance.scope import ChangedFiles
+        class PathParser(Parser):
+            def parse(self, fileContents):
+                return QualityReport([mock.Mock(filePath=path) for path in fileContents.split()])
+        report = PathParser().parse_report('a.py b.py', scope=ChangedFiles(['b.py']))
+        self.assertEqual(['b.py'], [item.filePath for item in report.items])
@@ -12,6 +12,8 @@ class LoadSuitesTest(VigilanceTestCase):
         global load_suites, QualitySuite
         from vigilance.suite import QualitySuite
         from vigilance.plugin import load_suites
+        mock.patch('vigilance.plugin._iter_entry_points', return_value=[]).start()
+        self.addCleanup(mock.patch.stopall)
 
     def test_load_suites_with_malformed_plugin_should_log_warning(self):
         load_suites(['nocolonhere'], disableDefaults=True)
@@ -21,18 +23,60 @@ class LoadSuitesTest(VigilanceTestCase):
     def test_load_suites_with_missing_plugin_module_should_log_warning(self, mockImport):
         mockImport.side_effect = ImportError('that is really not there')
         load_suites(['this.one:isright'], disableDefaults=True)
+        QualitySuite.available_suites()
         self.log.warning.assert_called_once_with('Skipping missing plugin module "%s"', 'this.one')
 
     @mock.patch.object(importlib, 'import_module')
     def test_load_suites_with_missing_plugin_implementation_should_log_warning(self, mockImport):
         mockImport.return_value.goodguy = mock.PropertyMock(side_effect=AttributeError('this is just a mirage'))
         load_suites(['so.close.to:goodguy'], disableDefaults=True)
+        QualitySuite.available_suites()
         self.log.warning.assert_called_once_with('Skipping missing plugin implementation "%s" within plugin "%s"', 'goodguy', 'so.close.to')
 
     def test_load_suites_should_load_default_suites(self):
         load_suites([])
         self.assertEqual(2, len(QualitySuite.available_suites()))
 
+    def test_load_suites_twice_should_register_suites_once(self):
+        load_suites([])
+        QualitySuite.get_suite('cobertura')
+        load_suites([])
+        self.assertEqual(['cobertura', 'doxygen'], sorted(QualitySuite.available_suites()))
+        self.log.warning.assert_not_called()
+
+    def test_load_suites_with_key_of_other_plugin_should_log_warning(self):
+        load_suites(['cobertura=my.plugin:Plugin'])
+        self.log.warning.assert_called_once_with('Skipping plugin "%s"; the quality suite already exists',
+                                                 'cobertura=vigilance.default_suites.cobertura:Default')
+
+    @mock.patch.object(importlib, 'import_module')
+    def test_load_suites_with_keyed_plugin_should_import_only_when_suite_is_used(self, mockImport):
+        mockImport.return_value.Plugin.return_value.get_suite_components.return_value = ('mine', mock.MagicMock(), {}, {})
+        load_suites(['mine=my.plugin:Plugin'])
+        self.assertEqual(['cobertura', 'doxygen', 'mine'], sorted(QualitySuite.available_suites()))
+        mockImport.assert_not_called()
+        self.assertEqual('mine', QualitySuite.get_suite('mine').suiteType)
+        mockImport.assert_called_once_with('my.plugin')
+
+    @mock.patch.object(importlib, 'import_module')
+    def test_load_suites_with_unkeyed_plugin_should_import_only_for_unknown_suites(self, mockImport):
+        mockImport.return_value.Plugin.return_value.get_suite_components.return_value = ('mine', mock.MagicMock(), {}, {})
+        load_suites(['my.plugin:Plugin'], disableDefaults=True)
+        self.assertFalse(QualitySuite.has_suite('other'))
+        mockImport.assert_called_once_with('my.plugin')
+        self.assertTrue(QualitySuite.has_suite('mine'))
+
+    @mock.patch('vigilance.plugin._iter_entry_points')
+    def test_load_suites_should_defer_entry_points_by_name(self, mockEntryPoints):
+        entryPoint = mock.MagicMock()
+        entryPoint.name = 'installed'
+        entryPoint.load.return_value.return_value.get_suite_components.return_value = ('installed', mock.MagicMock(), {}, {})
+        mockEntryPoints.return_value = [entryPoint]
+        load_suites([], disableDefaults=True)
+        self.assertTrue(QualitySuite.has_suite('installed'))
+        entryPoint.load.assert_not_called()
+        self.assertEqual('installed', QualitySuite.get_suite('installed').suiteType)
+
 @mock.patch('vigilance.plugin.open', create=True)
 @mock.patch.object(os, 'path')
 class GetConfiguredPluginsTest(VigilanceTestCase):
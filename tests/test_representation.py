@@ -16,3 +16,62 @@ class QualityReportTest(VigilanceTestCase):
     def test_scrutinize_should_return_dissatisfactions(self):
         dissatisfaction, = self.report.scrutinize(self.mockConstraints)
         self.assertEqual(7, dissatisfaction.message)
+
+    def test_scrutinize_with_limit_should_stop_consuming_items(self):
+        items = iter([6, 7, 7, 8])
+        self.report.items = items
+        self.assertEqual(1, len(self.report.scrutinize(self.mockConstraints, limit=1)))
+        self.assertEqual([7, 8], list(items))
+
+    def test_iter_dissatisfactions_should_consume_items_on_demand(self):
+        items = iter([6, 7, 8, 7])
+        self.report.items = items
+        dissatisfactions = self.report.iter_dissatisfactions(self.mockConstraints)
+        self.assertEqual(7, next(dissatisfactions).message)
+        self.assertEqual([8, 7], list(items))
+
+    def test_iter_dissatisfactions_while_recording_should_time_each_phase(self):
+        from vigilance import instrumentation
+        recorder = instrumentation.Recorder()
+        with instrumentation.recording(recorder):
+            dissatisfaction, = self.report.scrutinize(self.mockConstraints)
+        self.assertEqual(7, dissatisfaction.message)
+        self.assertEqual([3, 3, 3], [recorder.spans[(None, phase)].calls for phase in ['parse', 'constraints_for', 'satisfied_by']])
+
+    def test_iter_dissatisfactions_with_overridden_scrutinize_should_delegate_to_scrutinize(self):
+        from vigilance.representation import QualityReport, Satisfaction
+        class WholeReport(QualityReport):
+            def scrutinize(self, constraints, limit=None):
+                return [Satisfaction(False, 'whole report')]
+        report = WholeReport([6, 7, 8])
+        self.assertEqual(['whole report'], [failure.message for failure in report.iter_dissatisfactions(self.mockConstraints)])
+        self.mockConstraints.constraints_for.assert_not_called()
+
+    def test_scrutinize_overridden_to_extend_the_default_should_evaluate_items(self):
+        from vigilance.representation import QualityReport, Satisfaction
+        class ExtendedReport(QualityReport):
+            def scrutinize(self, constraints, limit=None):
+                return super(ExtendedReport, self).scrutinize(constraints, limit) + [Satisfaction(False, 'extra')]
+        report = ExtendedReport([6, 7, 8])
+        self.assertEqual([7, 'extra'], [failure.message for failure in report.iter_dissatisfactions(self.mockConstraints)])
+
+class SatisfactionTest(VigilanceTestCase):
+    def setUp(self):
+        super(SatisfactionTest, self).setUp()
+        global Satisfaction
+        from vigilance.representation import Satisfaction
+
+    def test_message_with_arguments_should_be_formatted_when_accessed(self):
+        item = mock.MagicMock(identifier='file a')
+        satisfaction = Satisfaction(False, 'Bad {0.identifier} ({1})', item, 5)
+        item.identifier = 'file b'
+        self.assertEqual('Bad file b (5)', satisfaction.message)
+        self.assertFalse(satisfaction.satisfied)
+
+    def test_message_without_arguments_should_be_returned_unchanged(self):
+        self.assertEqual('{0} stays', Satisfaction(False, '{0} stays').message)
+
+    def test_lazy_satisfaction_should_survive_pickling(self):
+        import pickle
+        satisfaction = Satisfaction(False, 'Bad {0}', 'thing')
+        self.assertEqual('Bad thing', pickle.loads(pickle.dumps(satisfaction, pickle.HIGHEST_PROTOCOL)).message)
@@ -0,0 +1,56 @@
+#pylint: skip-file
+import os
+
+from nose_parameterized import parameterized
+from six import StringIO
+
+from util import VigilanceTestCase
+
+class ChangedFilesTest(VigilanceTestCase):
+    def setUp(self):
+        super(ChangedFilesTest, self).setUp()
+        global ChangedFiles
+        from vigilance.scope import ChangedFiles
+        self.scope = ChangedFiles(['vigilance/cli.py', './docs\\index.md', '', 'setup.py'], roots=['/build/repo'])
+
+    @parameterized.expand([
+        ('identical path should match', 'vigilance/cli.py', True),
+        ('normalized path should match', 'docs/index.md', True),
+        ('absolute path below root should match', '/build/repo/vigilance/cli.py', True),
+        ('absolute path outside of root should not match', '/other/vigilance/cli.py', False),
+        ('partial file name should not match', '/build/repo/vigilance/ncli.py', False),
+        ('shorter path should not match', 'cli.py', False),
+        ('root level path should match', '/build/repo/setup.py', True),
+        ('nested path with same name should not match', '/build/repo/vigilance/setup.py', False),
+        ('relative nested path with same name should not match', 'vigilance/setup.py', False),
+        ('missing path should not match', None, False)
+    ])
+    def test_contains_with_(self, _, path, expected):
+        self.assertEqual(expected, path in self.scope)
+
+    def test_contains_without_roots_should_resolve_paths_against_working_directory(self):
+        scope = ChangedFiles(['setup.py'])
+        self.assertIn(os.path.join(os.getcwd(), 'setup.py'), scope)
+        self.assertNotIn(os.path.join(os.getcwd(), 'vigilance', 'setup.py'), scope)
+
+    def test_rooted_should_resolve_paths_against_source_roots_and_their_parents(self):
+        scope = ChangedFiles(['src/pkg/a.py', 'a.py']).rooted(['/build/repo/src'])
+        self.assertEqual(['/build/repo/src'], scope.roots)
+        self.assertIn('pkg/a.py', scope)
+        self.assertNotIn('pkg/b/a.py', scope)
+        self.assertNotIn('/build/repo/src/pkg/b/a.py', scope)
+
+    def test_rooted_without_roots_should_return_same_scope(self):
+        self.assertIs(self.scope, self.scope.rooted(['', ' ']))
+
+    def test_from_file_should_read_one_path_per_line(self):
+        scope = ChangedFiles.from_file(StringIO('a.py\n\nb/c.py\n'))
+        self.assertEqual(frozenset(['a.py', 'b/c.py']), scope.paths)
+
+    def test_filter_should_retain_changed_items_and_items_without_paths(self):
+        class Item(object):
+            def __init__(self, filePath=None):
+                if filePath:
+                    self.filePath = filePath
+        items = [Item('vigilance/cli.py'), Item('vigilance/suite.py'), Item()]
+        self.assertEqual([items[0], items[2]], list(self.scope.filter(items)))
@@ -0,0 +1,121 @@
+#pylint: skip-file
+import os
+import shutil
+import tempfile
+
+import mock
+import numpy # NumPy cannot be re-imported once the test case removes it from sys.modules
+
+from util import VigilanceTestCase
+
+class SnapshotTest(VigilanceTestCase):
+    def setUp(self):
+        super(SnapshotTest, self).setUp()
+        global Snapshot, FileUnderTest, QualityReport
+        from vigilance.configuration import ConfigurationParser
+        from vigilance.constraint import ConstraintSuite
+        from vigilance.default_suites.cobertura import FileUnderTest, LineCoverage
+        from vigilance.plugin.tooling import DefaultStanzas
+        from vigilance.representation import QualityReport
+        from vigilance.snapshot import Snapshot
+        self.constraintSuite = ConstraintSuite({'line': LineCoverage})
+        self.stanzas = {key: stanza(self.constraintSuite) for key, stanza in DefaultStanzas.items()}
+        self.parser = ConfigurationParser(self.stanzas, self.constraintSuite)
+        self.satisfiedBy = mock.patch.object(LineCoverage, 'satisfied_by', autospec=True, side_effect=LineCoverage.satisfied_by).start()
+        self.addCleanup(mock.patch.stopall)
+        self.items = [FileUnderTest('a', 40.0), FileUnderTest('b', 60.0), FileUnderTest('c', 10.0)]
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(SnapshotTest, self).tearDown()
+
+    def constraints(self, *stanzas):
+        return self.parser.parse([{'type': 'global', 'line': 50}] + list(stanzas))
+
+    def run_snapshot(self, snapshot, items, constraints):
+        messages = [failure.message for failure in snapshot.iter_dissatisfactions('cobertura', QualityReport(items), constraints)]
+        snapshot.commit('cobertura')
+        self.assertEqual([failure.message for failure in QualityReport(items).scrutinize(constraints)], messages)
+        return messages
+
+    def baseline(self, items, constraints):
+        snapshot = Snapshot()
+        list(snapshot.iter_dissatisfactions('cobertura', QualityReport(items), constraints))
+        snapshot.commit('cobertura')
+        snapshot.save(self.path)
+        return Snapshot.load(self.path)
+
+    def evaluated(self, snapshot, items, constraints):
+        self.satisfiedBy.reset_mock()
+        list(snapshot.iter_dissatisfactions('cobertura', QualityReport(items), constraints))
+        return [call[0][1].filePath for call in self.satisfiedBy.call_args_list]
+
+    def test_iter_dissatisfactions_without_baseline_should_evaluate_every_item(self):
+        constraints = self.constraints()
+        self.assertEqual(['a', 'b', 'c'], self.evaluated(Snapshot(), self.items, constraints))
+
+    def test_iter_dissatisfactions_should_match_full_evaluation(self):
+        constraints = self.constraints()
+        self.assertEqual(2, len(self.run_snapshot(self.baseline(self.items, constraints), self.items, constraints)))
+
+    def test_iter_dissatisfactions_with_baseline_should_only_evaluate_changed_items(self):
+        constraints = self.constraints()
+        snapshot = self.baseline(self.items, constraints)
+        items = [FileUnderTest('a', 40.0), FileUnderTest('b', 45.0), FileUnderTest('c', 10.0), FileUnderTest('d', 90.0)]
+        self.assertEqual(['b', 'd'], self.evaluated(snapshot, items, constraints))
+        self.run_snapshot(snapshot, items, constraints)
+
+    def test_iter_dissatisfactions_should_distinguish_integer_and_float_metrics(self):
+        constraints = self.constraints()
+        snapshot = self.baseline([FileUnderTest('a', 0)], constraints)
+        self.assertEqual(['a'], self.evaluated(snapshot, [FileUnderTest('a', 0.0)], constraints))
+
+    def test_iter_dissatisfactions_should_only_evaluate_items_whose_constraints_changed(self):
+        snapshot = self.baseline(self.items, self.constraints())
+        constraints = self.constraints({'type': 'file', 'path': '^b', 'line': 70})
+        self.assertEqual(['b'], self.evaluated(snapshot, self.items, constraints))
+        self.assertEqual(3, len(self.run_snapshot(snapshot, self.items, constraints)))
+
+    def test_iter_dissatisfactions_should_always_evaluate_aggregate_constraints(self):
+        from vigilance.default_suites.doxygen import Budget
+        constraints = self.constraints()
+        constraints.index.constraints.append(Budget(0))
+        constraints.index.dynamic.append(len(constraints.index.constraints) - 1)
+        constraints.constraintTypes.append(list(self.constraintSuite.all_types()))
+        snapshot = self.baseline(self.items, constraints)
+        messages = [failure.message for failure in snapshot.iter_dissatisfactions('cobertura', QualityReport(self.items), constraints)]
+        self.assertEqual(['Documentation budget of 0 warning(s) exceeded by file a'], messages)
+
+    def test_iter_dissatisfactions_should_use_evaluation_of_columnar_reports(self):
+        from vigilance.default_suites.cobertura import ColumnarReport
+        constraints = self.constraints()
+        snapshot = self.baseline(self.items, constraints)
+        report = ColumnarReport(self.items)
+        with mock.patch.object(ColumnarReport, 'item', autospec=True, side_effect=ColumnarReport.item) as item:
+            messages = [failure.message for failure in snapshot.iter_dissatisfactions('cobertura', report, constraints)]
+        snapshot.commit('cobertura')
+        self.assertEqual([failure.message for failure in QualityReport(self.items).scrutinize(constraints)], messages)
+        self.assertNotIn(1, [call[0][1] for call in item.call_args_list])
+        self.assertNotIn('cobertura', snapshot.suites)
+        self.assertEqual(3, len(snapshot.baseline['cobertura'].verdicts))
+
+    def test_save_should_keep_baseline_of_uncommitted_suites(self):
+        constraints = self.constraints()
+        snapshot = self.baseline(self.items, constraints)
+        list(snapshot.iter_dissatisfactions('cobertura', QualityReport(self.items[:1]), constraints))
+        snapshot.save(self.path)
+        self.assertEqual(3, len(Snapshot.load(self.path).baseline['cobertura'].verdicts))
+
+    def test_load_with_missing_snapshot_should_log_warning(self):
+        snapshot = Snapshot.load(os.path.join(self.directory, 'missing'))
+        self.assertEqual({}, snapshot.baseline)
+        self.log.warning.assert_called_once_with('Unable to read baseline snapshot "%s"; evaluating every item',
+                                                 os.path.join(self.directory, 'missing'))
+
+    def test_load_with_corrupt_snapshot_should_log_warning(self):
+        with open(self.path, 'wb') as snapshotFile:
+            snapshotFile.write(b'garbage')
+        self.assertEqual({}, Snapshot.load(self.path).baseline)
+        self.assertEqual(1, self.log.warning.call_count)
@@ -0,0 +1,192 @@
+#pylint: skip-file
+import mock
+from six import StringIO
+
+from util import VigilanceTestCase
+
+class QualitySuiteTest(VigilanceTestCase):
+    def setUp(self):
+        super(QualitySuiteTest, self).setUp()
+        from vigilance.cache import ReportCache
+        from vigilance.parser import Parser
+        from vigilance.suite import QualitySuite
+        self.parser = mock.MagicMock(spec=Parser)
+        self.cache = mock.MagicMock(spec=ReportCache)
+        self.suite = QualitySuite('test', self.parser, {}, {})
+
+    def test_parse_report_without_cache_should_parse(self):
+        self.assertEqual(self.parser.parse_report.return_value, self.suite.parse_report('report', {'columnar': True}))
+        self.parser.parse_report.assert_called_once_with('report', lazy=False, columnar=True)
+
+    def test_parse_report_with_cache_hit_should_not_parse(self):
+        self.assertEqual(self.cache.load.return_value, self.suite.parse_report('report', cache=self.cache))
+        self.cache.key.assert_called_once_with(self.parser, 'report', {})
+        self.parser.parse_report.assert_not_called()
+
+    def test_parse_report_with_cache_miss_should_parse_and_store(self):
+        self.cache.load.return_value = None
+        self.parser.parse_report.return_value.items = ['item']
+        self.assertEqual(self.parser.parse_report.return_value, self.suite.parse_report('report', cache=self.cache))
+        self.cache.store.assert_called_once_with(self.cache.key.return_value, self.parser.parse_report.return_value)
+
+    def test_parse_report_with_uncacheable_report_should_parse(self):
+        self.cache.key.return_value = None
+        self.assertEqual(self.parser.parse_report.return_value, self.suite.parse_report('report', cache=self.cache))
+        self.cache.load.assert_not_called()
+
+    def test_parse_report_with_report_the_parser_does_not_cache_should_parse_without_cache(self):
+        self.parser.is_cacheable.return_value = False
+        self.assertEqual(self.parser.parse_report.return_value, self.suite.parse_report('report', cache=self.cache))
+        self.parser.is_cacheable.assert_called_once_with('report')
+        self.cache.key.assert_not_called()
+
+    def test_parse_report_with_scope_should_parse_without_cache(self):
+        self.assertEqual(self.parser.parse_report.return_value, self.suite.parse_report('report', cache=self.cache, scope='scope'))
+        self.parser.parse_report.assert_called_once_with('report', scope='scope', lazy=False)
+        self.cache.key.assert_not_called()
+
+    def test_run_with_parsed_constraints_should_not_parse_constraints(self):
+        from vigilance.constraint import ConstraintSet
+        constraints = mock.MagicMock(spec=ConstraintSet)
+        self.parser.parse_report.return_value.iter_dissatisfactions.return_value = iter([])
+        with mock.patch.object(self.suite.configurationParser, 'parse') as parse:
+            self.suite.run(constraints, 'report', output=mock.MagicMock())
+        parse.assert_not_called()
+        self.parser.parse_report.return_value.iter_dissatisfactions.assert_called_once_with(constraints)
+
+    def test_run_with_limit_should_parse_lazily_and_report_truncation(self):
+        from vigilance.constraint import ConstraintSet
+        from vigilance.error import QualityViolationsDetected
+        from vigilance.representation import Satisfaction
+        quality = self.parser.parse_report.return_value
+        failures = iter([Satisfaction(False, 'first'), Satisfaction(False, 'second'), Satisfaction(False, 'third'),
+                         Satisfaction(False, 'fourth')])
+        quality.iter_dissatisfactions.return_value = failures
+        output = StringIO()
+        with self.assertRaises(QualityViolationsDetected):
+            self.suite.run(mock.MagicMock(spec=ConstraintSet), 'report', output=output, limit=2)
+        self.parser.parse_report.assert_called_once_with('report', lazy=True)
+        quality.close.assert_called_once_with()
+        self.assertEqual('fourth', next(failures).message)
+        self.assertEqual('first\nsecond\nStopped checking test after 2 quality violation(s); further violations may exist\n',
+                         output.getvalue())
+
+    def test_run_with_exactly_limit_violations_should_not_report_truncation(self):
+        from vigilance.constraint import ConstraintSet
+        from vigilance.error import QualityViolationsDetected
+        from vigilance.representation import Satisfaction
+        from vigilance.snapshot import Snapshot
+        snapshot = mock.MagicMock(spec=Snapshot)
+        snapshot.iter_dissatisfactions.return_value = iter([Satisfaction(False, 'first'), Satisfaction(False, 'second')])
+        output = StringIO()
+        with self.assertRaises(QualityViolationsDetected):
+            self.suite.run(mock.MagicMock(spec=ConstraintSet), 'report', output=output, limit=2, snapshot=snapshot)
+        self.assertEqual('first\nsecond\n', output.getvalue())
+        snapshot.commit.assert_called_once_with('test')
+
+    def test_run_with_snapshot_should_evaluate_with_snapshot_and_commit(self):
+        from vigilance.constraint import ConstraintSet
+        from vigilance.snapshot import Snapshot
+        constraints = mock.MagicMock(spec=ConstraintSet)
+        snapshot = mock.MagicMock(spec=Snapshot)
+        snapshot.iter_dissatisfactions.return_value = iter([])
+        self.suite.run(constraints, 'report', output=StringIO(), snapshot=snapshot)
+        snapshot.iter_dissatisfactions.assert_called_once_with('test', self.parser.parse_report.return_value, constraints)
+        snapshot.commit.assert_called_once_with('test')
+
+    def test_run_with_snapshot_and_limit_reached_should_not_commit(self):
+        from vigilance.constraint import ConstraintSet
+        from vigilance.error import QualityViolationsDetected
+        from vigilance.representation import Satisfaction
+        from vigilance.snapshot import Snapshot
+        snapshot = mock.MagicMock(spec=Snapshot)
+        snapshot.iter_dissatisfactions.return_value = iter([Satisfaction(False, 'first'), Satisfaction(False, 'second')])
+        with self.assertRaises(QualityViolationsDetected):
+            self.suite.run(mock.MagicMock(spec=ConstraintSet), 'report', output=StringIO(), limit=1, snapshot=snapshot)
+        snapshot.commit.assert_not_called()
+
+    def test_run_should_write_violations_as_they_are_found(self):
+        from vigilance.constraint import ConstraintSet
+        from vigilance.error import QualityViolationsDetected
+        from vigilance.output import TextWriter
+        from vigilance.representation import Satisfaction
+        output = StringIO()
+        writer = TextWriter(output)
+        writer.BufferSize = 1
+        def failures(constraints):
+            yield Satisfaction(False, 'first')
+            self.assertEqual('first\n', output.getvalue())
+            yield Satisfaction(False, 'second')
+        self.parser.parse_report.return_value.iter_dissatisfactions.side_effect = failures
+        with self.assertRaises(QualityViolationsDetected):
+            self.suite.run(mock.MagicMock(spec=ConstraintSet), 'report', writer=writer)
+        self.assertEqual('first\nsecond\n', output.getvalue())
+
+    def test_run_should_buffer_violations_until_suite_finishes(self):
+        from vigilance.constraint import ConstraintSet
+        from vigilance.error import QualityViolationsDetected
+        from vigilance.representation import Satisfaction
+        output = StringIO()
+        def failures(constraints):
+            yield Satisfaction(False, 'first')
+            self.assertEqual('', output.getvalue())
+        self.parser.parse_report.return_value.iter_dissatisfactions.side_effect = failures
+        with self.assertRaises(QualityViolationsDetected):
+            self.suite.run(mock.MagicMock(spec=ConstraintSet), 'report', output=output)
+        self.assertEqual('first\n', output.getvalue())
+
+    def test_run_while_recording_should_record_phases(self):
+        from vigilance import instrumentation
+        from vigilance.constraint import ConstraintSet
+        from vigilance.error import QualityViolationsDetected
+        from vigilance.representation import Satisfaction
+        recorder = instrumentation.Recorder()
+        self.parser.parse_report.return_value.iter_dissatisfactions.return_value = iter([Satisfaction(False, 'bad')])
+        with instrumentation.recording(recorder), self.assertRaises(QualityViolationsDetected):
+            self.suite.run(mock.MagicMock(spec=ConstraintSet), 'report', output=StringIO())
+        self.assertEqual([('test', 'run'), ('test', 'load report'), ('test', 'output')], list(recorder.spans))
+        self.assertEqual({'violations': 1}, dict(recorder.spans[('test', 'run')].counters))
+        self.assertEqual(1, recorder.spans[('test', 'output')].calls)
+
+    def test_parse_report_with_lazy_option_and_cache_miss_should_stream_into_cache(self):
+        self.cache.load.return_value = None
+        quality = self.parser.parse_report.return_value
+        items = iter(['item'])
+        quality.items = items
+        self.assertEqual(quality, self.suite.parse_report('report', cache=self.cache, lazy=True))
+        self.parser.parse_report.assert_called_once_with('report', lazy=True)
+        self.cache.stream.assert_called_once_with(self.cache.key.return_value, items)
+        self.assertEqual(self.cache.stream.return_value, quality.items)
+        self.cache.store.assert_not_called()
+
+    def test_version_should_depend_on_suite_modules(self):
+        version = self.suite.version()
+        self.assertIn('vigilance.constraint=', version)
+        self.assertIn('mock=', version)
+
+class QualitySuiteRegistryTest(VigilanceTestCase):
+    def setUp(self):
+        super(QualitySuiteRegistryTest, self).setUp()
+        global QualitySuite, UnknownSuite
+        from vigilance.error import UnknownSuite
+        from vigilance.suite import QualitySuite
+
+    def test_defer_suite_with_existing_key_should_raise_ValueError(self):
+        QualitySuite.defer_suite('test', mock.MagicMock())
+        with self.assertRaises(ValueError):
+            QualitySuite.defer_suite('test', mock.MagicMock())
+
+    def test_get_suite_should_load_deferred_suite_once(self):
+        loader = mock.MagicMock(side_effect=lambda: QualitySuite.add_suite('test', mock.MagicMock(), {}, {}))
+        QualitySuite.defer_suite('test', loader)
+        self.assertIs(QualitySuite.get_suite('test'), QualitySuite.get_suite('test'))
+        loader.assert_called_once_with()
+
+    def test_get_suite_with_unknown_key_should_raise_UnknownSuite(self):
+        with self.assertRaises(UnknownSuite):
+            QualitySuite.get_suite('test')
+
+    def test_get_suite_with_failed_deferred_load_should_raise_UnknownSuite(self):
+        QualitySuite.defer_suite('test', mock.MagicMock())
+        with self.assertRaises(UnknownSuite):
+            QualitySuite.get_suite('test')
@@ -0,0 +1,302 @@
+"""@ingroup vigilance
+@file
+Contains on-disk caches for parsed quality reports and compiled configurations.
+"""
+import errno
+import hashlib
+import logging
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+import six
+from six.moves import cPickle as pickle #pylint: disable=import-error
+from vigilance.parser import iter_chunks
+from vigilance.representation import QualityReport
+
+## The default directory in which cache entries are stored.
+DefaultCacheDirectory = os.path.join(os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'vigilance')
+## The default maximum total size, in bytes, of all cache entries.
+DefaultMaxSize = 1 << 30
+## Bumped whenever the format of cache entries changes so that stale entries are never loaded.
+FormatVersion = 7
+## Written at the start of cache entries whose items follow in batches rather than as one pickled report.
+StreamMarker = 'vigilance.stream'
+
+def module_version(module):
+    """Returns a string identifying the version of a loaded module.
+    Modules that define __version__ are identified by it; otherwise the size and modification time of the module's
+    source file are used, which ensures that cached data is invalidated whenever the module is changed.
+    @param module A module object.
+    """
+    version = getattr(module, '__version__', None)
+    if version is not None:
+        return str(version)
+    try:
+        stat = os.stat(module.__file__)
+    except (AttributeError, OSError):
+        return ''
+    return '{}:{}'.format(stat.st_size, stat.st_mtime)
+
+class EntryCache(object):
+    """The storage and eviction of content-addressed cache entries, whose keys are computed by subclasses.
+    Entries are written to a temporary file and renamed into place, so concurrent processes sharing one cache directory
+    never observe partially written entries. Once the entries of a cache grow beyond its size limit, the least
+    recently used of them are evicted. Caches sharing a directory keep their entries apart by their Suffix.
+    """
+    ## The file name suffix of the entries of the cache.
+    Suffix = '.entry'
+    ## Temporary files older than this many seconds are assumed to belong to crashed writers.
+    StaleTemporaryAge = 24 * 60 * 60
+
+    def __init__(self, directory=DefaultCacheDirectory, maxSize=DefaultMaxSize):
+        """Creates a new cache instance.
+        @param directory The directory in which cache entries are stored; it is created if necessary.
+        @param maxSize The maximum total size of all cache entries, in bytes.
+        """
+        self.directory = directory
+        self.maxSize = maxSize
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.Suffix)
+
+    def load(self, key):
+        """Loads a value from the cache.
+        @param key A key returned by the key method of the cache.
+        @returns The stored value, or None if no usable entry exists.
+        """
+        loaded = self._open(key)
+        if loaded is None:
+            return None
+        entry, value = loaded
+        entry.close()
+        return value
+
+    def _open(self, key):
+        """Opens a cache entry and loads the first value pickled into it, marking the entry as recently used.
+        Unreadable entries are logged and removed.
+        @returns A tuple of the open entry, positioned after the value, and the value; or None if no usable entry exists.
+        """
+        path = self._path(key)
+        try:
+            entry = open(path, 'rb')
+        except (IOError, OSError):
+            return None
+        try:
+            value = pickle.load(entry)
+        except Exception: #pylint: disable=broad-except
+            entry.close()
+            logging.getLogger(__name__).warning('Discarding unreadable cache entry "%s"', path)
+            self._remove(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry, value
+
+    def store(self, key, value):
+        """Stores a value in the cache.
+        Failures to write the cache are logged and otherwise ignored.
+        @param key A key returned by the key method of the cache.
+        @param value The picklable value to store.
+        """
+        entry, temporaryPath = self._create_entry(key)
+        if entry is None:
+            return
+        try:
+            with entry:
+                pickle.dump(value, entry, pickle.HIGHEST_PROTOCOL)
+            os.rename(temporaryPath, self._path(key))
+        except (IOError, OSError, AttributeError, TypeError, pickle.PicklingError):
+            logging.getLogger(__name__).warning('Unable to write cache entry "%s"', self._path(key))
+            self._remove(temporaryPath)
+            return
+        self.evict()
+
+    def _create_entry(self, key):
+        """Opens a temporary file for a new cache entry.
+        @returns A tuple of the open file object and its path, or (None, None) if the file could not be created.
+        """
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                logging.getLogger(__name__).warning('Unable to create cache directory "%s"', self.directory)
+                return None, None
+        try:
+            handle, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except (IOError, OSError):
+            logging.getLogger(__name__).warning('Unable to write cache entry "%s"', self._path(key))
+            return None, None
+        return os.fdopen(handle, 'wb'), temporaryPath
+
+    def _dump(self, key, entry, value):
+        """Appends a pickled value to a cache entry that is being written.
+        @returns @p entry, or None if @p entry is None or could not be written, in which case it is closed.
+        """
+        if entry is None:
+            return None
+        try:
+            pickle.dump(value, entry, pickle.HIGHEST_PROTOCOL)
+        except (IOError, OSError, AttributeError, TypeError, pickle.PicklingError):
+            logging.getLogger(__name__).warning('Unable to write cache entry "%s"', self._path(key))
+            entry.close()
+            return None
+        return entry
+
+    def evict(self):
+        """Removes the least recently used cache entries until the cache fits within its size limit.
+        """
+        entries = []
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith(self.Suffix):
+                entries.append((stat.st_mtime, stat.st_size, path))
+            elif name.endswith('.tmp') and now - stat.st_mtime > self.StaleTemporaryAge:
+                self._remove(path)
+        totalSize = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if totalSize <= self.maxSize:
+                break
+            self._remove(path)
+            totalSize -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class ReportCache(EntryCache):
+    """A content-addressed cache of parsed quality reports.
+    Entries are keyed by a hash of the raw report contents, the parser implementation and version, and the parser options.
+    """
+    Suffix = '.report'
+    ## The number of items pickled together by ReportCache.stream; equal values are shared within a batch.
+    BatchSize = 1024
+
+    def key(self, parser, report, options=None):
+        """Computes the cache key for parsing a report.
+        @param parser The vigilance.parser.Parser instance that will parse the report.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report, or a list of them.
+        Seekable file objects are rewound to their original position after hashing.
+        @param options A dictionary of parser options.
+        @returns A string key, or None if @p report cannot be read without consuming it.
+        """
+        sources = report if isinstance(report, list) else [report]
+        positions = []
+        for source in sources:
+            if hasattr(source, 'read') and not isinstance(source, mmap.mmap):
+                try:
+                    positions.append((source, source.tell()))
+                except (AttributeError, IOError, OSError):
+                    return None
+        parserType = type(parser)
+        digest = hashlib.sha256()
+        digest.update(repr((FormatVersion, parserType.__module__, parserType.__name__,
+                            module_version(sys.modules.get(parserType.__module__)),
+                            sorted(six.iteritems(options or {})))).encode('utf-8'))
+        for source in sources:
+            if source is not report:
+                digest.update(b'\0source')
+            for chunk in iter_chunks(source):
+                digest.update(chunk.encode('utf-8') if isinstance(chunk, six.text_type) else chunk)
+        for source, position in positions:
+            source.seek(position)
+        return digest.hexdigest()
+
+    def load(self, key):
+        """Loads a parsed quality report from the cache.
+        Entries written by ReportCache.stream are read on demand, one batch of items at a time.
+        @param key A key returned by ReportCache.key.
+        @returns A vigilance.representation.QualityReport instance, or None if no usable entry exists.
+        """
+        loaded = self._open(key)
+        if loaded is None:
+            return None
+        entry, quality = loaded
+        if isinstance(quality, str) and quality == StreamMarker:
+            return QualityReport(self._iter_batches(entry))
+        entry.close()
+        return quality
+
+    @staticmethod
+    def _iter_batches(entry):
+        with entry:
+            while True:
+                try:
+                    batch = pickle.load(entry)
+                except EOFError:
+                    return
+                for item in batch:
+                    yield item
+
+    def stream(self, key, items):
+        """Stores the items of a lazily parsed quality report in the cache as they are consumed.
+        Items are pickled in batches of BatchSize, so the report is never held in memory as a whole. The entry only
+        becomes visible once every item has been consumed; if consumption stops early, the partial entry is discarded.
+        Failures to write the cache are logged and otherwise ignored.
+        @param key A key returned by ReportCache.key.
+        @param items An iterator over the quality items of the report.
+        @returns A generator yielding the items of @p items.
+        """
+        entry, temporaryPath = self._create_entry(key)
+        entry = self._dump(key, entry, StreamMarker)
+        batch = []
+        try:
+            for item in items:
+                yield item
+                if entry is not None:
+                    batch.append(item)
+                    if len(batch) == self.BatchSize:
+                        entry, batch = self._dump(key, entry, batch), []
+            if batch:
+                entry = self._dump(key, entry, batch)
+            if entry is not None:
+                entry.close()
+                try:
+                    os.rename(temporaryPath, self._path(key))
+                    temporaryPath = None
+                except OSError:
+                    logging.getLogger(__name__).warning('Unable to write cache entry "%s"', self._path(key))
+                else:
+                    self.evict()
+        finally:
+            if entry is not None:
+                entry.close()
+            if temporaryPath is not None:
+                self._remove(temporaryPath)
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+
+class ConfigurationCache(EntryCache):
+    """A content-addressed cache of compiled vigilance configurations.
+    Entries are keyed by a hash of the configuration file contents. Since the compiled configuration depends upon the
+    plugins that parsed it, callers are expected to store the plugin versions alongside it and to verify them on load.
+    """
+    Suffix = '.config'
+
+    def key(self, configuration):
+        """Computes the cache key for a configuration file.
+        @param configuration The string contents of the configuration file.
+        @returns A string key.
+        """
+        digest = hashlib.sha256()
+        digest.update(repr((FormatVersion, type(self).__name__)).encode('utf-8'))
+        digest.update(configuration.encode('utf-8') if isinstance(configuration, six.text_type) else configuration)
+        return digest.hexdigest()
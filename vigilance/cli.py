@@ -2,42 +2,327 @@
 @file
 Contains the console API for Vigilance.
 """
+import glob
+import mmap
+import os
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
 import click
 import six
 import yaml
 
-from voluptuous import Schema, Required, ALLOW_EXTRA
+from voluptuous import All, Any, Length, Schema, Optional, Required, ALLOW_EXTRA
 from voluptuous.error import Invalid
-from vigilance.error import ConfigurationParsingError, UnknownSuite, ReportParsingError
+from vigilance import client, instrumentation
+from vigilance.cache import ConfigurationCache, DefaultCacheDirectory, ReportCache
+from vigilance.error import ConfigurationParsingError, OutputError, UnknownSuite, ReportParsingError, QualityViolationsDetected, VigilanceException
+from vigilance.output import TextWriter, Writers, open_output
 from vigilance.plugin import get_configured_plugins, load_suites
+from vigilance.scope import ChangedFiles
+from vigilance.snapshot import Snapshot
 from vigilance.suite import QualitySuite
 
-load_suites(get_configured_plugins())
-
 ConfigurationSchema = Schema({Required('suites'): {str:
-                                                   Schema({Required('report'): str,
+                                                   Schema({Required('report'): Any(str, All([str], Length(min=1))),
+                                                           Optional('options'): {str: object},
                                                            Required('constraints'):
                                                            Schema([Schema({Required('type'): str}, extra=ALLOW_EXTRA)])})}})
 
-@click.command(short_help='Verify code coverage metrics against a set of constraints')
-@click.option('--config', 'configFile', type=click.File(), default='vigilance.yaml', help='Path to the vigilance configuration file')
-def main(configFile): #pylint: disable=missing-docstring, invalid-name
-    """Runs Vigilance with the specified configuration file.
-    The default configuration file if no options are passed is vigilance.yaml within the current working directory.
+## The YAML loader used for configuration files; the LibYAML based loader is preferred when available.
+YamlLoader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
+def load_configuration(configuration, cache=None):
+    """Loads, validates and compiles a vigilance configuration.
+    @param configuration The string contents of the vigilance configuration file.
+    @param cache A vigilance.cache.ConfigurationCache instance; if provided, compiled configurations are loaded from
+    it as long as the versions of the configured suites are unchanged.
+    @returns A dictionary mapping suite keys to suite configurations. The constraints of each suite configuration are
+    vigilance.constraint.ConstraintSet instances.
+    @throws vigilance.error.ConfigurationParsingError if the configuration is invalid.
+    @throws vigilance.error.UnknownSuite if a configured suite is not available.
     """
+    key = cache.key(configuration) if cache is not None else None
+    cached = cache.load(key) if key is not None else None
+    if cached is not None:
+        versions, suites = cached
+        if all(QualitySuite.has_suite(suite) and QualitySuite.get_suite(suite).version() == version
+               for suite, version in six.iteritems(versions)):
+            return suites
     try:
-        suites = ConfigurationSchema(yaml.full_load(configFile))['suites']
+        with instrumentation.span('load yaml'):
+            suites = ConfigurationSchema(yaml.load(configuration, Loader=YamlLoader))['suites']
     except yaml.YAMLError:
         raise ConfigurationParsingError('Could not load configuration file as yaml')
     except Invalid as ex:
         raise ConfigurationParsingError('Invalid configuration schema: {}'.format(ex.msg))
-    unknownSuites = [suite for suite in six.iterkeys(suites) if suite not in QualitySuite.available_suites()]
+    unknownSuites = [suite for suite in six.iterkeys(suites) if not QualitySuite.has_suite(suite)]
     if unknownSuites:
         raise UnknownSuite('Suites were configured but not available: ' + ', '.join(unknownSuites))
+    versions = {}
     for suiteType, suiteConfig in six.iteritems(suites):
         suite = QualitySuite.get_suite(suiteType)
+        with instrumentation.suite(suiteType), instrumentation.span('configuration'):
+            suiteConfig['constraints'] = suite.parse_constraints(suiteConfig['constraints'])
+        versions[suiteType] = suite.version()
+    if key is not None:
+        cache.store(key, (versions, suites))
+    return suites
+
+@contextmanager
+def open_report(path):
+    """Opens a quality report for parsing without reading it into memory.
+    Regular files are memory mapped so that parsers can consume them zero-copy;
+    sources that cannot be mapped (e.g. empty files or pipes) are provided as binary file objects.
+    @param path The path to the quality report.
+    @returns A context manager yielding a report source suitable for vigilance.parser.Parser.parse_report.
+    @throws IOError if the report cannot be opened.
+    """
+    with open(path, 'rb') as reportFile:
+        try:
+            report = mmap.mmap(reportFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, ValueError, EnvironmentError):
+            yield reportFile
+            return
         try:
-            with open(suiteConfig['report'], 'r') as qualityReport:
-                suite.run(suiteConfig['constraints'], qualityReport.read())
-        except IOError:
-            raise ReportParsingError('Could not open report "{}" for reading'.format(suiteConfig['report']))
+            yield report
+        finally:
+            report.close()
+
+def expand_reports(report):
+    """Expands the "report" key of a suite configuration into report paths.
+    @param report A report path or glob pattern, or a list of them.
+    @returns A list of paths. Patterns that match no file are returned unchanged, so that opening them fails.
+    """
+    paths = []
+    for pattern in [report] if isinstance(report, six.string_types) else report:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+@contextmanager
+def open_reports(paths):
+    """Opens several quality reports for parsing without reading them into memory.
+    The reports are provided as binary file objects rather than memory mapped, so that parsers that merge them in
+    worker processes can reopen them by path instead of copying their contents to the workers.
+    @param paths A list of paths to quality reports.
+    @returns A context manager yielding a list of binary file objects.
+    @throws IOError if any report cannot be opened.
+    """
+    reports = []
+    try:
+        for path in paths:
+            reports.append(open(path, 'rb'))
+        yield reports
+    finally:
+        for report in reversed(reports):
+            report.close()
+
+def run_suite(suiteType, suiteConfig, output=None, cache=None, scope=None, limit=None, writer=None, snapshot=None): #pylint: disable=too-many-arguments
+    """Runs a single configured quality suite.
+    @param suiteType The key of the quality suite to run.
+    @param suiteConfig The validated configuration of the suite.
+    @param output The file object that suite results should be written to if no writer is given; defaults to stdout.
+    @param cache A vigilance.cache.ReportCache instance, if parsed reports should be cached.
+    @param scope A vigilance.scope.ChangedFiles instance, if only the items affected by a change should be checked.
+    @param limit The maximum number of quality violations to report for the suite, if any.
+    @param writer The vigilance.output.ResultWriter that results are reported with, if any; errors that prevent the
+    suite from running to completion are reported with it as well.
+    @param snapshot A vigilance.snapshot.Snapshot instance, if verdicts should be reused from and recorded in a snapshot.
+    @returns None if the suite passed, otherwise the vigilance.error.VigilanceException that it raised.
+    """
+    suite = QualitySuite.get_suite(suiteType)
+    paths = expand_reports(suiteConfig['report'])
+    try:
+        with open_report(paths[0]) if len(paths) == 1 else open_reports(paths) as qualityReport:
+            suite.run(suiteConfig['constraints'], qualityReport, suiteConfig.get('options'), output=output, cache=cache, scope=scope, limit=limit,
+                      writer=writer, snapshot=snapshot)
+    except IOError as ex:
+        error = ReportParsingError('Could not open report "{}" for reading'.format(ex.filename or suiteConfig['report']))
+    except QualityViolationsDetected as ex:
+        return ex
+    except VigilanceException as ex:
+        error = ex
+    else:
+        return None
+    if writer is not None:
+        writer.error(suiteType, str(error))
+    return error
+
+def _run_buffered_suite(arguments):
+    suiteType, suiteConfig, cache, scope, limit, writer, snapshot = arguments
+    output = six.StringIO()
+    return output, run_suite(suiteType, suiteConfig, output, cache, scope, limit, writer.fork(output), snapshot)
+
+def run_suites(suites, jobs=1, cache=None, scope=None, maxViolations=None, failFast=False, output=None, writer=None, snapshot=None): #pylint: disable=too-many-arguments
+    """Runs all configured quality suites.
+    Unless failing fast, every suite is run to completion, even if an earlier suite fails, so that no violations are hidden.
+    When multiple jobs are used, the output of each suite is buffered and written in configuration order.
+    @param suites A list of (suite key, suite configuration) tuples.
+    @param jobs The number of suites that may be run concurrently.
+    @param cache A vigilance.cache.ReportCache instance, if parsed reports should be cached.
+    @param scope A vigilance.scope.ChangedFiles instance, if only the items affected by a change should be checked.
+    @param maxViolations The maximum number of quality violations to report per suite, if any.
+    @param failFast Whether to stop at the first quality violation. Each suite stops at its first violation and,
+    once a suite has failed, the results of the suites after it are not reported.
+    @param output The file object that suite results should be written to if no writer is given; defaults to stdout.
+    @param writer The vigilance.output.ResultWriter that results are reported with; defaults to a
+    vigilance.output.TextWriter writing to output. The header and footer of its document are written as well.
+    @param snapshot A vigilance.snapshot.Snapshot instance, if verdicts should be reused from and recorded in a snapshot.
+    @throws vigilance.error.VigilanceException if any suite failed. Errors take precedence over quality violations.
+    """
+    limit = 1 if failFast else maxViolations
+    writer = writer if writer is not None else TextWriter(output)
+    errors = []
+    writer.begin()
+    try:
+        if jobs > 1 and len(suites) > 1:
+            pool = ThreadPool(min(jobs, len(suites)))
+            try:
+                for suiteOutput, error in pool.imap(_run_buffered_suite, [suite + (cache, scope, limit, writer, snapshot) for suite in suites]):
+                    writer.write(suiteOutput.getvalue())
+                    errors.append(error)
+                    if failFast and error is not None:
+                        break
+            finally:
+                pool.terminate()
+        else:
+            for suiteType, suiteConfig in suites:
+                errors.append(run_suite(suiteType, suiteConfig, output, cache, scope, limit, writer, snapshot))
+                if failFast and errors[-1] is not None:
+                    break
+    finally:
+        writer.end()
+    failures = [(suite, error) for suite, error in zip(suites, errors) if error is not None]
+    for _, error in failures:
+        if not isinstance(error, QualityViolationsDetected):
+            raise error
+    if len(failures) == 1:
+        raise failures[0][1]
+    elif failures:
+        raise QualityViolationsDetected('Quality violations detected for suites: ' + ', '.join(suite[0] for suite, _ in failures))
+
+@click.command(short_help='Verify code coverage metrics against a set of constraints')
+@click.option('--config', 'configFile', type=click.File(), default='vigilance.yaml', help='Path to the vigilance configuration file')
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=1, help='The number of quality suites to run concurrently')
+@click.option('--cache-dir', 'cacheDir', type=click.Path(file_okay=False), default=DefaultCacheDirectory,
+              help='The directory in which parsed quality reports and configurations are cached')
+@click.option('--no-cache', 'noCache', is_flag=True, default=False, help='Always parse quality reports and configurations instead of using the cache')
+@click.option('--changed-files', 'changedFiles', type=click.File(), default=None,
+              help='A file listing changed paths, one per line ("-" for stdin); only items affected by them are checked')
+@click.option('--fail-fast', 'failFast', is_flag=True, default=False, help='Stop at the first quality violation')
+@click.option('--max-violations', 'maxViolations', type=click.IntRange(min=1), default=None,
+              help='Stop checking a suite once this many quality violations have been reported')
+@click.option('--format', 'outputFormat', type=click.Choice(sorted(Writers)), default='text',
+              help='The format of the results: one line per violation (text), counts only (summary), JSON Lines or JUnit XML')
+@click.option('--output', 'outputPath', type=click.Path(dir_okay=False, allow_dash=True), default='-',
+              help='The file that results are written to ("-" for stdout)')
+@click.option('--gzip', 'compress', is_flag=True, default=False, help='Compress the results with gzip; implied by an --output ending in ".gz"')
+@click.option('--dedupe', 'dedupe', is_flag=True, default=False, help='Report repeated violations of a suite only once')
+@click.option('--baseline', 'baselinePath', type=click.Path(dir_okay=False), default=None,
+              help='A snapshot of an earlier run; only items whose metrics or constraints changed since are evaluated')
+@click.option('--snapshot', 'snapshotPath', type=click.Path(dir_okay=False), default=None,
+              help='Write a snapshot of the verdicts of this run, for use as the --baseline of a later run')
+@click.option('--timings', 'timings', type=click.Choice(['text', 'json']), default=None,
+              help='Write the time, calls and peak memory of each phase of the run to stderr')
+@click.option('--profile-dir', 'profileDir', type=click.Path(file_okay=False), default=None,
+              help='Write a cProfile profile and a tracemalloc snapshot of the run to this directory')
+def main(configFile, jobs=1, cacheDir=DefaultCacheDirectory, noCache=False, changedFiles=None, failFast=False, maxViolations=None, #pylint: disable=missing-docstring, invalid-name, too-many-arguments
+         outputFormat='text', outputPath='-', compress=False, dedupe=False, baselinePath=None, snapshotPath=None, timings=None, profileDir=None):
+    """Runs Vigilance with the specified configuration file.
+    The default configuration file if no options are passed is vigilance.yaml within the current working directory.
+    """
+    recorder = instrumentation.Recorder() if timings is not None else None
+    try:
+        with instrumentation.recording(recorder), instrumentation.profiling(profileDir):
+            with instrumentation.span('plugins'):
+                load_suites(get_configured_plugins())
+            with instrumentation.span('configuration'):
+                suites = load_configuration(configFile.read(), None if noCache else ConfigurationCache(cacheDir))
+            scope = ChangedFiles.from_file(changedFiles) if changedFiles is not None else None
+            snapshot = Snapshot.load(baselinePath) if baselinePath is not None else Snapshot() if snapshotPath is not None else None
+            try:
+                output = open_output(outputPath, compress)
+            except (IOError, OSError) as ex:
+                raise OutputError('Unable to write results to "{}": {}'.format(outputPath, ex.strerror))
+            try:
+                with instrumentation.span('run'):
+                    run_suites(list(six.iteritems(suites)), jobs, None if noCache else ReportCache(cacheDir), scope, maxViolations, failFast,
+                               writer=Writers[outputFormat](output, dedupe), snapshot=snapshot)
+            finally:
+                output.close()
+                if snapshotPath is not None:
+                    snapshot.save(snapshotPath)
+    finally:
+        if recorder is not None:
+            click.echo(recorder.to_json() if timings == 'json' else recorder.to_text(), err=True)
+
+@click.command(short_help='Serve quality checks from a resident process')
+@click.option('--config', 'configPath', type=click.Path(dir_okay=False), default='vigilance.yaml', help='Path to the vigilance configuration file')
+@click.option('--socket', 'socketPath', type=click.Path(dir_okay=False), default=client.DefaultSocket, help='Path to the socket to listen on')
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=1, help='The number of quality suites to run concurrently')
+@click.option('--cache-dir', 'cacheDir', type=click.Path(file_okay=False), default=DefaultCacheDirectory,
+              help='The directory in which parsed quality reports and configurations are cached')
+@click.option('--no-cache', 'noCache', is_flag=True, default=False, help='Always parse quality reports and configurations instead of using the cache')
+@click.option('--interval', 'interval', type=click.FloatRange(min=0.01), default=0.5, help='The number of seconds between checks of the reports for changes')
+def serve(configPath='vigilance.yaml', socketPath=client.DefaultSocket, jobs=1, cacheDir=DefaultCacheDirectory, noCache=False, interval=0.5): #pylint: disable=too-many-arguments
+    """Keeps the configured quality suites loaded and answers checks from `vigilance query` until it is stopped.
+    The configuration file and quality reports are watched; checks are re-evaluated in the background when they change.
+    """
+    from vigilance.daemon import QualityServer #pylint: disable=cyclic-import
+    load_suites(get_configured_plugins())
+    server = QualityServer(configPath, jobs, None if noCache else ReportCache(cacheDir), None if noCache else ConfigurationCache(cacheDir), interval)
+    server.serve(socketPath)
+
+@click.command(short_help='Check quality using a running vigilance server', add_help_option=False,
+               context_settings={'ignore_unknown_options': True, 'allow_extra_args': True})
+@click.argument('arguments', nargs=-1, type=click.UNPROCESSED)
+def query(arguments=()):
+    """Checks quality using a running vigilance server; accepts the same options as vigilance.client.
+    """
+    client.main(list(arguments))
+
+@click.command(short_help='Convert quality reports into the binary columnar format')
+@click.argument('reports', nargs=-1, required=True)
+@click.option('--output', '-o', 'outputPath', type=click.Path(dir_okay=False), required=True, help='Path to the binary columnar report to write')
+@click.option('--suite', 'suiteType', default='cobertura', help='The quality suite whose parser reads the reports')
+@click.option('--jobs', '-j', 'jobs', type=click.IntRange(min=1), default=None, help='The number of processes used to parse the reports')
+def convert(reports, outputPath, suiteType='cobertura', jobs=None):
+    """Converts quality reports into a binary columnar report, which the suite loads in a fraction of the time.
+    REPORTS are report paths or glob patterns; several reports are merged into one. The binary report can be
+    configured as the "report" of the suite in place of the original reports.
+    """
+    load_suites(get_configured_plugins())
+    suite = QualitySuite.get_suite(suiteType)
+    if not hasattr(suite.reportParser, 'convert'):
+        raise ReportParsingError('Reports of the {} suite cannot be converted'.format(suiteType))
+    paths = expand_reports(list(reports))
+    temporaryPath = '{}.{}.tmp'.format(outputPath, os.getpid())
+    try:
+        with open_report(paths[0]) if len(paths) == 1 else open_reports(paths) as report, open(temporaryPath, 'wb') as output:
+            rows = suite.reportParser.convert(report, output, processes=jobs)
+        getattr(os, 'replace', os.rename)(temporaryPath, outputPath)
+    except IOError as ex:
+        if ex.filename == temporaryPath:
+            raise ReportParsingError('Could not write report "{}"'.format(outputPath))
+        raise ReportParsingError('Could not open report "{}" for reading'.format(ex.filename))
+    finally:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+    click.echo('Converted {} item(s) into {}'.format(rows, outputPath))
+
+class DefaultGroup(click.Group):
+    """A command group that runs its default command when no other command is named.
+    This keeps `vigilance [OPTIONS]` equivalent to `vigilance check [OPTIONS]`.
+    """
+    def __init__(self, *args, **kwargs):
+        self.defaultCommand = kwargs.pop('defaultCommand')
+        super(DefaultGroup, self).__init__(*args, **kwargs)
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in self.get_help_option_names(ctx)):
+            args.insert(0, self.defaultCommand)
+        return super(DefaultGroup, self).parse_args(ctx, args)
+
+## The vigilance command line, whose default command is main.
+cli = DefaultGroup(name='vigilance', commands={'check': main, 'serve': serve, 'query': query, 'convert': convert}, defaultCommand='check',
+                   help='Verifies code quality metrics against a set of constraints. Runs "check" unless another command is given.')
@@ -0,0 +1,75 @@
+"""@ingroup vigilance
+@file
+Contains the client for the resident vigilance server.
+Only the standard library is imported so that a query starts in a fraction of the time needed to load the suites.
+"""
+import argparse
+import json
+import socket
+import sys
+
+## The path of the Unix socket that the server listens on by default.
+DefaultSocket = '.vigilance.sock'
+## The exit code used when the server cannot be reached; matches vigilance.error.ServerUnavailable.
+ServerUnavailableExitCode = -5
+
+def query(request, socketPath=DefaultSocket):
+    """Sends a request to a vigilance server and waits for its response.
+    @param request A dictionary describing the request; see vigilance.daemon.QualityServer.handle.
+    @param socketPath The path of the Unix socket that the server listens on.
+    @returns The response of the server as a dictionary.
+    @throws socket.error if the server cannot be reached.
+    @throws ValueError if the response is malformed.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socketPath)
+        connection.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        chunks = []
+        while True:
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        connection.close()
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+def parse_arguments(arguments=None):
+    """Parses the command line of a query.
+    @param arguments The command line arguments, excluding the program name; defaults to sys.argv.
+    @returns An argparse.Namespace instance.
+    """
+    parser = argparse.ArgumentParser(prog='vigilance query', description='Queries a running vigilance server.')
+    parser.add_argument('--socket', dest='socketPath', default=DefaultSocket, help='Path to the socket of the vigilance server')
+    parser.add_argument('--changed-files', dest='changedFiles', type=argparse.FileType('r'), default=None,
+                        help='A file listing changed paths, one per line ("-" for stdin); only items affected by them are checked')
+    parser.add_argument('--fail-fast', dest='failFast', action='store_true', help='Stop at the first quality violation')
+    parser.add_argument('--max-violations', dest='maxViolations', type=int, default=None,
+                        help='Stop checking a suite once this many quality violations have been reported')
+    parser.add_argument('--stop', action='store_true', help='Stop the server instead of querying it')
+    return parser.parse_args(arguments)
+
+def main(arguments=None):
+    """Queries a running vigilance server and reports its results like a regular vigilance run.
+    @param arguments The command line arguments, excluding the program name; defaults to sys.argv.
+    @returns Does not return; exits with the exit code of the check.
+    """
+    options = parse_arguments(arguments)
+    if options.stop:
+        request = {'command': 'stop'}
+    else:
+        request = {'command': 'check', 'failFast': options.failFast, 'maxViolations': options.maxViolations,
+                   'changedFiles': [line for line in options.changedFiles] if options.changedFiles is not None else None}
+    try:
+        response = query(request, options.socketPath)
+    except (socket.error, ValueError) as ex:
+        sys.stderr.write('Error: Could not query vigilance server at "{}": {}\n'.format(options.socketPath, ex))
+        sys.exit(ServerUnavailableExitCode)
+    sys.stdout.write(response.get('output', ''))
+    if response.get('message'):
+        sys.stderr.write('Error: {}\n'.format(response['message']))
+    sys.exit(response.get('exitCode', 0))
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,10 @@ class ConfigurationStanza(object):
     """Represents a single stanza within a vigilance configuration file.
     These stanzas exist to easily allow configuration of vigilance constraints that should be applied to a codebase.
     """
+    ## Whether the constraints of the stanza are defaults, like those of the "global" stanza, which filtered
+    ## constraints of the same type override.
+    Defaults = False
+
     def __init__(self, suite):
         self.suite = suite
 
@@ -47,7 +51,7 @@ class ConfigurationParser(object):
                 logging.getLogger(__name__).warning('Skipping malformed constraint stanza; unknown type "%s"', entryType)
                 continue
             constraints = stanza.parse(entry)
-            if entryType == 'global':
+            if entryType == 'global' or stanza.Defaults:
                 if globalConstraints:
                     logging.getLogger(__name__).warning('Skipping duplicate global configuration stanza')
                     continue
@@ -4,9 +4,10 @@ Contains definitions of code coverage constraints.
 """
 import re
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
 
 import six
-from vigilance.representation import Satisfaction
+from vigilance.representation import Satisfied
 
 @six.add_metaclass(ABCMeta)
 class Constraint(object):
@@ -33,12 +34,56 @@ class Constraint(object):
         """
         return True
 
+    def reset(self):
+        """Discards any state that the Constraint has accumulated while checking a quality report.
+        Constraints that aggregate over several items (e.g. budgets) keep such state; it is reset before every report
+        is scrutinized so that compiled constraints can be reused.
+        """
+        pass
+
+    def signature(self):
+        """Returns a string that identifies the Constraint across runs, so that a snapshot of an earlier run can tell
+        whether the constraints applied to an item have changed (see vigilance.snapshot).
+        The default implementation describes the type of the Constraint and its attributes. Constraints that aggregate
+        over several items (i.e. that override reset) have no signature, since their verdict for an item also depends
+        on the other items of the report.
+        @returns A string, or None if the verdicts of the Constraint must never be reused.
+        """
+        if six.get_unbound_function(type(self).reset) is not six.get_unbound_function(Constraint.reset):
+            return None
+        return '{}.{}{!r}'.format(type(self).__module__, type(self).__name__, sorted(six.iteritems(getattr(self, '__dict__', {}))))
+
+def package_path(item):
+    """Determines the package path of an item under test, which package constraints are matched against.
+    Packages are identified by the segments of their dotted name and files by the directories of their path, so the
+    files of package "a.b" are expected at "a/b/". Package paths are case insensitive.
+    @param item A vigilance.representation.QualityItem instance.
+    @returns A list of lowercase path segments, or None if the item is neither a package nor a file.
+    """
+    name = getattr(item, 'name', None)
+    if isinstance(name, six.string_types):
+        return name.lower().split('.')
+    filePath = getattr(item, 'filePath', None)
+    if isinstance(filePath, six.string_types):
+        return directory_path(filePath)
+    return None
+
+def directory_path(filePath):
+    """Determines the package path of a file from its path; see package_path.
+    @param filePath The path of the file.
+    @returns A list of lowercase path segments.
+    """
+    return [segment for segment in filePath.lower().replace('\\', '/').split('/')[:-1] if segment not in ('', '.')]
+
 class PackageConstraint(Constraint):
-    """A Constraint decorator that applies a Constraint to a specific package only.
+    """A Constraint decorator that applies a Constraint to a package, its sub-packages and the files within them.
+    Where the package constraints of several nested packages apply to an item, the most specific one takes precedence;
+    see ConstraintSet.
     """
     def __init__(self, constraint, packageName):
         self.constraint = constraint
         self.packageName = packageName.lower()
+        self.segments = self.packageName.split('.')
 
     def is_of_type(self, constraintType):
         return type(self.constraint) == constraintType
@@ -46,36 +91,111 @@ class PackageConstraint(Constraint):
     def satisfied_by(self, item):
         return self.constraint.satisfied_by(item)
 
+    def reset(self):
+        self.constraint.reset()
+
+    def signature(self):
+        signature = self.constraint.signature()
+        return None if signature is None else 'PackageConstraint({!r}, {})'.format(self.packageName, signature)
+
     def applies_to(self, item):
-        return hasattr(item, 'name') and item.name.lower() == self.packageName
+        path = package_path(item)
+        return path is not None and path[:len(self.segments)] == self.segments
+
+class LazyRegex(object):
+    """A regex that is compiled when it is first searched with.
+    Compiled regexes are pickled as their source and compiled again as they are unpickled, which would dominate the
+    time it takes to load a cached configuration. A LazyRegex is pickled as its source as well, but only compiled
+    once it is used.
+    """
+    __slots__ = ('pattern', 'flags', '_regex')
+
+    def __init__(self, pattern, flags=0, regex=None):
+        """Creates a new LazyRegex instance.
+        @param pattern The source of the regex.
+        @param flags The flags of the regex.
+        @param regex The regex compiled from @p pattern and @p flags, if it has been compiled already.
+        """
+        self.pattern = pattern
+        self.flags = flags
+        self._regex = regex
+
+    @classmethod
+    def of(cls, regex):
+        """Wraps a regex.
+        @param regex A compiled regex, the source of one or a LazyRegex instance.
+        @returns A LazyRegex instance.
+        """
+        if isinstance(regex, LazyRegex):
+            return regex
+        if isinstance(regex, (six.text_type, bytes)):
+            return cls(regex)
+        return cls(regex.pattern, regex.flags, regex)
+
+    def compiled(self):
+        """Returns the compiled regex, compiling it on first use.
+        """
+        if self._regex is None:
+            self._regex = re.compile(self.pattern, self.flags)
+        return self._regex
+
+    def search(self, string):
+        return self.compiled().search(string)
+
+    def __getstate__(self):
+        return self.pattern, self.flags
+
+    def __setstate__(self, state):
+        self.pattern, self.flags = state
+        self._regex = None
+
+    def __repr__(self):
+        return 'LazyRegex({!r}, {})'.format(self.pattern, self.flags)
 
 class FileConstraint(Constraint):
     """A Constraint decorator that applies a Constraint to specific files only.
+    Compiled path regexes are pickled as LazyRegex instances.
     """
     def __init__(self, constraint, pathRegex):
         self.constraint = constraint
         self.pathRegex = pathRegex
 
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if not isinstance(self.pathRegex, (six.text_type, bytes)):
+            state['pathRegex'] = LazyRegex.of(self.pathRegex)
+        return state
+
     def is_of_type(self, constraintType):
         return type(self.constraint) == constraintType
 
     def satisfied_by(self, item):
         return self.constraint.satisfied_by(item)
 
+    def reset(self):
+        self.constraint.reset()
+
+    def signature(self):
+        signature = self.constraint.signature()
+        return None if signature is None else 'FileConstraint({!r}, {})'.format(LazyRegex.of(self.pathRegex), signature)
+
     def applies_to(self, item):
-        return hasattr(item, 'filePath') and re.search(self.pathRegex, item.filePath) is not None
+        return hasattr(item, 'filePath') and LazyRegex.of(self.pathRegex).search(item.filePath) is not None
 
 class IgnoreFiles(Constraint):
     """A Constraint that causes specified files to be ignored from vigilance entirely.
     """
     def __init__(self, paths):
-        self.paths = paths
+        """Creates a new IgnoreFiles instance.
+        @param paths A collection of the exact paths of the ignored files; a single path may be given as a string.
+        """
+        self.paths = [paths] if isinstance(paths, six.string_types) else paths
 
     def is_of_type(self, _):
         return True
 
     def satisfied_by(self, _):
-        return Satisfaction(True)
+        return Satisfied
 
     def applies_to(self, item):
         return hasattr(item, 'filePath') and item.filePath in self.paths
@@ -111,22 +231,405 @@ class ConstraintSuite(object):
         return {constraintType: [constraint for constraint in constraints if constraint.is_of_type(constraintType)]
                 for constraintType in self.all_types()}
 
+class PackageTrie(object):
+    """A prefix tree of package paths, which finds the package constraints of an item and all of its ancestor packages
+    in time proportional to the depth of the item rather than the number of package constraints.
+    """
+    __slots__ = ('children', 'positions')
+
+    def __init__(self):
+        self.children = {}
+        self.positions = []
+
+    def __bool__(self):
+        return bool(self.children)
+
+    __nonzero__ = __bool__
+
+    def insert(self, segments, position):
+        """Adds a package constraint to the trie.
+        @param segments The package path of the constraint; see package_path.
+        @param position The position of the constraint within the indexed constraint list.
+        """
+        node = self
+        for segment in segments:
+            node = node.children.setdefault(segment, PackageTrie())
+        node.positions.append(position)
+
+    def lookup(self, segments):
+        """Finds the package constraints along a package path.
+        @param segments The package path of an item; see package_path.
+        @returns A list of position lists, one for each package on the path that has constraints, the most specific first.
+        """
+        matches = []
+        node = self
+        for segment in segments:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.positions:
+                matches.append(node.positions)
+        matches.reverse()
+        return matches
+
+class PathLiterals(object):
+    """File path regexes that are plain literals anchored to the start and/or the end of the path (e.g. "^src/main\\.py$"
+    or "/generated\\.py$"), which are matched through hash lookups of the prefixes and suffixes of a path rather than
+    by searching the path with each regex.
+    """
+    ## The characters that have a special meaning in a regex unless they are escaped.
+    _Special = frozenset('.^$*+?{}[]|()')
+
+    def __init__(self):
+        self.exact = {}
+        self.prefixes = {}
+        self.suffixes = {}
+        self.prefixLengths = []
+        self.suffixLengths = []
+
+    def __bool__(self):
+        return bool(self.exact or self.prefixes or self.suffixes)
+
+    __nonzero__ = __bool__
+
+    @classmethod
+    def parse(cls, pattern):
+        """Determines whether a regex is an anchored literal.
+        @param pattern The source of the regex.
+        @returns A tuple of (literal, anchored at start, anchored at end), or None if @p pattern is not a literal
+        anchored to at least one end of the path.
+        """
+        atStart = pattern.startswith('^')
+        atEnd = False
+        literal = []
+        index = 1 if atStart else 0
+        while index < len(pattern):
+            character = pattern[index]
+            if character == '\\':
+                index += 1
+                if index == len(pattern) or pattern[index].isalnum() or pattern[index] == '_':
+                    return None
+                literal.append(pattern[index])
+            elif character == '$' and index == len(pattern) - 1:
+                atEnd = True
+            elif character in cls._Special:
+                return None
+            else:
+                literal.append(character)
+            index += 1
+        if not atStart and not atEnd:
+            return None
+        return ''.join(literal), atStart, atEnd
+
+    def add(self, literal, atStart, atEnd, positions):
+        """Adds an anchored literal.
+        @param positions The positions of the constraints within the indexed constraint list whose regex it is.
+        """
+        if atStart and atEnd:
+            self.exact.setdefault(literal, []).extend(positions)
+            return
+        literals, lengths = (self.prefixes, self.prefixLengths) if atStart else (self.suffixes, self.suffixLengths)
+        literals.setdefault(literal, []).extend(positions)
+        if len(literal) not in lengths:
+            lengths.append(len(literal))
+
+    def match(self, path, positions):
+        """Finds the literals that match a path.
+        @param path The path of a file.
+        @param positions The list that the positions of the matching literals are appended to.
+        """
+        if path.endswith('\n'):
+            # Like the regexes they stand for, literals anchored with "$" also match before a trailing newline.
+            matches = []
+            self._match_end(path, matches)
+            self._match_end(path[:-1], matches)
+            positions.extend(set(matches))
+        else:
+            self._match_end(path, positions)
+        for length in self.prefixLengths:
+            positions.extend(self.prefixes.get(path[:length], ()))
+
+    def _match_end(self, end, positions):
+        positions.extend(self.exact.get(end, ()))
+        for length in self.suffixLengths:
+            if length <= len(end):
+                positions.extend(self.suffixes.get(end[len(end) - length:], ()))
+
+class PatternTree(object):
+    """A tree of combined file path regexes, which finds every regex that matches a path with a number of
+    searches proportional to the number of matching regexes times the depth of the tree rather than to the number of
+    regexes. Each node combines the regexes of its subtree into a single alternation; a search with the combined regex
+    fails if and only if every regex of the subtree would fail, so subtrees without a match are skipped in one scan.
+    Compiling the alternations of a level of the tree costs about as much as compiling each of its regexes, so the
+    tree is kept shallow, and nodes are only built, and their alternations compiled, once a search first reaches them.
+    """
+    __slots__ = ('patterns', 'regex', 'positions', 'children')
+    ## The number of subtrees of each node; wider nodes mean fewer levels of alternations to compile, at the cost of
+    # more searches below each node whose alternation matches.
+    Branching = 8
+
+    def __init__(self, patterns):
+        """Creates a new PatternTree instance.
+        @param patterns A non-empty list of tuples of (LazyRegex instance, list of positions within the indexed
+        constraint list of the constraints using it). The regexes must have no groups and no flags other than re.UNICODE.
+        """
+        self.patterns = patterns
+        self.regex = None
+        self.positions = ()
+        self.children = None
+
+    def __getstate__(self):
+        return self.patterns
+
+    def __setstate__(self, patterns):
+        self.__init__(patterns)
+
+    def _build(self):
+        patterns = self.patterns
+        if len(patterns) == 1:
+            self.regex, self.positions = patterns[0]
+            self.children = ()
+            return
+        try:
+            self.regex = re.compile('|'.join('(?:{})'.format(regex.pattern) for regex, _ in patterns))
+        except re.error:
+            self.regex = None
+        size = -(-len(patterns) // self.Branching)
+        self.children = tuple(PatternTree(patterns[start:start + size]) for start in six.moves.range(0, len(patterns), size))
+
+    def search(self, path, positions):
+        """Finds the regexes that match a path.
+        @param path The path of a file.
+        @param positions The list that the positions of the constraints using the matching regexes are appended to.
+        """
+        if self.children is None:
+            self._build()
+        if self.regex is not None and self.regex.search(path) is None:
+            return
+        positions.extend(self.positions)
+        for child in self.children:
+            child.search(path, positions)
+
+class ConstraintIndex(object):
+    """A precompiled lookup structure that determines which filtered constraints apply to an item under test.
+    The filter constraints provided by vigilance are indexed up front: IgnoreFiles paths are resolved through hash
+    lookups, PackageConstraint names through a PackageTrie whose lookups are memoized per package name and directory,
+    FileConstraint path regexes that are anchored literals through PathLiterals, and all other FileConstraint path
+    regexes that can be combined through a PatternTree.
+    Any other constraint is considered dynamic and is always checked with Constraint.applies_to.
+    """
+    _Missing = object()
+
+    def __init__(self, constraints):
+        """Creates a new ConstraintIndex instance.
+        @param constraints A list of Constraint instances.
+        """
+        self.constraints = constraints
+        self.paths = {}
+        self.packages = PackageTrie()
+        self._packageMatches = {}
+        self._directoryMatches = {}
+        patterns = []
+        self.dynamic = []
+        for position, constraint in enumerate(constraints):
+            if type(constraint) is IgnoreFiles and self._index_paths(position, constraint.paths):
+                continue
+            elif type(constraint) is PackageConstraint:
+                self.packages.insert(constraint.segments, position)
+            elif type(constraint) is FileConstraint:
+                patterns.append((position, LazyRegex.of(constraint.pathRegex).compiled()))
+            else:
+                self.dynamic.append(position)
+        self.literals, self.screen, self.unscreened = self._index_patterns(patterns)
+
+    def _index_paths(self, position, paths):
+        try:
+            paths = set(paths)
+        except TypeError:
+            return False
+        for path in paths:
+            self.paths.setdefault(path, []).append(position)
+        return True
+
+    @staticmethod
+    def _index_patterns(patterns):
+        """Sorts file path regexes into anchored literals, regexes that can be safely combined into a PatternTree and
+        all others. Regexes shared by several constraints (e.g. the constraints of a single file stanza) are indexed
+        only once.
+        @returns A tuple of a PathLiterals instance, a PatternTree instance (or None) and a list of tuples of
+        (position, LazyRegex instance) that have to be searched individually.
+        """
+        literals = PathLiterals()
+        mergeable = OrderedDict()
+        unscreened = []
+        for position, regex in patterns:
+            if isinstance(regex.pattern, six.string_types) and regex.groups == 0 and regex.flags & ~re.UNICODE == 0:
+                mergeable.setdefault(regex.pattern, (LazyRegex.of(regex), []))[1].append(position)
+            else:
+                unscreened.append((position, LazyRegex.of(regex)))
+        combined = []
+        for pattern, (regex, positions) in six.iteritems(mergeable):
+            literal = PathLiterals.parse(pattern)
+            if literal is not None:
+                literals.add(literal[0], literal[1], literal[2], positions)
+            else:
+                combined.append((regex, positions))
+        return literals, PatternTree(combined) if combined else None, unscreened
+
+    def applicable(self, item):
+        """Determines the constraints other than package constraints that apply to a single item under test.
+        @param item A vigilance.representation.QualityItem instance.
+        @returns A sorted list of positions within the indexed constraint list.
+        """
+        positions = [position for position in self.dynamic if self.constraints[position].applies_to(item)]
+        filePath = getattr(item, 'filePath', self._Missing)
+        if filePath is not self._Missing:
+            positions.extend(self.applicable_paths(filePath))
+        positions.sort()
+        return positions
+
+    def applicable_paths(self, filePath):
+        """Determines the indexed constraints other than package constraints that apply to a file, given its path alone.
+        @param filePath The path of the file.
+        @returns A sorted list of positions within the indexed constraint list.
+        """
+        positions = list(self.paths.get(filePath, ()))
+        if self.literals:
+            self.literals.match(filePath, positions)
+        if self.screen is not None:
+            self.screen.search(filePath, positions)
+        positions.extend(position for position, regex in self.unscreened if regex.search(filePath) is not None)
+        positions.sort()
+        return positions
+
+    def applicable_packages(self, item):
+        """Determines the package constraints that apply to a single item under test.
+        @param item A vigilance.representation.QualityItem instance.
+        @returns A list of position lists, one for each enclosing package that has constraints, the most specific first.
+        """
+        if not self.packages:
+            return []
+        name = getattr(item, 'name', None)
+        if isinstance(name, six.string_types):
+            return self.applicable_package_name(name)
+        filePath = getattr(item, 'filePath', None)
+        if isinstance(filePath, six.string_types):
+            return self.applicable_file_packages(filePath)
+        return []
+
+    def applicable_package_name(self, name):
+        """Determines the package constraints that apply to a package, given its name alone.
+        Lookups are memoized by package name.
+        @param name The dotted name of the package.
+        @returns A list of position lists, one for each enclosing package that has constraints, the most specific first.
+        """
+        matches = self._packageMatches.get(name)
+        if matches is None:
+            matches = self._packageMatches[name] = self.packages.lookup(name.lower().split('.')) if self.packages else []
+        return matches
+
+    def applicable_file_packages(self, filePath):
+        """Determines the package constraints that apply to a file, given its path alone.
+        Lookups are memoized by directory, so the files of a directory share a single package lookup.
+        @param filePath The path of the file.
+        @returns A list of position lists, one for each enclosing package that has constraints, the most specific first.
+        """
+        directory = filePath[:max(filePath.rfind('/'), filePath.rfind('\\')) + 1]
+        matches = self._directoryMatches.get(directory)
+        if matches is None:
+            matches = self._directoryMatches[directory] = self.packages.lookup(directory_path(filePath)) if self.packages else []
+        return matches
+
 class ConstraintSet(object):
     """Determines which constraints apply to each item under test.
     This "override" functionality allows specific projects/files within a codebase to be given
-    different constraints than the global default constraints.
+    different constraints than the global default constraints. For each type of constraint, the filtered constraints
+    that apply to an item directly (e.g. file and ignore constraints) take precedence over package constraints, the
+    constraints of the most specific enclosing package take precedence over those of its ancestors, and the global
+    constraints apply only where no filtered constraint does.
+    Filtered constraints are compiled into a ConstraintIndex when the set is created so that resolving the
+    constraints for an item does not require scanning every filtered constraint. Items that resolve to the same
+    filtered constraints share a single list of constraints.
     """
     def __init__(self, constraintSuite, globalConstraints, filteredConstraints):
         self.constraintSuite = constraintSuite
         self.globalConstraints = self.constraintSuite.group_constraints(globalConstraints)
         self.filteredConstraints = self.constraintSuite.group_constraints(filteredConstraints)
+        self.index = ConstraintIndex(filteredConstraints)
+        self.defaults = []
+        constraintTypes = {}
+        for ctype in self.constraintSuite.all_types():
+            self.defaults.extend(self.globalConstraints[ctype])
+            for constraint in self.filteredConstraints[ctype]:
+                types = constraintTypes.setdefault(id(constraint), [])
+                if ctype not in types:
+                    types.append(ctype)
+        self.constraintTypes = [constraintTypes.get(id(constraint), []) for constraint in filteredConstraints]
+        self._combined = {}
+
+    def reset(self):
+        """Resets the state of every constraint in the set before a quality report is scrutinized.
+        @see Constraint.reset
+        """
+        for constraints in six.itervalues(self.globalConstraints):
+            for constraint in constraints:
+                constraint.reset()
+        for constraint in self.index.constraints:
+            constraint.reset()
 
     def constraints_for(self, item):
         """Retrieves all constraints that should be considered for a single item under test.
         @param item A vigilance.representation.QualityItem instance.
-        @returns A list of Constraint instances.
+        @returns A list of Constraint instances. The list may be shared between items and must not be modified.
         """
+        return self._combine(self.index.applicable(item), self.index.applicable_packages(item))
+
+    def resolves_names(self):
+        """Returns whether constraints_for_name can resolve the constraints of every item, which is the case unless a
+        filtered constraint has to inspect the items themselves (see ConstraintIndex).
+        """
+        return not self.index.dynamic
+
+    def constraints_for_name(self, name, package=False):
+        """Retrieves the constraints for an item under test from its identity alone, i.e. without the item itself.
+        The result is that of constraints_for for a file item with the filePath @p name or a package item with the
+        name @p name, provided that resolves_names is True.
+        @param name The path of a file or the dotted name of a package.
+        @param package Whether @p name is the name of a package.
+        @returns A list of Constraint instances. The list may be shared between items and must not be modified.
+        """
+        if package:
+            return self._combine([], self.index.applicable_package_name(name))
+        return self._combine(self.index.applicable_paths(name), self.index.applicable_file_packages(name))
+
+    def _combine(self, positions, packages):
+        """Combines the filtered constraints that apply to an item with the global constraints.
+        @param positions A sorted list of the positions of the applicable filtered constraints other than package constraints.
+        @param packages A list of position lists of the applicable package constraints, the most specific package first.
+        @returns The list of Constraint instances, shared between all items with the same filtered constraints.
+        """
+        if not positions and not packages:
+            return self.defaults
+        key = (tuple(positions), tuple(position for packagePositions in packages for position in packagePositions))
+        constraints = self._combined.get(key)
+        if constraints is None:
+            constraints = self._combined[key] = self._resolve(positions, packages)
+        return constraints
+
+    def _resolve(self, positions, packages):
+        applicable = {}
+        for position in positions:
+            constraint = self.index.constraints[position]
+            for ctype in self.constraintTypes[position]:
+                applicable.setdefault(ctype, []).append(constraint)
+        for packagePositions in packages:
+            overridden = set(applicable)
+            for position in packagePositions:
+                constraint = self.index.constraints[position]
+                for ctype in self.constraintTypes[position]:
+                    if ctype not in overridden:
+                        applicable.setdefault(ctype, []).append(constraint)
         constraints = []
         for ctype in self.constraintSuite.all_types():
-            constraints.extend([c for c in self.filteredConstraints[ctype] if c.applies_to(item)] or self.globalConstraints[ctype])
+            constraints.extend(applicable.get(ctype) or self.globalConstraints[ctype])
         return constraints
@@ -0,0 +1,225 @@
+"""@ingroup vigilance
+@file
+Contains the resident vigilance server, which keeps configured quality suites loaded between checks.
+"""
+import errno
+import json
+import logging
+import os
+import socket
+import threading
+from contextlib import closing
+
+import six
+from vigilance.cli import expand_reports, load_configuration, run_suites
+from vigilance.error import ConfigurationParsingError, ServerUnavailable, VigilanceException
+from vigilance.scope import ChangedFiles
+
+## The number of seconds between checks of the watched files for changes.
+DefaultPollInterval = 0.5
+## The maximum number of distinct check results kept in memory for unchanged files.
+MaxResults = 64
+## The number of seconds that a client may take to send its request or receive the response before it is disconnected.
+RequestTimeout = 10.0
+
+def file_signature(path):
+    """Summarizes the state of a file so that modifications can be detected without reading it.
+    @param path The path of the file.
+    @returns A tuple of the modification time, size and inode of the file, or None if it does not exist.
+    """
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    return (getattr(status, 'st_mtime_ns', status.st_mtime), status.st_size, status.st_ino)
+
+def make_response(output='', error=None):
+    """Creates the response to a client request.
+    @param output The output of the request.
+    @param error The vigilance.error.VigilanceException that the request failed with, if any.
+    @returns A dictionary with the "output", the error "message" (None on success) and the "exitCode" that a regular
+    vigilance run would exit with.
+    """
+    if error is None:
+        return {'output': output, 'message': None, 'exitCode': 0}
+    return {'output': output, 'message': error.message, 'exitCode': error.exit_code}
+
+class QualityServer(object):
+    """Answers quality checks for a vigilance configuration over a Unix socket.
+    Plugins are loaded and the configuration is compiled once; both stay in memory for the lifetime of the server.
+    The configuration file and the quality reports are polled for changes. Whenever any of them changes, the
+    configuration is recompiled if necessary and the default check is evaluated in the background, so that queries
+    are usually answered from memory. Results are kept for each distinct query until the watched files change.
+    """
+    def __init__(self, configPath, jobs=1, cache=None, configurationCache=None, interval=DefaultPollInterval): #pylint: disable=too-many-arguments
+        """Creates a new QualityServer instance.
+        @param configPath The path to the vigilance configuration file.
+        @param jobs The number of quality suites to run concurrently.
+        @param cache A vigilance.cache.ReportCache instance, if parsed reports should be cached.
+        @param configurationCache A vigilance.cache.ConfigurationCache instance, if compiled configurations should be cached.
+        @param interval The number of seconds between checks of the watched files for changes.
+        """
+        self.configPath = configPath
+        self.jobs = jobs
+        self.cache = cache
+        self.configurationCache = configurationCache
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.configSignature = None
+        self.suites = []
+        self.configError = None
+        self.signature = None
+        self.results = {}
+
+    def refresh(self):
+        """Recompiles the configuration if it changed and discards results that the watched files no longer match.
+        Must be called with the lock held.
+        """
+        configSignature = file_signature(self.configPath)
+        if configSignature != self.configSignature or self.signature is None:
+            self.configSignature = configSignature
+            self.suites, self.configError = [], None
+            try:
+                with open(self.configPath) as configFile:
+                    self.suites = list(six.iteritems(load_configuration(configFile.read(), self.configurationCache)))
+            except IOError:
+                self.configError = ConfigurationParsingError('Could not open configuration file "{}" for reading'.format(self.configPath))
+            except VigilanceException as ex:
+                self.configError = ex
+        reports = tuple((path, file_signature(path))
+                        for _, suiteConfig in self.suites for path in expand_reports(suiteConfig['report']))
+        signature = (configSignature, reports)
+        if signature != self.signature:
+            self.signature = signature
+            self.results = {}
+
+    def check(self, failFast=False, maxViolations=None, changedFiles=None):
+        """Checks the configured quality suites, reusing the previous result if no watched file has changed since.
+        @param failFast Whether to stop at the first quality violation.
+        @param maxViolations The maximum number of quality violations to report per suite, if any.
+        @param changedFiles An iterable of changed file paths, if only the items affected by a change should be checked.
+        @returns A response as created by make_response.
+        """
+        scope = ChangedFiles(changedFiles) if changedFiles is not None else None
+        key = (bool(failFast), maxViolations, scope.paths if scope is not None else None)
+        with self.lock:
+            self.refresh()
+            result = self.results.get(key)
+            if result is None:
+                if len(self.results) >= MaxResults:
+                    self.results.clear()
+                result = self.results[key] = self.evaluate(scope, maxViolations, failFast)
+            return result
+
+    def evaluate(self, scope, maxViolations, failFast):
+        """Runs the configured quality suites.
+        @param scope A vigilance.scope.ChangedFiles instance, if only the items affected by a change should be checked.
+        @param maxViolations The maximum number of quality violations to report per suite, if any.
+        @param failFast Whether to stop at the first quality violation.
+        @returns A response as created by make_response.
+        """
+        output = six.StringIO()
+        try:
+            if self.configError is not None:
+                raise self.configError
+            run_suites(self.suites, self.jobs, self.cache, scope, maxViolations, failFast, output)
+        except VigilanceException as ex:
+            return make_response(output.getvalue(), ex)
+        return make_response(output.getvalue())
+
+    def watch(self):
+        """Polls the watched files and re-evaluates the default check whenever they change, until the server is stopped.
+        """
+        while True:
+            try:
+                self.check()
+            except Exception as ex: #pylint: disable=broad-except
+                logging.getLogger(__name__).warning('Failed to re-evaluate quality suites: %s', ex)
+            if self.stopped.wait(self.interval):
+                return
+
+    def handle(self, request):
+        """Handles a single request from a client.
+        Requests are dictionaries whose "command" is either "check" or "stop". Checks accept the optional "failFast",
+        "maxViolations" and "changedFiles" keys, which correspond to the arguments of check.
+        @param request The decoded request.
+        @returns A response as created by make_response.
+        """
+        command = request.get('command', 'check')
+        if command == 'stop':
+            self.stopped.set()
+            return make_response()
+        if command != 'check':
+            return make_response(error=ServerUnavailable('Unknown command "{}"'.format(command)))
+        return self.check(request.get('failFast', False), request.get('maxViolations'), request.get('changedFiles'))
+
+    def respond(self, connection):
+        """Reads a request from a client connection and writes the response to it.
+        @param connection A connected socket.
+        """
+        with closing(connection.makefile('rb')) as requestFile:
+            line = requestFile.readline()
+        try:
+            response = self.handle(json.loads(line.decode('utf-8')))
+        except (ValueError, AttributeError):
+            response = make_response(error=ServerUnavailable('Malformed request'))
+        connection.sendall((json.dumps(response) + '\n').encode('utf-8'))
+
+    def serve(self, socketPath):
+        """Answers requests on a Unix socket until a stop request is received.
+        A socket file left behind by a server that is no longer running is replaced. The socket is only accessible to
+        the user running the server. Requests are answered one at a time; clients that stall for longer than
+        RequestTimeout are disconnected, so that they cannot block other clients.
+        @param socketPath The path of the Unix socket to listen on.
+        @throws vigilance.error.ServerUnavailable if another server is listening on the socket or it cannot be created.
+        """
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)
+        try:
+            self.bind(listener, socketPath)
+        except socket.error as ex:
+            listener.close()
+            raise ServerUnavailable('Could not listen on "{}": {}'.format(socketPath, ex))
+        finally:
+            os.umask(umask)
+        watcher = threading.Thread(target=self.watch, name='vigilance-watcher')
+        watcher.daemon = True
+        watcher.start()
+        try:
+            with closing(listener):
+                listener.listen(8)
+                while not self.stopped.is_set():
+                    connection, _ = listener.accept()
+                    connection.settimeout(RequestTimeout)
+                    with closing(connection):
+                        try:
+                            self.respond(connection)
+                        except socket.error as ex:
+                            logging.getLogger(__name__).warning('Failed to answer vigilance client: %s', ex)
+        finally:
+            self.stopped.set()
+            os.remove(socketPath)
+        watcher.join()
+
+    @staticmethod
+    def bind(listener, socketPath):
+        """Binds a listening socket to a path, removing a stale socket file at that path.
+        @param listener An unbound Unix socket.
+        @param socketPath The path of the socket file.
+        @throws socket.error if the socket cannot be bound, e.g. because another server is listening on it.
+        """
+        try:
+            listener.bind(socketPath)
+            return
+        except socket.error as ex:
+            if ex.errno != errno.EADDRINUSE:
+                raise
+        with closing(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)) as probe:
+            try:
+                probe.connect(socketPath)
+            except socket.error:
+                os.remove(socketPath)
+                listener.bind(socketPath)
+                return
+        raise socket.error(errno.EADDRINUSE, 'another vigilance server is listening on it')
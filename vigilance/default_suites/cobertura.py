@@ -2,28 +2,54 @@
 @file
 Contains the quality suite definitions necessary for cobertura code coverage enforcement.
 """
+import io
 import logging
+import binascii
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import OrderedDict, deque
+from numbers import Real
 from xml.etree import ElementTree
 
-from six import StringIO
+import six
 from vigilance.plugin.tooling import DefaultStanzas
-from vigilance.constraint import Constraint
+from vigilance.constraint import Constraint, FileConstraint, IgnoreFiles, PackageConstraint
 from vigilance.error import ReportParsingError
-from vigilance.parser import Parser
+from vigilance.parser import ChunkSize as DefaultChunkSize, Parser, iter_chunks
 from vigilance.plugin import AbstractPlugin, SuiteComponents
-from vigilance.representation import QualityItem, QualityReport, Satisfaction
+from vigilance.representation import QualityItem, QualityReport, Satisfaction, Satisfied
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## The types of regular binary files, which worker processes reopen by path rather than receive a copy of.
+_FileTypes = (io.BufferedReader, io.FileIO, getattr(six.moves.builtins, 'file', io.FileIO))
 
 class TestMetrics(object):
     """Holds data about a previous code quality run (test run, linting, etc).
     """
+    __slots__ = ('lineCoverage', 'branchCoverage', 'complexity')
+
     def __init__(self, lineCoverage, branchCoverage, complexity):
         self.lineCoverage = lineCoverage
         self.branchCoverage = branchCoverage
         self.complexity = complexity
 
+    def __repr__(self):
+        return 'TestMetrics({!r}, {!r}, {!r})'.format(self.lineCoverage, self.branchCoverage, self.complexity)
+
 class FileUnderTest(QualityItem):
     """Represents a single file from a test coverage report.
     """
+    __slots__ = ('filePath',)
+
     def __init__(self, filePath, lineCoverage=0, branchCoverage=0, complexity=0):
         super(FileUnderTest, self).__init__(TestMetrics(lineCoverage, branchCoverage, complexity))
         self.filePath = filePath
@@ -32,6 +58,9 @@ class FileUnderTest(QualityItem):
     def identifier(self):
         return 'file {}'.format(self.filePath)
 
+    def state(self):
+        return 'file {!r} {!r}'.format(self.filePath, self._metrics)
+
     def __eq__(self, other):
         return self.filePath == other.filePath
 
@@ -41,6 +70,8 @@ class FileUnderTest(QualityItem):
 class PackageUnderTest(QualityItem):
     """Represents a single package from a test coverage report.
     """
+    __slots__ = ('name',)
+
     def __init__(self, name, lineCoverage=0, branchCoverage=0, complexity=0):
         super(PackageUnderTest, self).__init__(TestMetrics(lineCoverage, branchCoverage, complexity))
         self.name = name
@@ -49,57 +80,703 @@ class PackageUnderTest(QualityItem):
     def identifier(self):
         return 'package {}'.format(self.name)
 
+    def state(self):
+        return 'package {!r} {!r}'.format(self.name, self._metrics)
+
     def __eq__(self, other):
         return self.name == other.name
 
     def __hash__(self):
         return hash(self.name)
 
+class _CoberturaTarget(object):
+    """An XML parser target that converts Cobertura elements into quality items as their closing tags arrive.
+    Only the attributes of open class/package elements are retained; all other elements (notably the
+    per-line hit data) are discarded as soon as they are seen, so memory use does not grow with the report.
+    When scoped to a change, classes outside of the change and packages containing none of its classes are dropped
+    without ever being converted into quality items. The scope is rooted at the <source> directories of the report,
+    which Cobertura lists ahead of its packages.
+    Equal attribute values (file paths, package names and coverage rates) are shared between the items of a report.
+    """
+    def __init__(self, scope=None):
+        self.items = []
+        self.scope = scope
+        self._open = []
+        self._affected = []
+        self._values = {}
+        self._sources = []
+        self._text = None
+
+    def start(self, tag, attrib):
+        """Called by the XML parser when an element is opened.
+        """
+        if tag in ('class', 'package'):
+            self._open.append(attrib)
+        if tag == 'package':
+            self._affected.append(self.scope is None)
+        elif tag == 'source':
+            self._text = []
+
+    def end(self, tag):
+        """Called by the XML parser when an element is closed.
+        """
+        if tag == 'class':
+            attrib = self._open.pop()
+            if self.scope is None or attrib.get('filename') in self.scope:
+                self.items.append(CoberturaParser._xml_class_to_file(attrib, self._values))
+                if self._affected:
+                    self._affected[-1] = True
+        elif tag == 'package':
+            attrib = self._open.pop()
+            if self._affected.pop():
+                self.items.append(CoberturaParser._xml_package_to_package(attrib, self._values))
+        elif tag == 'source':
+            self._sources.append(''.join(self._text))
+            self._text = None
+        elif tag == 'sources' and self.scope is not None:
+            self.scope = self.scope.rooted(self._sources)
+
+    def data(self, data):
+        """Called by the XML parser with character data; only the text of <source> elements is kept.
+        """
+        if self._text is not None:
+            self._text.append(data)
+
+    def close(self):
+        """Called by the XML parser once the document has been fully parsed.
+        """
+        pass
+
+def _popcount(value):
+    return value.bit_count() if _HasBitCount else bin(value).count('1')
+
+_HasBitCount = hasattr(0, 'bit_count')
+
+def _from_bitmap(bitmap):
+    if not bitmap:
+        return 0
+    if six.PY3:
+        return int.from_bytes(bitmap, 'little')
+    return int(binascii.hexlify(bytes(bitmap[::-1])), 16)
+
+## The unsigned array typecodes for condition counts, from narrowest to widest.
+_CountTypes = ('B', 'H', 'L')
+
+def _fit(counts, count):
+    """Returns counts, converted to the narrowest wider array type that holds count if its own type cannot.
+    @param counts An array of condition counts.
+    @param count The count to store in it.
+    """
+    for typecode in _CountTypes[_CountTypes.index(counts.typecode):]:
+        if count < 1 << (8 * array(typecode).itemsize):
+            break
+    return counts if typecode == counts.typecode else array(typecode, counts)
+
+def _combine(first, second, function, longest):
+    """Combines two arrays of condition counts elementwise.
+    @param first The first array of counts.
+    @param second The second array of counts.
+    @param function The function (max or min) that combines the counts of a line.
+    @param longest Whether the result covers the lines of the longer array (rather than the shorter one).
+    """
+    typecode = first.typecode if first.itemsize >= second.itemsize else second.typecode
+    combined = array(typecode, six.moves.map(function, first, second))
+    if longest:
+        combined.fromlist((first[len(second):] if len(first) > len(second) else second[len(first):]).tolist())
+    return combined
+
+def _trimmed(counts):
+    """Returns the counts without trailing zeros as a list, so that equal counts compare equal whatever their type.
+    """
+    end = len(counts)
+    while end and not counts[end - 1]:
+        end -= 1
+    return counts[:end].tolist()
+
+class LineHits(object):
+    """The line and branch coverage of a single file, stored as bitmaps and arrays rather than as per-line objects.
+    Bit n of valid is set if line n is executable and bit n of covered if it was hit. Element n of conditions and
+    coveredConditions holds the number of (covered) branch conditions of line n, in the smallest unsigned array type
+    that fits. The union and intersection of two LineHits are therefore bitwise | and & of the bitmaps and the
+    elementwise max and min of the condition counts, and all totals are population counts and sums.
+    """
+    __slots__ = ('valid', 'covered', 'conditions', 'coveredConditions')
+
+    def __init__(self, valid=0, covered=0, conditions=None, coveredConditions=None):
+        self.valid = valid
+        self.covered = covered
+        self.conditions = array('B') if conditions is None else conditions
+        self.coveredConditions = array('B') if coveredConditions is None else coveredConditions
+
+    @classmethod
+    def from_lines(cls, lines, branches=()):
+        """Creates a LineHits instance from line data.
+        @param cls
+        @param lines An iterable of (line number, hits) tuples.
+        @param branches An iterable of (line number, covered conditions, conditions) tuples.
+        """
+        builder = _LineHitsBuilder()
+        for number, hits in lines:
+            builder.add_line(number, hits)
+        for number, covered, total in branches:
+            builder.add_branch(number, covered, total)
+        return builder.build()
+
+    def __or__(self, other):
+        return LineHits(self.valid | other.valid, self.covered | other.covered,
+                        _combine(self.conditions, other.conditions, max, True),
+                        _combine(self.coveredConditions, other.coveredConditions, max, True))
+
+    def __and__(self, other):
+        return LineHits(self.valid & other.valid, self.covered & other.covered,
+                        _combine(self.conditions, other.conditions, min, False),
+                        _combine(self.coveredConditions, other.coveredConditions, min, False))
+
+    def __eq__(self, other):
+        return isinstance(other, LineHits) and (self.valid, self.covered) == (other.valid, other.covered) and \
+            (_trimmed(self.conditions), _trimmed(self.coveredConditions)) == \
+            (_trimmed(other.conditions), _trimmed(other.coveredConditions))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def exclude(self, first, last):
+        """Removes a range of lines (e.g. generated or unreachable code) from the coverage data.
+        @param first The first line number to remove.
+        @param last The last line number to remove.
+        @returns A new LineHits instance.
+        """
+        lines = ~(((1 << (last - first + 1)) - 1) << first)
+        conditions, coveredConditions = array(self.conditions.typecode, self.conditions), \
+            array(self.coveredConditions.typecode, self.coveredConditions)
+        for counts in (conditions, coveredConditions):
+            end = min(last + 1, len(counts))
+            if first < end:
+                counts[first:end] = array(counts.typecode, [0]) * (end - first)
+        return LineHits(self.valid & lines, self.covered & lines, conditions, coveredConditions)
+
+    def counts(self):
+        """Returns a tuple of (covered lines, lines, covered conditions, conditions).
+        """
+        return (_popcount(self.covered), _popcount(self.valid), sum(self.coveredConditions), sum(self.conditions))
+
+    def line_rate(self):
+        """Returns the percentage of lines that are covered.
+        """
+        return self.rate(_popcount(self.covered), _popcount(self.valid))
+
+    def branch_rate(self):
+        """Returns the percentage of branch conditions that are covered.
+        """
+        return self.rate(sum(self.coveredConditions), sum(self.conditions))
+
+    @staticmethod
+    def rate(covered, total):
+        """Computes a coverage percentage; like Cobertura, nothing to cover counts as full coverage.
+        @param covered The number of covered lines or conditions.
+        @param total The total number of lines or conditions.
+        """
+        return covered * 100.0 / total if total else 100.0
+
+class _LineHitsBuilder(object):
+    """Accumulates the bitmaps of a LineHits instance in byte arrays, and its condition counts in arrays indexed by
+    line number, while a report is parsed.
+    """
+    __slots__ = ('valid', 'covered', 'conditions', 'coveredConditions')
+
+    def __init__(self):
+        self.valid = bytearray()
+        self.covered = bytearray()
+        self.conditions = array('B')
+        self.coveredConditions = array('B')
+
+    def add_line(self, number, hits):
+        """Adds a single line and its hit count.
+        """
+        index, bit = number >> 3, 1 << (number & 7)
+        if index >= len(self.valid):
+            self.valid.extend(bytearray(index + 1 - len(self.valid)))
+            self.covered.extend(bytearray(index + 1 - len(self.covered)))
+        self.valid[index] |= bit
+        if hits > 0:
+            self.covered[index] |= bit
+
+    def add_branch(self, number, covered, total):
+        """Adds the condition counts of a single line.
+        """
+        if number >= len(self.conditions):
+            self.conditions.extend([0] * (number + 1 - len(self.conditions)))
+            self.coveredConditions.extend([0] * (number + 1 - len(self.coveredConditions)))
+        self.conditions = _fit(self.conditions, total)
+        self.coveredConditions = _fit(self.coveredConditions, covered)
+        self.conditions[number] = total
+        self.coveredConditions[number] = covered
+
+    def build(self):
+        """Returns the accumulated LineHits instance.
+        """
+        return LineHits(_from_bitmap(self.valid), _from_bitmap(self.covered), self.conditions, self.coveredConditions)
+
+class _CoberturaLineTarget(object):
+    """An XML parser target that collects the per-line hit data of every class in a Cobertura report.
+    Each class is collected as a tuple of (package attributes, class attributes, LineHits). The lines listed for
+    methods repeat those of their class and are skipped. The <source> directories of the report are collected too.
+    """
+    _Conditions = re.compile(r'\((\d+)/(\d+)\)')
+
+    def __init__(self):
+        self.classes = []
+        self.sources = []
+        self._package = {}
+        self._class = None
+        self._lines = None
+        self._methods = 0
+        self._text = None
+
+    def start(self, tag, attrib):
+        """Called by the XML parser when an element is opened.
+        """
+        if tag == 'line':
+            if self._lines is not None and not self._methods:
+                self._add_line(attrib)
+        elif tag == 'method':
+            self._methods += 1
+        elif tag == 'class':
+            self._class = attrib
+            self._lines = _LineHitsBuilder()
+        elif tag == 'package':
+            self._package = attrib
+        elif tag == 'source':
+            self._text = []
+
+    def _add_line(self, attrib):
+        try:
+            number = int(attrib['number'])
+            hits = int(float(attrib.get('hits', 0)))
+        except (KeyError, ValueError):
+            return
+        if number < 0:
+            return
+        self._lines.add_line(number, hits)
+        if attrib.get('branch') == 'true':
+            conditions = self._Conditions.search(attrib.get('condition-coverage', ''))
+            if conditions is not None:
+                self._lines.add_branch(number, int(conditions.group(1)), int(conditions.group(2)))
+
+    def end(self, tag):
+        """Called by the XML parser when an element is closed.
+        """
+        if tag == 'class':
+            self.classes.append((self._package, self._class, self._lines.build()))
+            self._class = self._lines = None
+        elif tag == 'method':
+            self._methods -= 1
+        elif tag == 'package':
+            self._package = {}
+        elif tag == 'source':
+            self.sources.append(''.join(self._text))
+            self._text = None
+
+    def data(self, data):
+        """Called by the XML parser with character data; only the text of <source> elements is kept.
+        """
+        if self._text is not None:
+            self._text.append(data)
+
+    def close(self):
+        """Called by the XML parser once the document has been fully parsed.
+        """
+        pass
+
 class CoberturaParser(Parser):
     """A Parser implementation for Cobertura-compatible coverage reports.
     For details, please see the Cobertura documentation at http://cobertura.github.io/cobertura/.
+    Reports are parsed incrementally; no element tree is ever built for the report.
     """
+    ## The number of bytes (or characters) fed to the XML parser at a time.
+    ChunkSize = DefaultChunkSize
+
+    ## Reports smaller than this many bytes are never split into shards.
+    MinimumShardSize = 1 << 22
+    ## The number of shards created per worker process, which evens out differences between package sizes.
+    ShardsPerProcess = 4
+    _PackageStart = re.compile(b'<package[\\s/>]')
+    _PackageEnd = b'</package>'
+    _ClassStart = re.compile(b'<class[\\s/>]')
+    _Declaration = re.compile(b'\\s*(<\\?xml[^>]*\\?>)')
+    _ClassTag = re.compile(b'<class(?:\\s[^>]*)?/?>')
+    _ClassEnd = b'</class>'
+    _Filename = re.compile(b'\\sfilename\\s*=\\s*("|\')([^"\'&<]*)\\1')
+    _Source = re.compile(b'<source>([^<&]*)</source>')
+
     def parse(self, fileContents):
-        stream = StringIO(fileContents)
+        return self.parse_report(fileContents)
+
+    def parse_report(self, report, scope=None, lazy=False, columnar=False, processes=None): #pylint: disable=arguments-differ, too-many-arguments
+        """Parses a Cobertura report.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report, or a list of them.
+        A list of reports (e.g. one report per parallel test worker) is merged into a single report; see iterparse_merged.
+        @param scope A vigilance.scope.ChangedFiles instance; if provided, only the classes of changed files and the
+        packages containing them are reported. Class file names are resolved against the <source> directories of
+        the report.
+        @param lazy Whether the report should be parsed on demand as its items are consumed; ignored for columnar reports.
+        @param columnar Whether metrics should be stored in a ColumnarReport; requires NumPy.
+        @param processes The number of worker processes used to parse the report; defaults to 1 for a single report
+        and to the number of CPUs for a list of reports.
+        When greater than 1, buffer sources (e.g. memory mapped reports) are split at package boundaries and
+        the shards are parsed in a process pool. Lists of reports are parsed one report per task.
+        @returns A vigilance.representation.QualityReport instance.
+        @throws vigilance.error.ReportParsingError if the report is not valid XML.
+        """
+        if isinstance(report, list) and len(report) == 1:
+            report = report[0]
+        if isinstance(report, list):
+            if any(self.is_columnar(source) for source in report):
+                raise ReportParsingError('Binary columnar reports cannot be merged')
+        elif self.is_columnar(report):
+            return self.load_columnar(report, scope)
+        elif scope is not None:
+            scope = scope.rooted(self.find_sources(report))
+        if isinstance(report, list):
+            items = self.iterparse_merged(report, processes or multiprocessing.cpu_count(), scope)
+        else:
+            processes = processes or 1
+            shards = self.find_shards(report, processes) if processes > 1 else None
+            if shards:
+                items = self.iterparse_shards(shards, processes, scope)
+            else:
+                items = self.iterparse(report, scope)
+        if columnar:
+            if numpy is not None:
+                return ColumnarReport(items)
+            logging.getLogger(__name__).warning('NumPy is not installed; ignoring columnar option')
+        return QualityReport(items if lazy else list(items))
+
+    def is_cacheable(self, report):
+        """Binary columnar reports are mapped in place, which is faster than loading them from the cache.
+        """
+        return isinstance(report, list) or not self.is_columnar(report)
+
+    @staticmethod
+    def is_columnar(report):
+        """Determines whether a report source is in the binary columnar format written by ColumnarReport.write.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report.
+        File objects are rewound to their original position.
+        @returns True if the report starts with ColumnarReport.Signature, whatever the version of its format.
+        """
+        if isinstance(report, six.text_type):
+            return False
+        size = len(ColumnarReport.Signature)
+        if hasattr(report, 'read') and not isinstance(report, mmap.mmap):
+            try:
+                position = report.tell()
+                prefix = report.read(size)
+                report.seek(position)
+            except (AttributeError, IOError, OSError):
+                return False
+        else:
+            try:
+                prefix = bytes(report[:size]) if six.PY2 else memoryview(report)[:size].tobytes()
+            except TypeError:
+                return False
+        return prefix == ColumnarReport.Signature
+
+    def load_columnar(self, report, scope=None):
+        """Loads a report in the binary columnar format.
+        @param report A report source for which is_columnar is True. Buffers (e.g. memory mapped reports) are read in
+        place; file objects are read into memory.
+        @param scope A vigilance.scope.ChangedFiles instance; if provided, only the rows of changed files and the
+        packages containing them are loaded, as when parsing the original report.
+        @returns A MappedColumnarReport instance, or a report of the rows in @p scope.
+        @throws vigilance.error.ReportParsingError if the report is truncated.
+        """
+        if hasattr(report, 'read') and not isinstance(report, mmap.mmap):
+            report = report.read()
+        quality = MappedColumnarReport(report)
+        if scope is None:
+            return quality
+        try:
+            items = list(quality.iter_items(scope))
+        finally:
+            quality.close()
+        return ColumnarReport(items) if numpy is not None else QualityReport(items)
+
+    def convert(self, report, stream, processes=None):
+        """Converts a report into the binary columnar format; see ColumnarReport.write.
+        @param report A report source as accepted by parse_report, or a list of them to merge.
+        @param stream The binary file object to write to.
+        @param processes The number of worker processes used to parse the report; see parse_report.
+        @returns The number of items written.
+        @throws vigilance.error.ReportParsingError if the report is not valid.
+        """
+        quality = self.parse_report(report, lazy=True, processes=processes)
+        try:
+            columnar = quality if isinstance(quality, ColumnarReport) else ColumnarReport(quality.items)
+            return columnar.write(stream)
+        finally:
+            quality.close()
+
+    def find_sources(self, report):
+        """Reads the <source> directories of a Cobertura report buffer ahead of parsing it.
+        Shards of a report do not contain its <sources> element, and scoped buffers are filtered before the XML
+        parser sees them, so their scope has to be rooted up front.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report.
+        @returns A list of source directories; empty if @p report is not a searchable buffer (an mmap or bytes), or
+        if it lists no packages or sources.
+        """
+        if isinstance(report, six.text_type) or not hasattr(report, 'rfind'):
+            return []
+        package = self._PackageStart.search(report)
+        if package is None:
+            return []
+        sources = []
+        for source in self._Source.finditer(report, 0, package.start()):
+            try:
+                sources.append(six.ensure_str(source.group(1)))
+            except UnicodeDecodeError:
+                pass
+        return sources
+
+    def find_shards(self, report, processes):
+        """Splits a Cobertura report into independently parsable shards at <package> boundaries.
+        The report is scanned for package tags as raw bytes; it is never decoded or parsed as XML by this method.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report.
+        @param processes The number of worker processes that will parse the shards.
+        @returns A list of (XML declaration, buffer, start offset, end offset) tuples in document order, or None
+        if @p report is not a searchable buffer (an mmap or bytes), is too small to be worth splitting or
+        cannot be split safely (e.g. classes appear outside of any package).
+        """
+        if isinstance(report, six.text_type) or not hasattr(report, 'rfind') or len(report) < self.MinimumShardSize:
+            return None
+        starts = [match.start() for match in self._PackageStart.finditer(report)]
+        end = report.rfind(self._PackageEnd)
+        if len(starts) < 2 or end < starts[-1]:
+            return None
+        end += len(self._PackageEnd)
+        prefix, suffix = report[:starts[0]], report[end:]
+        if self._ClassStart.search(prefix) or self._ClassStart.search(suffix):
+            return None
+        declaration = self._Declaration.match(prefix)
+        declaration = declaration.group(1) if declaration else b''
+        shardSize = max(len(report) // (processes * self.ShardsPerProcess), 1)
+        shards = []
+        shardStart = starts[0]
+        for start in starts[1:]:
+            if start - shardStart >= shardSize:
+                shards.append((declaration, report, shardStart, start))
+                shardStart = start
+        shards.append((declaration, report, shardStart, end))
+        return shards
+
+    def iterparse_shards(self, shards, processes, scope=None):
+        """Parses report shards in a pool of worker processes.
+        Only a bounded number of shards is in flight at any time, so at most a few shards are copied in memory.
+        @param shards A list of shards as returned by find_shards.
+        @param processes The number of worker processes.
+        @param scope A vigilance.scope.ChangedFiles instance restricting the parsed items, if any.
+        @returns A generator of quality items in document order.
+        @throws vigilance.error.ReportParsingError if any shard is not valid XML.
+        """
+        pool = multiprocessing.Pool(processes)
         try:
-            tree = ElementTree.parse(stream)
+            pending = deque()
+            for declaration, report, start, end in shards:
+                shard = declaration + b'<shard>' + bytes(report[start:end]) + b'</shard>'
+                pending.append(pool.apply_async(_parse_shard, (shard, scope)))
+                if len(pending) >= processes * 2:
+                    for item in pending.popleft().get():
+                        yield item
+            while pending:
+                for item in pending.popleft().get():
+                    yield item
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def iterparse_merged(self, reports, processes, scope=None):
+        """Parses several Cobertura reports of the same code base and merges them into one.
+        The line and branch coverage of every file and package is recomputed from the merged lines rather than
+        averaged; see merge_lines.
+        @param reports A list of report sources as accepted by vigilance.parser.Parser.parse_report.
+        @param processes The number of worker processes.
+        @param scope A vigilance.scope.ChangedFiles instance restricting the reported files, if any. Packages
+        containing changed files are reported with the coverage of all of their files. File names are resolved
+        against the <source> directories of all reports.
+        @returns A generator of quality items, grouped by package in the order in which they first appear.
+        @throws vigilance.error.ReportParsingError if any report is not valid XML.
+        """
+        sources = []
+        packages = self.merge_lines(reports, processes, sources)
+        if scope is not None:
+            scope = scope.rooted(sources)
+        for name, (packageComplexity, files) in six.iteritems(packages):
+            totals = (0, 0, 0, 0)
+            affected = scope is None
+            for filePath, (complexity, lines) in six.iteritems(files):
+                totals = tuple(total + count for total, count in zip(totals, lines.counts()))
+                if scope is None or filePath in scope:
+                    affected = True
+                    yield FileUnderTest(filePath, lines.line_rate(), lines.branch_rate(), complexity)
+            if affected:
+                yield PackageUnderTest(name, LineHits.rate(*totals[:2]), LineHits.rate(*totals[2:]), packageComplexity)
+
+    def merge_lines(self, reports, processes=1, sources=None):
+        """Parses the per-line data of several Cobertura reports of the same code base and merges it.
+        Reports are parsed concurrently in a pool of worker processes. Lines are merged by union per file and line:
+        a line is covered if any report covered it, and the highest number of covered conditions of any report is
+        kept for each branch. The complexity of a file or package is the highest reported for it.
+        @param reports A list of report sources as accepted by vigilance.parser.Parser.parse_report.
+        @param processes The number of worker processes.
+        @param sources A list to which the <source> directories of the reports are appended, if any.
+        @returns An OrderedDict mapping package names to (complexity, files) lists in the order in which the packages
+        first appear, where files is an OrderedDict mapping the file paths of the package to (complexity, LineHits) lists.
+        @throws vigilance.error.ReportParsingError if any report is not valid XML.
+        """
+        files = {}
+        packages = OrderedDict()
+        for reportSources, classes in self._map_reports(reports, processes):
+            if sources is not None:
+                sources.extend(source for source in reportSources if source not in sources)
+            for packageAttrib, classAttrib, lines in classes:
+                name = packageAttrib.get('name', 'Parse failed; unknown')
+                packageComplexity = self._get_attribute(packageAttrib, 'complexity')
+                package = packages.setdefault(name, [packageComplexity, OrderedDict()])
+                package[0] = max(package[0], packageComplexity)
+                filePath = classAttrib.get('filename', 'Parse failed; unknown')
+                complexity = self._get_attribute(classAttrib, 'complexity')
+                merged = files.get(filePath)
+                if merged is None:
+                    files[filePath] = package[1][filePath] = [complexity, lines]
+                else:
+                    merged[0] = max(merged[0], complexity)
+                    merged[1] |= lines
+        return packages
+
+    @staticmethod
+    def _map_reports(reports, processes):
+        """Parses the line data of each report, in a process pool if more than one process is used.
+        Only a bounded number of reports is in flight at any time. Reports that are regular files are reopened by
+        path within the workers, so that their contents are neither copied into the parent process nor sent through
+        the pool; see _line_task.
+        @returns A generator of the (sources, classes) of each report as collected by _CoberturaLineTarget, in report order.
+        """
+        if processes <= 1:
+            for report in reports:
+                yield _parse_lines(report)
+            return
+        pool = multiprocessing.Pool(min(processes, len(reports)))
+        try:
+            pending = deque()
+            for report in reports:
+                pending.append(pool.apply_async(*_line_task(report)))
+                if len(pending) >= processes * 2:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def iterparse(self, report, scope=None):
+        """Incrementally parses a Cobertura report.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report.
+        @param scope A vigilance.scope.ChangedFiles instance restricting the parsed items, if any.
+        Binary sources are handed to the XML parser undecoded so that the report's own encoding declaration is honored.
+        @returns A generator of FileUnderTest and PackageUnderTest instances, in document order.
+        @throws vigilance.error.ReportParsingError if the report is not valid XML.
+        """
+        target = _CoberturaTarget(scope)
+        parser = ElementTree.XMLParser(target=target)
+        if scope is not None and hasattr(report, 'rfind') and not isinstance(report, six.text_type):
+            chunks = self.iter_scoped_chunks(report, scope)
+        else:
+            chunks = iter_chunks(report, self.ChunkSize)
+        for chunk in chunks:
+            self._feed(parser, chunk)
+            for item in target.items:
+                yield item
+            del target.items[:]
+        self._feed(parser, None)
+        for item in target.items:
+            yield item
+
+    def iter_scoped_chunks(self, report, scope):
+        """Yields the chunks of a report buffer with the classes of unchanged files cut out.
+        Class elements are located by scanning the raw bytes, so the XML parser never sees the (typically large)
+        per-line data of classes outside of the change. Classes whose file name cannot be determined without
+        decoding (e.g. non-ASCII or escaped names) are passed on to the XML parser, which filters them instead.
+        @param report A searchable buffer (an mmap or bytes).
+        @param scope A vigilance.scope.ChangedFiles instance.
+        @returns A generator of bytes chunks.
+        """
+        start = 0
+        match = self._ClassTag.search(report)
+        while match:
+            end = match.end()
+            if not match.group(0).endswith(b'/>'):
+                end = report.find(self._ClassEnd, end)
+                if end == -1:
+                    break
+                end += len(self._ClassEnd)
+            filename = self._Filename.search(match.group(0))
+            try:
+                unchanged = filename is not None and filename.group(2).decode('ascii') not in scope
+            except UnicodeDecodeError:
+                unchanged = False
+            if unchanged:
+                for chunk in self._slice(report, start, match.start()):
+                    yield chunk
+                start = end
+            match = self._ClassTag.search(report, end)
+        for chunk in self._slice(report, start, len(report)):
+            yield chunk
+
+    def _slice(self, report, start, end):
+        for offset in six.moves.range(start, end, self.ChunkSize):
+            yield report[offset:min(offset + self.ChunkSize, end)]
+
+    @staticmethod
+    def _feed(parser, chunk):
+        try:
+            if chunk is not None:
+                parser.feed(chunk)
+            else:
+                parser.close()
         except ElementTree.ParseError:
             logging.getLogger(__name__).exception('Parsing failed')
             raise ReportParsingError('Unable to parse Cobertura report as XML')
-        classes = [self._xml_class_to_file(cls) for cls in tree.findall('.//class')]
-        packages = [self._xml_package_to_package(pkg) for pkg in tree.findall('.//package')]
-        return QualityReport(classes + packages)
 
     @staticmethod
-    def _get_attribute(xml, attr, default=0):
+    def _get_attribute(attrib, attr, default=0, values=None):
         try:
-            return float(xml.attrib[attr]) * 100
+            value = float(attrib[attr]) * 100
         except (KeyError, ValueError):
             logging.getLogger(__name__).warning('Failed to find attribute in XML element: %s', attr)
             return default
+        return value if values is None else values.setdefault(value, value)
 
     @classmethod
-    def _xml_class_to_file(cls, xml):
-        lineCoverage = cls._get_attribute(xml, 'line-rate')
-        branchCoverage = cls._get_attribute(xml, 'branch-rate')
-        complexity = cls._get_attribute(xml, 'complexity')
-        try:
-            filePath = xml.attrib['filename']
-        except KeyError:
-            filePath = 'Parse failed; unknown'
+    def _xml_class_to_file(cls, attrib, values=None):
+        lineCoverage = cls._get_attribute(attrib, 'line-rate', values=values)
+        branchCoverage = cls._get_attribute(attrib, 'branch-rate', values=values)
+        complexity = cls._get_attribute(attrib, 'complexity', values=values)
+        filePath = cls._share(attrib.get('filename', 'Parse failed; unknown'), values)
         return FileUnderTest(filePath, lineCoverage, branchCoverage, complexity)
 
     @classmethod
-    def _xml_package_to_package(cls, xml):
-        lineCoverage = cls._get_attribute(xml, 'line-rate')
-        branchCoverage = cls._get_attribute(xml, 'branch-rate')
-        complexity = cls._get_attribute(xml, 'complexity')
-        try:
-            name = xml.attrib['name']
-        except KeyError:
-            name = 'Parse failed; unknown'
+    def _xml_package_to_package(cls, attrib, values=None):
+        lineCoverage = cls._get_attribute(attrib, 'line-rate', values=values)
+        branchCoverage = cls._get_attribute(attrib, 'branch-rate', values=values)
+        complexity = cls._get_attribute(attrib, 'complexity', values=values)
+        name = cls._share(attrib.get('name', 'Parse failed; unknown'), values)
         return PackageUnderTest(name, lineCoverage, branchCoverage, complexity)
 
+    @staticmethod
+    def _share(name, values):
+        return name if values is None else values.setdefault(name, name)
+
 class LineCoverage(Constraint):
     """A Constraint that enforces a line coverage minimum.
     """
@@ -109,8 +786,8 @@ class LineCoverage(Constraint):
     def satisfied_by(self, item):
         actual = item.metrics.lineCoverage
         if actual < self.minimumCoverage:
-            return Satisfaction(False, 'Line coverage too low for {} ({}/{})'.format(item.identifier, actual, self.minimumCoverage))
-        return Satisfaction(True)
+            return Satisfaction(False, 'Line coverage too low for {0.identifier} ({1}/{2})', item, actual, self.minimumCoverage)
+        return Satisfied
 
 class BranchCoverage(Constraint):
     """A Constraint that enforces a branch coverage minimum.
@@ -121,8 +798,8 @@ class BranchCoverage(Constraint):
     def satisfied_by(self, item):
         actual = item.metrics.branchCoverage
         if actual < self.minimumCoverage:
-            return Satisfaction(False, 'Branch coverage too low for {} ({}/{})'.format(item.identifier, actual, self.minimumCoverage))
-        return Satisfaction(True)
+            return Satisfaction(False, 'Branch coverage too low for {0.identifier} ({1}/{2})', item, actual, self.minimumCoverage)
+        return Satisfied
 
 class Complexity(Constraint):
     """A Constraint that enforces a maximum complexity.
@@ -133,8 +810,369 @@ class Complexity(Constraint):
     def satisfied_by(self, item):
         actual = item.metrics.complexity
         if actual > self.maximumComplexity:
-            return Satisfaction(False, 'Complexity too high for {} ({}/{})'.format(item.identifier, actual, self.maximumComplexity))
-        return Satisfaction(True)
+            return Satisfaction(False, 'Complexity too high for {0.identifier} ({1}/{2})', item, actual, self.maximumComplexity)
+        return Satisfied
+
+def _parse_shard(shard, scope=None):
+    """Parses a single report shard within a worker process.
+    @param shard The bytes of a well-formed XML document containing one or more <package> elements.
+    @param scope A vigilance.scope.ChangedFiles instance restricting the parsed items, if any.
+    @returns A list of quality items.
+    """
+    return list(CoberturaParser().iterparse(shard, scope))
+
+def _parse_lines(report):
+    """Collects the per-line data of a single report, possibly within a worker process.
+    @param report A report source as accepted by vigilance.parser.Parser.parse_report.
+    @returns A tuple of the sources and classes collected by _CoberturaLineTarget.
+    """
+    target = _CoberturaLineTarget()
+    parser = ElementTree.XMLParser(target=target)
+    for chunk in iter_chunks(report, CoberturaParser.ChunkSize):
+        CoberturaParser._feed(parser, chunk) #pylint: disable=protected-access
+    CoberturaParser._feed(parser, None) #pylint: disable=protected-access
+    return target.sources, target.classes
+
+def _parse_line_file(path, offset):
+    """Collects the per-line data of a report file within a worker process.
+    @param path The path of the report file.
+    @param offset The position in the file at which the report starts.
+    @returns A tuple of the sources and classes collected by _CoberturaLineTarget.
+    """
+    with open(path, 'rb') as report:
+        report.seek(offset)
+        return _parse_lines(report)
+
+def _line_task(report):
+    """Determines how a worker process obtains a report whose line data it collects.
+    Regular files are reopened by their path from their current position. Strings and bytes are sent to the worker
+    as they are; any other source (e.g. an mmap) has to be read into bytes first.
+    @param report A report source as accepted by vigilance.parser.Parser.parse_report.
+    @returns A tuple of the function to run in the worker process and its arguments.
+    """
+    path = getattr(report, 'name', None)
+    if isinstance(report, _FileTypes) and isinstance(path, six.string_types) and os.path.isfile(path):
+        try:
+            return _parse_line_file, (path, report.tell())
+        except (IOError, OSError):
+            pass
+    if isinstance(report, (bytes, six.text_type)):
+        return _parse_lines, (report,)
+    chunks = list(iter_chunks(report))
+    return _parse_lines, (chunks[0][:0].join(chunks) if chunks else b'',)
+
+class ColumnarReport(QualityReport):
+    """A QualityReport that stores Cobertura metrics in contiguous columns rather than as individual items.
+    Line coverage, branch coverage and complexity are held in parallel arrays alongside the item identifiers.
+    During scrutiny, the constraints of each row are resolved from its name, and LineCoverage/BranchCoverage/Complexity
+    thresholds (including file and package overrides of them) are checked with vectorized comparisons; only failing
+    rows are materialized and handed to their constraints to produce a Satisfaction.
+    Any other constraint is evaluated item by item. The results are identical to those of QualityReport.scrutinize;
+    metrics that are not floats (e.g. the integer defaults used for missing attributes) are retained exactly.
+    """
+    ## Kind markers stored for each row.
+    FileKind, PackageKind = 0, 1
+    ## The number of rows that are resolved and checked at a time; see iter_dissatisfactions.
+    BlockSize = 1 << 12
+    ## The bytes that start a report in the binary columnar format of any version.
+    Signature = b'VIGCOLS'
+    ## The bytes that start a report in the binary columnar format; the last byte is the version of the format.
+    Magic = Signature + b'\x01'
+    ## The header of the binary columnar format: the magic bytes, the number of rows and the size of the string table.
+    Header = struct.Struct('<8sQQ')
+
+    def __init__(self, items): #pylint: disable=super-init-not-called
+        """Creates a new ColumnarReport instance.
+        @param items An iterable of FileUnderTest and PackageUnderTest instances.
+        """
+        self.kinds = array('b')
+        self.names = []
+        self.lineCoverage = array('d')
+        self.branchCoverage = array('d')
+        self.complexity = array('d')
+        self.exact = {}
+        for row, item in enumerate(items):
+            metrics = (item.metrics.lineCoverage, item.metrics.branchCoverage, item.metrics.complexity)
+            if any(type(metric) is not float for metric in metrics):
+                self.exact[row] = metrics
+            if isinstance(item, PackageUnderTest):
+                self.kinds.append(self.PackageKind)
+                self.names.append(item.name)
+            else:
+                self.kinds.append(self.FileKind)
+                self.names.append(item.filePath)
+            self.lineCoverage.append(metrics[0])
+            self.branchCoverage.append(metrics[1])
+            self.complexity.append(metrics[2])
+
+    def __len__(self):
+        return len(self.names)
+
+    def item(self, row):
+        """Materializes a single row of the report.
+        @param row The index of the row.
+        @returns A FileUnderTest or PackageUnderTest instance.
+        """
+        itemType = PackageUnderTest if self.kinds[row] == self.PackageKind else FileUnderTest
+        metrics = self.exact.get(row) or (self.lineCoverage[row], self.branchCoverage[row], self.complexity[row])
+        return itemType(self.names[row], *metrics)
+
+    @property
+    def items(self):
+        """Returns all rows of the report as a list of quality items.
+        """
+        return [self.item(row) for row in six.moves.range(len(self))]
+
+    def _vector_check(self, constraint):
+        """Determines how a constraint can be evaluated against whole columns.
+        @returns None for constraints that are always satisfied, a tuple of (metric index, threshold) for threshold
+        constraints, or False if the constraint must be evaluated item by item.
+        """
+        if type(constraint) is IgnoreFiles:
+            return None
+        while type(constraint) in (FileConstraint, PackageConstraint):
+            constraint = constraint.constraint
+        if type(constraint) is LineCoverage:
+            check = (0, constraint.minimumCoverage)
+        elif type(constraint) is BranchCoverage:
+            check = (1, constraint.minimumCoverage)
+        elif type(constraint) is Complexity:
+            check = (2, constraint.maximumComplexity)
+        else:
+            return False
+        if not isinstance(check[1], Real):
+            return False
+        return check
+
+    def _constraints_for(self, constraints):
+        """Chooses how the constraints of rows are resolved: from their names and kinds where possible, or from
+        materialized items for constraint sets with filters that need to inspect them.
+        @returns A function of a row index returning a list of Constraint instances.
+        """
+        if constraints.resolves_names():
+            kinds, names, packageKind = self.kinds, self.names, self.PackageKind
+            return lambda row: constraints.constraints_for_name(names[row], kinds[row] == packageKind)
+        return lambda row: constraints.constraints_for(self.item(row))
+
+    def iter_dissatisfactions(self, constraints):
+        """Rows are checked a block of BlockSize rows at a time. The rows of a block are grouped by their constraints,
+        and the thresholds that apply to each row are gathered into an array per metric, so every metric of the block
+        is compared in a single vectorized operation. Items are only materialized for the rows that fail a comparison
+        or are subject to other constraints. The dissatisfactions of a block are yielded once it has been checked, so
+        the rows after the block that reaches a limit are never resolved or compared.
+        """
+        constraints.reset()
+        constraintsFor = self._constraints_for(constraints)
+        columns = [(self.lineCoverage, numpy.less, -numpy.inf), (self.branchCoverage, numpy.less, -numpy.inf),
+                   (self.complexity, numpy.greater, numpy.inf)]
+        groups = []
+        indices = {}
+        layers = {}
+        itemwise = []
+        for start in six.moves.range(0, len(self), self.BlockSize):
+            end = min(start + self.BlockSize, len(self))
+            rowGroups = array('l')
+            for row in six.moves.range(start, end):
+                applicable = constraintsFor(row)
+                group = indices.get(id(applicable))
+                if group is None:
+                    group = indices[id(applicable)] = len(groups)
+                    groups.append(applicable)
+                    self._add_group(group, applicable, columns, layers, itemwise)
+                rowGroups.append(group)
+            rowGroups = numpy.frombuffer(rowGroups, dtype=rowGroups.typecode)
+            candidateRows = []
+            candidatePositions = []
+            for (metric, _), (thresholds, positions) in six.iteritems(layers):
+                column, compare, _ = columns[metric]
+                rows = numpy.flatnonzero(compare(numpy.frombuffer(column, dtype=numpy.float64)[start:end],
+                                                 numpy.array(thresholds)[rowGroups]))
+                candidateRows.append(rows)
+                candidatePositions.append(numpy.array(positions, dtype=numpy.intp)[rowGroups[rows]])
+            for group, position in itemwise:
+                rows = numpy.flatnonzero(rowGroups == group)
+                candidateRows.append(rows)
+                candidatePositions.append(numpy.full(len(rows), position, dtype=numpy.intp))
+            if not candidateRows:
+                continue
+            candidateRows = numpy.concatenate(candidateRows)
+            candidatePositions = numpy.concatenate(candidatePositions)
+            order = numpy.lexsort((candidatePositions, candidateRows))
+            row = item = None
+            for candidate, position in zip(candidateRows[order].tolist(), candidatePositions[order].tolist()):
+                if candidate != row:
+                    row, item = candidate, self.item(start + candidate)
+                result = groups[rowGroups[row]][position].satisfied_by(item)
+                if not result.satisfied:
+                    yield result
+
+    def _add_group(self, group, applicable, columns, layers, itemwise): #pylint: disable=too-many-arguments
+        """Arranges the constraints of a new group of rows for iter_dissatisfactions.
+        The k-th threshold constraint on a metric of every group is stored in the layer (metric, k), a list holding the
+        threshold and the position within its group of the constraint of each group; groups without such a constraint
+        hold a threshold that no value fails. Constraints that cannot be compared on columns are added to itemwise.
+        """
+        for (metric, _), (thresholds, positions) in six.iteritems(layers):
+            thresholds.append(columns[metric][2])
+            positions.append(0)
+        counts = [0] * len(columns)
+        for position, constraint in enumerate(applicable):
+            check = self._vector_check(constraint)
+            if check is None:
+                continue
+            elif check is False:
+                itemwise.append((group, position))
+                continue
+            metric, threshold = check
+            layer = layers.get((metric, counts[metric]))
+            if layer is None:
+                layer = layers[(metric, counts[metric])] = ([columns[metric][2]] * (group + 1), [0] * (group + 1))
+            layer[0][group] = threshold
+            layer[1][group] = position
+            counts[metric] += 1
+
+    def write(self, stream):
+        """Writes the report to a binary stream in the binary columnar format, which MappedColumnarReport reads in place.
+        The header is followed by the line coverage, branch coverage and complexity columns as float64, the offsets of
+        the item names in the string table as uint64 (one more than there are rows), the kind of each row, a flag byte
+        per row whose bit i is set if metric i is an integer, and finally the string table of UTF-8 encoded item names.
+        All numbers are little-endian, and every column of 8 byte numbers is aligned to 8 bytes.
+        @param stream A binary file object.
+        @returns The number of rows written.
+        """
+        rows = len(self)
+        names = [self.names[row].encode('utf-8') for row in six.moves.range(rows)]
+        offsets = [0]
+        for name in names:
+            offsets.append(offsets[-1] + len(name))
+        flags = bytearray(rows)
+        for row, metrics in six.iteritems(self.exact):
+            flags[row] = sum(1 << index for index, metric in enumerate(metrics) if isinstance(metric, six.integer_types))
+        stream.write(self.Header.pack(self.Magic, rows, offsets[-1]))
+        for column in (self.lineCoverage, self.branchCoverage, self.complexity):
+            stream.write(_pack_column('d', column))
+        stream.write(_pack_column('Q', offsets))
+        stream.write(_pack_column('b', self.kinds))
+        stream.write(bytes(flags))
+        stream.write(b''.join(names))
+        return rows
+
+class MappedColumnarReport(ColumnarReport):
+    """A ColumnarReport over a report in the binary columnar format (see ColumnarReport.write), e.g. a memory mapped file.
+    The columns are read in place rather than copied, and item names are only decoded as their rows are materialized,
+    so loading a report costs little more than reading its header. Without NumPy, the rows are evaluated item by item.
+    Python 2 can neither cast nor memory map views, so there the columns are copied out of the buffer instead.
+    """
+    def __init__(self, buffer): #pylint: disable=super-init-not-called
+        """Creates a new MappedColumnarReport instance.
+        @param buffer A buffer (e.g. an mmap or bytes) holding the report, which must not be closed before the report is.
+        @throws vigilance.error.ReportParsingError if the buffer does not hold a complete report.
+        """
+        view = buffer if six.PY2 else memoryview(buffer)
+        self._views = [] if six.PY2 else [view]
+        try:
+            self._map(view)
+        except Exception:
+            self.close()
+            raise
+
+    def _map(self, view):
+        if len(view) < self.Header.size:
+            raise ReportParsingError('Truncated binary columnar report')
+        magic, rows, namesSize = self.Header.unpack_from(view)
+        if magic != self.Magic:
+            raise ReportParsingError('Unsupported version {} of the binary columnar report format'.format(bytearray(magic[-1:])[0]))
+        if len(view) != self.Header.size + rows * 34 + 8 + namesSize:
+            raise ReportParsingError('Truncated binary columnar report')
+        offset = self.Header.size
+        self.lineCoverage, offset = self._column(view, offset, 'd', rows)
+        self.branchCoverage, offset = self._column(view, offset, 'd', rows)
+        self.complexity, offset = self._column(view, offset, 'd', rows)
+        offsets, offset = self._column(view, offset, 'Q', rows + 1)
+        self.kinds, offset = self._column(view, offset, 'b', rows)
+        flags, offset = self._column(view, offset, 'B', rows)
+        names = view[offset:]
+        if six.PY3:
+            self._views.append(names)
+        self.names = _StringTable(names, offsets)
+        self.exact = {}
+        for match in re.finditer(b'[^\x00]', bytes(view[offset - rows:offset])):
+            row = match.start()
+            metrics = (self.lineCoverage[row], self.branchCoverage[row], self.complexity[row])
+            self.exact[row] = tuple(int(metric) if flags[row] & (1 << index) else metric for index, metric in enumerate(metrics))
+
+    def _column(self, view, offset, typecode, length):
+        end = offset + length * struct.calcsize(typecode)
+        if six.PY2:
+            return _unpack_column(typecode, view[offset:end]), end
+        column = view[offset:end].cast(typecode)
+        self._views.append(column)
+        if sys.byteorder != 'little' and column.itemsize > 1:
+            column = array(typecode, column)
+            column.byteswap()
+        return column, end
+
+    def iter_items(self, scope=None):
+        """Materializes the rows of the report one at a time.
+        @param scope A vigilance.scope.ChangedFiles instance; if provided, only the files of the change and the
+        packages containing them are produced.
+        @returns A generator of FileUnderTest and PackageUnderTest instances.
+        """
+        affected = False
+        for row in six.moves.range(len(self)):
+            if scope is None:
+                yield self.item(row)
+            elif self.kinds[row] == self.PackageKind:
+                if affected:
+                    yield self.item(row)
+                affected = False
+            elif self.names[row] in scope:
+                affected = True
+                yield self.item(row)
+
+    def iter_dissatisfactions(self, constraints):
+        if numpy is None:
+            return QualityReport(self.iter_items()).iter_dissatisfactions(constraints)
+        return super(MappedColumnarReport, self).iter_dissatisfactions(constraints)
+
+    def close(self):
+        """Releases the views of the report onto its buffer, so that the buffer can be closed.
+        """
+        for view in reversed(self._views):
+            view.release()
+        del self._views[:]
+
+class _StringTable(object):
+    """The item names of a MappedColumnarReport, decoded from its string table on access.
+    """
+    __slots__ = ('names', 'offsets')
+
+    def __init__(self, names, offsets):
+        self.names = names
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return bytes(self.names[self.offsets[row]:self.offsets[row + 1]]).decode('utf-8')
+
+def _pack_column(typecode, values):
+    """Converts a column into its little-endian binary representation.
+    """
+    if six.PY2:
+        return struct.pack('<{}{}'.format(len(values), typecode), *values)
+    column = array(typecode, values)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tobytes()
+
+def _unpack_column(typecode, data):
+    """Converts the little-endian binary representation of a column into an array, or a tuple for 64-bit integers,
+    which Python 2 arrays do not support.
+    """
+    values = struct.unpack('<{}{}'.format(len(data) // struct.calcsize(typecode), typecode), data)
+    return values if typecode == 'Q' else array(typecode, values)
 
 class Default(AbstractPlugin):
     """The AbstractPlugin implementation for coverage.
@@ -2,39 +2,186 @@
 @file
 Contains the quality suite definitions necessary for doxygen enforcement.
 """
+import itertools
+import re
+from collections import OrderedDict
+
+import six
 from vigilance.configuration import ConfigurationStanza
 from vigilance.constraint import Constraint
-from vigilance.parser import Parser
+from vigilance.error import ConfigurationParsingError
+from vigilance.parser import Parser, iter_lines
 from vigilance.plugin import AbstractPlugin, SuiteComponents
-from vigilance.representation import QualityItem, QualityReport, Satisfaction
+from vigilance.representation import QualityItem, QualityReport, Satisfaction, Satisfied
+
+## Matches warnings in the default doxygen WARN_FORMAT ("$file:$line: $text").
+_Warning = re.compile(r'^(?P<file>.+?):(?P<line>\d+):(?:\d+:)? (?:warning|error): (?P<message>.*)$', re.IGNORECASE)
+## Common warnings that mention the documented entity and the kind of warning they represent.
+_Kinds = [('undocumented member', r'Member .* is not documented'),
+          ('undocumented compound', r'Compound .* is not documented'),
+          ('undocumented parameter', r'The following parameters? of .* (?:is|are) not documented'),
+          ('undocumented return type', r'return type of member .* is not documented'),
+          ('unknown parameter', r'argument .* of command @param is not found')]
+## The kinds of the common warnings, which are the only kinds that budgets can be restricted to.
+_KindNames = [name for name, _ in _Kinds]
+## Matches any of the common warnings with a single pattern; the index of the matching group identifies its kind.
+_KnownKind = re.compile('|'.join('({})'.format(pattern) for _, pattern in _Kinds))
+## Names quoted in any other warning, which are left out of its kind.
+_Quoted = re.compile(r'\'[^\']*\'|"[^"]*"|`[^`]*`')
+
+def _warning_kind(message):
+    """Determines the kind of a doxygen warning, i.e. its message independent of the entities it mentions.
+    @param message The text of the warning, without its file and line prefix.
+    @returns A string that is equal for warnings of the same kind.
+    """
+    match = _KnownKind.match(message)
+    if match is not None:
+        return _Kinds[match.lastindex - 1][0]
+    return _Quoted.sub("''", message)
 
 class DocumentationError(QualityItem):
-    """Represents a single documentation error from a Doxygen run.
+    """Represents one or more documentation errors of the same kind in the same file from a Doxygen run.
+    The metrics of the item are the first error message of its kind.
     """
+    __slots__ = ('filePath', 'kind', 'count')
+
+    def __init__(self, metrics, filePath=None, kind=None, count=1):
+        super(DocumentationError, self).__init__(metrics)
+        self.filePath = filePath
+        self.kind = kind
+        self.count = count
+
     @property
     def identifier(self):
+        if self.count > 1:
+            return 'documentation failure: {} (and {} similar warning(s))'.format(self.metrics, self.count - 1)
         return 'documentation failure: {}'.format(self.metrics)
 
 class DoxygenParser(Parser):
     """A Parser implementation for Doxygen error reports.
     These reports should be generated by redirecting stderr from the doxygen command to a file.
+    The report is read line by line and warnings are grouped by their file and kind as they are read, so memory use
+    and output grow with the number of distinct problems rather than the number of lines in the report.
     """
     def parse(self, fileContents):
-        docErrors = [DocumentationError(line) for line in fileContents.split('\n') if line]
-        return QualityReport(docErrors)
+        return self.parse_report(fileContents)
+
+    def parse_report(self, report, scope=None, lazy=False): #pylint: disable=arguments-differ
+        """Parses a Doxygen error report.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report, or a list of them whose
+        warnings are grouped together.
+        @param scope A vigilance.scope.ChangedFiles instance; if provided, only warnings for changed files and
+        warnings without a file are reported.
+        @param lazy Whether the report should be parsed on demand as its items are consumed.
+        @returns A vigilance.representation.QualityReport instance.
+        """
+        items = self.iterparse(report, scope)
+        return QualityReport(items if lazy else list(items))
+
+    @staticmethod
+    def iterparse(report, scope=None):
+        """Groups the warnings of a Doxygen error report by their file and kind.
+        Indented lines continue the preceding warning and are not reported separately. Lines that are not in the
+        default doxygen warning format are grouped by their kind alone.
+        @param report A report source as accepted by vigilance.parser.Parser.parse_report, or a list of them.
+        @param scope A vigilance.scope.ChangedFiles instance restricting the reported warnings, if any.
+        @returns A generator of DocumentationError instances, which yields once the whole report has been read.
+        """
+        groups = OrderedDict()
+        match = None
+        reports = report if isinstance(report, list) else [report]
+        for line in itertools.chain.from_iterable(iter_lines(source) for source in reports):
+            if not line.strip() or (match is not None and line[:1].isspace()):
+                continue
+            match = _Warning.match(line)
+            filePath = match.group('file') if match else None
+            if scope is not None and filePath is not None and filePath not in scope:
+                continue
+            key = (filePath, _warning_kind(match.group('message') if match else line.strip()))
+            group = groups.get(key)
+            if group is None:
+                groups[key] = DocumentationError(line, *key)
+            else:
+                group.count += 1
+        for item in six.itervalues(groups):
+            yield item
 
 class Documentation(Constraint):
     """A Constraint that enforces documentation.
     """
     def satisfied_by(self, item):
-        return Satisfaction(False, item.identifier)
+        return Satisfaction(False, '{0.identifier}', item)
+
+class Budget(Constraint):
+    """A Constraint that tolerates a limited number of documentation warnings, e.g. in legacy code.
+    Budgets override the Documentation constraint for the warnings they apply to. Warnings are counted across all
+    of those items in a single pass over the report; the budget is reported as exceeded once, by the item whose
+    warnings exceed it.
+    """
+    def __init__(self, maximum, kind=None, pathRegex=None):
+        """Creates a new Budget instance.
+        @param maximum The maximum number of warnings allowed.
+        @param kind The kind of warning that the budget is restricted to (e.g. "undocumented member"), if any.
+        @param pathRegex A compiled regex that the file paths of the budgeted warnings must match, if any.
+        """
+        self.maximum = maximum
+        self.kind = kind
+        self.pathRegex = pathRegex
+        self.count = 0
+
+    def is_of_type(self, constraintType):
+        return constraintType == Documentation
+
+    def applies_to(self, item):
+        if self.kind is not None and getattr(item, 'kind', None) != self.kind:
+            return False
+        if self.pathRegex is None:
+            return True
+        filePath = getattr(item, 'filePath', None)
+        return filePath is not None and self.pathRegex.search(filePath) is not None
+
+    def satisfied_by(self, item):
+        previous = self.count
+        self.count += getattr(item, 'count', 1)
+        if previous <= self.maximum < self.count:
+            return Satisfaction(False, 'Documentation budget of {0.maximum} {1}warning(s){2} exceeded by {3.identifier}',
+                                self, self.kind + ' ' if self.kind else '',
+                                ' matching "{}"'.format(self.pathRegex.pattern) if self.pathRegex else '', item)
+        return Satisfied
+
+    def reset(self):
+        self.count = 0
 
 class DocumentationStanza(ConfigurationStanza):
     """The documentation configuration stanza.
+    Its constraint applies to every warning that is not covered by a budget.
     """
+    Defaults = True
+
     def parse(self, stanza):
         return [Documentation()]
 
+class BudgetStanza(ConfigurationStanza):
+    """The documentation budget configuration stanza.
+    """
+    def parse(self, stanza):
+        try:
+            maximum = stanza['max']
+        except KeyError:
+            raise ConfigurationParsingError('Budget stanza requires "max" key')
+        if not isinstance(maximum, six.integer_types) or isinstance(maximum, bool) or maximum < 0:
+            raise ConfigurationParsingError('Budget stanza "max" must be a non-negative integer')
+        kind = stanza.get('kind')
+        if kind is not None and kind not in _KindNames:
+            raise ConfigurationParsingError('Budget stanza "kind" must be one of: {}'.format(', '.join(_KindNames)))
+        pathRegex = stanza.get('path')
+        if pathRegex is not None:
+            try:
+                pathRegex = re.compile(pathRegex)
+            except (re.error, TypeError) as ex:
+                raise ConfigurationParsingError('Budget stanza "path" is not a valid regex: {}'.format(ex))
+        return [Budget(maximum, kind, pathRegex)]
+
 class Default(AbstractPlugin):
     """The AbstractPlugin implementation for doxygen.
     """
@@ -42,4 +189,4 @@ class Default(AbstractPlugin):
         return SuiteComponents('doxygen',
                                DoxygenParser(),
                                {'documentation': Documentation},
-                               {'documentation': DocumentationStanza})
+                               {'documentation': DocumentationStanza, 'budget': BudgetStanza})
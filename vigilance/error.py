@@ -33,3 +33,15 @@ class QualityViolationsDetected(VigilanceException):
     """
     def __init__(self, message):
         super(QualityViolationsDetected, self).__init__(message, 1)
+
+class ServerUnavailable(VigilanceException):
+    """Raised when the vigilance server cannot be started or reached.
+    """
+    def __init__(self, message):
+        super(ServerUnavailable, self).__init__(message, -5)
+
+class OutputError(VigilanceException):
+    """Raised when the results cannot be written to the requested output file.
+    """
+    def __init__(self, message):
+        super(OutputError, self).__init__(message, -6)
@@ -0,0 +1,264 @@
+"""@ingroup vigilance
+@file
+Contains the instrumentation that records where the time and memory of a vigilance run are spent.
+Nothing is recorded unless a Recorder is activated with recording(). While one is, the phases of a run are recorded
+as spans, keyed by the quality suite that they belong to and the name of the phase. Plugins can record phases of
+their own with span(), which attributes them to the suite that is currently running:
+
+    with instrumentation.span('load index') as indexSpan:
+        indexSpan.count('entries', len(entries))
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import six
+
+try:
+    import resource
+except ImportError: #pragma: no cover
+    resource = None
+
+## The clock used to time spans.
+clock = getattr(time, 'perf_counter', time.time)
+## The factor converting ru_maxrss to bytes, which is reported in KiB everywhere except on macOS.
+MaxRssScale = 1 if sys.platform == 'darwin' else 1024
+
+_active = None
+_context = threading.local()
+
+def peak_memory():
+    """Determines the peak memory use of the process so far.
+    @returns The peak traced memory in bytes if tracemalloc is tracing, otherwise the maximum resident set size in
+    bytes, or None if neither is available.
+    """
+    tracemalloc = sys.modules.get('tracemalloc')
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[1]
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MaxRssScale
+
+class Span(object):
+    """The accumulated measurements of one phase of a run.
+    A span may be entered many times (e.g. once per quality item); its duration and calls are the totals.
+    """
+    __slots__ = ('suite', 'name', 'duration', 'calls', 'counters', 'peakMemory')
+
+    def __init__(self, suite, name):
+        self.suite = suite
+        self.name = name
+        self.duration = 0.0
+        self.calls = 0
+        self.counters = OrderedDict()
+        self.peakMemory = None
+
+    def add(self, duration, calls=1):
+        """Adds a measurement to the span.
+        @param duration The duration of the measurement in seconds.
+        @param calls The number of calls that the measurement covers.
+        """
+        self.duration += duration
+        self.calls += calls
+
+    def count(self, counter, value=1):
+        """Increments a counter of the span, e.g. the number of items that a phase produced.
+        @param counter The name of the counter.
+        @param value The amount to add to the counter.
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def to_dict(self):
+        """Returns the measurements of the span as a dictionary suitable for JSON serialization.
+        """
+        return OrderedDict([('suite', self.suite), ('phase', self.name), ('seconds', self.duration), ('calls', self.calls),
+                            ('counters', self.counters), ('peakMemory', self.peakMemory)])
+
+class _NullSpan(object):
+    """The span yielded by span() while nothing is being recorded; all measurements are discarded.
+    """
+    __slots__ = ()
+
+    def add(self, duration, calls=1):
+        pass
+
+    def count(self, counter, value=1):
+        pass
+
+_Null = _NullSpan()
+
+class Recorder(object):
+    """Records the spans of a run.
+    """
+    def __init__(self):
+        self.spans = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_span(self, name, suite=None):
+        """Retrieves a span, creating it if necessary.
+        @param name The name of the phase.
+        @param suite The key of the quality suite that the phase belongs to; defaults to the suite running in the
+        current thread, if any.
+        @returns A Span instance.
+        """
+        suite = suite if suite is not None else current_suite()
+        key = (suite, name)
+        span = self.spans.get(key)
+        if span is None:
+            with self.lock:
+                span = self.spans.setdefault(key, Span(suite, name))
+        return span
+
+    def timed(self, name, function, suite=None):
+        """Wraps a function so that each of its calls is added to a span.
+        This is meant for functions that are called once per item; unlike span(), it does not measure memory.
+        @param name The name of the phase.
+        @param function The function to time.
+        @param suite The key of the quality suite that the phase belongs to; see get_span.
+        @returns The wrapped function.
+        """
+        span = self.get_span(name, suite)
+        def timed_function(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                span.add(clock() - start)
+        return timed_function
+
+    def timed_iter(self, name, iterable, suite=None):
+        """Wraps an iterable so that producing each of its elements is added to a span.
+        @param name The name of the phase.
+        @param iterable The iterable to time, e.g. the items of a lazily parsed report.
+        @param suite The key of the quality suite that the phase belongs to; see get_span.
+        @returns A generator of the elements of the iterable.
+        """
+        return self._timed_iter(self.get_span(name, suite), iter(iterable))
+
+    @staticmethod
+    def _timed_iter(span, iterator):
+        while True:
+            start = clock()
+            try:
+                element = next(iterator)
+            except StopIteration:
+                span.add(clock() - start, 0)
+                return
+            span.add(clock() - start)
+            yield element
+
+    def to_json(self):
+        """Returns all spans as a JSON document, in the order that they were first recorded.
+        """
+        return json.dumps([span.to_dict() for span in list(six.itervalues(self.spans))], indent=2)
+
+    def to_text(self):
+        """Returns all spans as a human-readable table, in the order that they were first recorded.
+        """
+        spans = list(six.itervalues(self.spans))
+        suiteWidth = max([len('suite')] + [len(span.suite or '') for span in spans])
+        nameWidth = max([len('phase')] + [len(span.name) for span in spans])
+        row = '{{:<{}}}  {{:<{}}}  {{:>12}}  {{:>10}}  {{:>10}}  {{}}'.format(suiteWidth, nameWidth)
+        lines = [row.format('suite', 'phase', 'time (ms)', 'calls', 'peak (MiB)', 'counters').rstrip()]
+        for span in spans:
+            peak = '{:.1f}'.format(span.peakMemory / 1048576.0) if span.peakMemory is not None else '-'
+            counters = ', '.join('{}={}'.format(counter, value) for counter, value in six.iteritems(span.counters))
+            lines.append(row.format(span.suite or '-', span.name, '{:.2f}'.format(span.duration * 1000), span.calls, peak, counters).rstrip())
+        return '\n'.join(lines)
+
+def active():
+    """Returns the Recorder that is currently recording, or None if instrumentation is disabled.
+    """
+    return _active
+
+def current_suite():
+    """Returns the key of the quality suite that is running in the current thread, if any.
+    """
+    return getattr(_context, 'suite', None)
+
+@contextmanager
+def recording(recorder):
+    """Activates a Recorder for the duration of a block.
+    @param recorder A Recorder instance, or None to leave instrumentation disabled.
+    """
+    global _active #pylint: disable=global-statement
+    previous, _active = _active, recorder if recorder is not None else _active
+    try:
+        yield recorder
+    finally:
+        _active = previous
+
+@contextmanager
+def suite(suiteType):
+    """Attributes the spans recorded by the current thread during a block to a quality suite.
+    @param suiteType The key of the quality suite.
+    """
+    previous = current_suite()
+    _context.suite = suiteType
+    try:
+        yield
+    finally:
+        _context.suite = previous
+
+@contextmanager
+def span(name, suite=None): #pylint: disable=redefined-outer-name
+    """Records the duration and peak memory of a block as a span.
+    @param name The name of the phase.
+    @param suite The key of the quality suite that the phase belongs to; defaults to the suite running in the current thread.
+    @returns A context manager yielding the Span, whose counters may be incremented within the block. While
+    instrumentation is disabled, a span that discards all measurements is yielded instead.
+    """
+    recorder = _active
+    if recorder is None:
+        yield _Null
+        return
+    measured = recorder.get_span(name, suite)
+    start = clock()
+    try:
+        yield measured
+    finally:
+        measured.add(clock() - start)
+        memory = peak_memory()
+        if memory is not None and (measured.peakMemory is None or memory > measured.peakMemory):
+            measured.peakMemory = memory
+
+@contextmanager
+def profiling(directory):
+    """Captures a cProfile profile and a tracemalloc snapshot of a block and writes them to a directory.
+    The profile is written to vigilance.pstats and the snapshot to vigilance.tracemalloc; they can be inspected with
+    the pstats and tracemalloc modules respectively. Only the thread that enters the block is profiled.
+    If the directory cannot be created, a warning is logged and nothing is captured.
+    @param directory The directory to write to, which is created if necessary, or None to capture nothing.
+    """
+    if directory is not None and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except (IOError, OSError):
+            logging.getLogger(__name__).warning('Unable to create profile directory "%s"; the run is not profiled', directory)
+            directory = None
+    if directory is None:
+        yield
+        return
+    import cProfile
+    try:
+        import tracemalloc
+    except ImportError: #pragma: no cover
+        tracemalloc = None
+    tracing = tracemalloc is not None and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(os.path.join(directory, 'vigilance.pstats'))
+        if tracing:
+            tracemalloc.take_snapshot().dump(os.path.join(directory, 'vigilance.tracemalloc'))
+            tracemalloc.stop()
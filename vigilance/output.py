@@ -0,0 +1,273 @@
+"""@ingroup vigilance
+@file
+Contains the writers that report the results of quality suites in human-readable or machine-readable formats.
+Writers buffer their output and write it in large batches, so that reporting hundreds of thousands of violations
+does not cost a system call each.
+"""
+import gzip
+import hashlib
+import io
+import json
+import sys
+from abc import ABCMeta, abstractmethod
+from xml.sax.saxutils import escape, quoteattr
+
+import six
+from vigilance.instrumentation import clock
+
+@six.add_metaclass(ABCMeta)
+class ResultWriter(object):
+    """Writes the results of quality suites to a text stream.
+    Results are buffered until BufferSize characters have accumulated, FlushInterval seconds have passed since the
+    last write, or a suite has finished.
+    """
+    ## The number of buffered characters that causes the buffer to be written.
+    BufferSize = 1 << 16
+    ## The number of seconds after which buffered results are written even if the buffer is not full.
+    FlushInterval = 0.5
+
+    def __init__(self, stream=None, dedupe=False):
+        """Creates a new ResultWriter instance.
+        @param stream The text stream to write to; defaults to the stdout of the moment that results are written.
+        @param dedupe Whether repeated violations with the same message are written only once per suite.
+        """
+        self.stream = stream
+        self.dedupe = dedupe
+        self.buffer = []
+        self.buffered = 0
+        self.lastFlush = clock()
+        self.seen = set()
+        self.duplicates = 0
+
+    def fork(self, stream):
+        """Creates a writer of the same format and options that writes to another stream.
+        Forks are used to buffer the results of suites that run concurrently; they never write a document header or footer.
+        @param stream The text stream of the fork.
+        @returns A ResultWriter instance.
+        """
+        return type(self)(stream, self.dedupe)
+
+    def write(self, text):
+        """Writes raw text to the buffer.
+        @param text The text to write.
+        """
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.BufferSize or clock() - self.lastFlush >= self.FlushInterval:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffer to the stream.
+        """
+        if self.buffer:
+            (self.stream or sys.stdout).write(''.join(self.buffer))
+            del self.buffer[:]
+            self.buffered = 0
+        self.lastFlush = clock()
+
+    def begin(self):
+        """Writes the header of the document, if the format has one.
+        """
+        pass
+
+    def end(self):
+        """Writes the footer of the document, if the format has one, and flushes the buffer.
+        """
+        self.flush()
+
+    def violation(self, suiteType, message):
+        """Reports a quality violation.
+        @param suiteType The key of the quality suite that detected the violation.
+        @param message The message of the violation.
+        @returns False if the violation was dropped as a duplicate, otherwise True.
+        """
+        if self.dedupe:
+            digest = hashlib.md5(message.encode('utf-8')).digest()[:8]
+            if digest in self.seen:
+                self.duplicates += 1
+                return False
+            self.seen.add(digest)
+        self.write_violation(suiteType, message)
+        return True
+
+    def finish_suite(self, suiteType, violations, limit=None):
+        """Reports that a quality suite has finished and flushes the buffer.
+        @param suiteType The key of the quality suite.
+        @param violations The number of violations that the suite detected, including duplicates.
+        @param limit The violation limit if the suite stopped once it was reached, otherwise None.
+        """
+        self.write_result(suiteType, violations, limit, self.duplicates)
+        self.seen.clear()
+        self.duplicates = 0
+        self.flush()
+
+    def error(self, suiteType, message):
+        """Reports that a quality suite could not be run to completion, e.g. because its report could not be parsed.
+        @param suiteType The key of the quality suite.
+        @param message The error message.
+        """
+        self.seen.clear()
+        self.duplicates = 0
+        self.flush()
+
+    @abstractmethod
+    def write_violation(self, suiteType, message):
+        """Writes a single quality violation.
+        @param suiteType The key of the quality suite that detected the violation.
+        @param message The message of the violation.
+        """
+        pass
+
+    @abstractmethod
+    def write_result(self, suiteType, violations, limit, duplicates):
+        """Writes the result of a quality suite.
+        @param suiteType The key of the quality suite.
+        @param violations The number of violations that the suite detected.
+        @param limit The violation limit if the suite stopped once it was reached, otherwise None.
+        @param duplicates The number of violations that were dropped as duplicates.
+        """
+        pass
+
+class TextWriter(ResultWriter):
+    """Writes the message of each violation on its own line, followed by a line describing the result of the suite.
+    This is the default format of vigilance.
+    """
+    def write_violation(self, suiteType, message):
+        self.write(message + '\n')
+
+    def write_result(self, suiteType, violations, limit, duplicates):
+        if duplicates:
+            self.write('Omitted {} duplicate quality violation(s) of {}\n'.format(duplicates, suiteType))
+        if limit is not None:
+            self.write('Stopped checking {} after {} quality violation(s); further violations may exist\n'.format(suiteType, limit))
+        elif not violations:
+            self.write('Quality validation complete for {}\n'.format(suiteType))
+
+class SummaryWriter(ResultWriter):
+    """Writes a single line per suite with its number of violations, omitting the violations themselves.
+    """
+    def write_violation(self, suiteType, message):
+        pass
+
+    def write_result(self, suiteType, violations, limit, duplicates):
+        if not violations:
+            self.write('Quality validation complete for {}\n'.format(suiteType))
+        else:
+            self.write('{} quality violation(s) detected for {}{}\n'.format(
+                violations, suiteType, '; further violations may exist' if limit is not None else ''))
+
+    def error(self, suiteType, message):
+        self.write('Could not check {}: {}\n'.format(suiteType, message))
+        super(SummaryWriter, self).error(suiteType, message)
+
+class JsonLinesWriter(ResultWriter):
+    """Writes a JSON object per line for each violation, error and suite result.
+    Records are distinguished by their "type": "violation" records carry the "suite" and "message" of a violation,
+    "result" records the number of "violations" of a suite, whether it was "truncated" by a violation limit and the
+    number of "duplicates" omitted, and "error" records the "message" of a suite that could not be run.
+    """
+    def write_violation(self, suiteType, message):
+        self.write(json.dumps({'type': 'violation', 'suite': suiteType, 'message': message}) + '\n')
+
+    def write_result(self, suiteType, violations, limit, duplicates):
+        self.write(json.dumps({'type': 'result', 'suite': suiteType, 'violations': violations,
+                               'truncated': limit is not None, 'duplicates': duplicates}) + '\n')
+
+    def error(self, suiteType, message):
+        self.write(json.dumps({'type': 'error', 'suite': suiteType, 'message': message}) + '\n')
+        super(JsonLinesWriter, self).error(suiteType, message)
+
+class JUnitWriter(ResultWriter):
+    """Writes a JUnit XML document with a test suite per quality suite and a failed test case per violation.
+    Suites without violations are reported as a single passing test case, and suites that could not be run as a
+    test case with an error. Test suites are written as they run, so their test counts are left to the consumer.
+    """
+    def __init__(self, stream=None, dedupe=False):
+        super(JUnitWriter, self).__init__(stream, dedupe)
+        self.openSuite = None
+
+    def begin(self):
+        self.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+
+    def end(self):
+        self.write('</testsuites>\n')
+        super(JUnitWriter, self).end()
+
+    def _open(self, suiteType):
+        if self.openSuite != suiteType:
+            self.write('<testsuite name={}>\n'.format(quoteattr(suiteType)))
+            self.openSuite = suiteType
+
+    def _close(self):
+        self.write('</testsuite>\n')
+        self.openSuite = None
+
+    def _testcase(self, suiteType, name, body=''):
+        self.write('<testcase classname={} name={}>{}</testcase>\n'.format(quoteattr('vigilance.' + suiteType), quoteattr(name), body))
+
+    def write_violation(self, suiteType, message):
+        self._open(suiteType)
+        self._testcase(suiteType, message, '<failure message={}>{}</failure>'.format(quoteattr(message), escape(message)))
+
+    def write_result(self, suiteType, violations, limit, duplicates):
+        self._open(suiteType)
+        if not violations:
+            self._testcase(suiteType, 'quality')
+        self._close()
+
+    def error(self, suiteType, message):
+        self._open(suiteType)
+        self._testcase(suiteType, 'quality', '<error message={}>{}</error>'.format(quoteattr(message), escape(message)))
+        self._close()
+        super(JUnitWriter, self).error(suiteType, message)
+
+## The available result writers, keyed by the name of their format.
+Writers = {'text': TextWriter, 'summary': SummaryWriter, 'jsonl': JsonLinesWriter, 'junit': JUnitWriter}
+
+def open_output(path, compress=False):
+    """Opens the destination of results as a text stream.
+    @param path The path of the file to write, or "-" for stdout.
+    @param compress Whether the output should be gzip compressed; implied by a path ending in ".gz".
+    @returns A text stream. Closing it does not close stdout.
+    """
+    compress = compress or path.endswith('.gz')
+    if path == '-':
+        if not compress:
+            return _Uncloseable(sys.stdout)
+        binary = gzip.GzipFile(fileobj=getattr(sys.stdout, 'buffer', sys.stdout), mode='wb')
+    elif compress:
+        binary = gzip.open(path, 'wb')
+    elif six.PY3:
+        return io.open(path, 'w', encoding='utf-8')
+    else:
+        binary = open(path, 'wb')
+    if six.PY2:
+        return _NativeStream(binary)
+    return io.TextIOWrapper(binary, encoding='utf-8')
+
+class _NativeStream(object):
+    """Wraps a binary stream such that it accepts native strings on Python 2, where writers produce byte strings.
+    Unicode strings are encoded as UTF-8.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        if isinstance(text, six.text_type):
+            text = text.encode('utf-8')
+        self.stream.write(text)
+
+    def close(self):
+        self.stream.close()
+
+class _Uncloseable(object):
+    """Wraps a stream such that closing the wrapper only flushes the stream.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def close(self):
+        self.stream.flush()
@@ -2,8 +2,76 @@
 @file
 Contains functionality for reading coverage output and parsing it into the Vigilance internal representation.
 """
+import codecs
+import logging
+import mmap
 from abc import ABCMeta, abstractmethod
 import six
+from vigilance.error import ReportParsingError
+
+## The number of bytes (or characters) read from a report source at a time.
+ChunkSize = 1 << 16
+
+def iter_chunks(report, chunkSize=ChunkSize):
+    """Yields successive chunks of a quality report without reading the whole report into memory.
+    @param report A report source: a string, bytes, a buffer (memoryview, mmap, bytearray) or a readable file object.
+    @param chunkSize The maximum size of each chunk read from streams and buffers.
+    Buffers (including memory maps) are always read from their beginning, independent of any file position.
+    @returns A generator of string or bytes chunks, depending upon the type of @p report.
+    """
+    if isinstance(report, (six.text_type, six.binary_type)):
+        if report:
+            yield report
+        return
+    if isinstance(report, mmap.mmap):
+        for offset in six.moves.range(0, len(report), chunkSize):
+            yield report[offset:offset + chunkSize]
+        return
+    if hasattr(report, 'read'):
+        while True:
+            chunk = report.read(chunkSize)
+            if not chunk:
+                return
+            yield chunk
+    view = memoryview(report)
+    for offset in six.moves.range(0, len(view), chunkSize):
+        yield view[offset:offset + chunkSize].tobytes()
+
+def iter_lines(report, chunkSize=ChunkSize):
+    """Yields the lines of a quality report without reading the whole report into memory.
+    Binary reports are decoded as UTF-8, replacing undecodable bytes.
+    @param report A report source as accepted by iter_chunks.
+    @param chunkSize The maximum size of each chunk read from streams and buffers.
+    @returns A generator of strings without their line terminators.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    remainder = ''
+    for chunk in iter_chunks(report, chunkSize):
+        if six.PY3 and isinstance(chunk, six.binary_type):
+            chunk = decoder.decode(chunk)
+        start = 0
+        end = chunk.find('\n')
+        while end != -1:
+            yield (remainder + chunk[start:end] if remainder else chunk[start:end]).rstrip('\r')
+            remainder = ''
+            start = end + 1
+            end = chunk.find('\n', start)
+        remainder += chunk[start:]
+    if six.PY3:
+        remainder += decoder.decode(b'', True)
+    if remainder:
+        yield remainder.rstrip('\r')
+
+def read_report(report):
+    """Reads a report source in its entirety and decodes it into a native string.
+    This is the compatibility path for parsers that only implement Parser.parse.
+    @param report A report source as accepted by iter_chunks.
+    @returns The string contents of @p report.
+    """
+    chunks = list(iter_chunks(report))
+    if chunks and isinstance(chunks[0], six.binary_type):
+        return six.ensure_str(six.binary_type().join(chunks))
+    return ''.join(chunks)
 
 @six.add_metaclass(ABCMeta)
 class Parser(object):
@@ -18,3 +86,38 @@ class Parser(object):
         @throws vigilance.error.ReportParsingError if an unrecoverable error is encountered during parsing.
         """
         pass
+
+    def is_cacheable(self, report): #pylint: disable=unused-argument, no-self-use
+        """Determines whether the parsed form of a report source should be cached.
+        Parsers should return False for sources that they load faster than a cached report could be loaded.
+        @param report A report source as accepted by parse_report, or a list of them.
+        @returns True unless the report should neither be loaded from nor stored in the cache.
+        """
+        return True
+
+    def parse_report(self, report, scope=None, lazy=False, **options): #pylint: disable=unused-argument
+        """Parses coverage output from an arbitrary report source.
+        Parsers that are able to consume their input incrementally should override this method so that large reports
+        are never read or decoded as a whole. The default implementation reads and decodes the full report and defers to parse.
+        @param report A report source: a string, bytes, a buffer (memoryview, mmap) or an open (preferably binary) file object.
+        Parsers that are able to combine several reports (e.g. from parallel test runs) accept a list of report sources;
+        the default implementation does not.
+        @param scope A vigilance.scope.ChangedFiles instance restricting the report to the items affected by a change, if any.
+        Parsers that can skip unaffected items while parsing should override this method to do so; the default
+        implementation filters the parsed items by their file paths.
+        @param lazy Whether the caller consumes the items of the returned report only once, in which case parsers may
+        return a report whose items are an iterator that parses the report on demand. The default implementation ignores it.
+        @param options Parser-specific keyword options taken from the "options" key of the suite configuration.
+        Parsers that accept options should declare them as keyword arguments of their override.
+        @returns A vigilance.representation.QualityReport instance.
+        @throws vigilance.error.ReportParsingError if an unrecoverable error is encountered during parsing.
+        @see iter_chunks
+        """
+        if options:
+            logging.getLogger(__name__).warning('Ignoring unsupported parser options: %s', ', '.join(sorted(options)))
+        if isinstance(report, list):
+            raise ReportParsingError('{} does not support multiple reports'.format(type(self).__name__))
+        quality = self.parse(read_report(report))
+        if scope is not None:
+            quality.items = list(scope.filter(quality.items))
+        return quality
@@ -7,9 +7,11 @@ import logging
 import os
 from abc import ABCMeta, abstractmethod
 from collections import namedtuple
+from functools import partial
 
 import six
 from six.moves.configparser import ConfigParser, Error #pylint: disable=import-error, no-name-in-module
+from vigilance import instrumentation
 from vigilance.suite import QualitySuite
 
 ## The components necessary to construct a vigilance.suite.QualitySuite instance.
@@ -33,8 +35,12 @@ class AbstractPlugin(object):
         pass
 
 ## The default suites that should be available to the Vigilance tool.
-DefaultSuites = ['vigilance.default_suites.cobertura:Default',
-                 'vigilance.default_suites.doxygen:Default']
+DefaultSuites = ['cobertura=vigilance.default_suites.cobertura:Default',
+                 'doxygen=vigilance.default_suites.doxygen:Default']
+## The entry point group through which installed packages can provide plugins; entry point names are suite keys.
+EntryPointGroup = 'vigilance.suites'
+## The plugin specifiers (and the entry point group) whose suites load_suites has registered in this process.
+_registered = set()
 
 def _read_config_file(filename, parser):
     try:
@@ -65,28 +71,85 @@ def get_configured_plugins():
         plugins = parser.get('vigilance', 'plugins').split(',')
     return plugins
 
+def _load_plugin(moduleName, cls):
+    try:
+        with instrumentation.span('import plugin {}'.format(moduleName)):
+            module = importlib.import_module(moduleName)
+    except ImportError:
+        logging.getLogger(__name__).warning('Skipping missing plugin module "%s"', moduleName)
+        return
+    try:
+        plugin = getattr(module, cls)()
+    except AttributeError:
+        logging.getLogger(__name__).warning('Skipping missing plugin implementation "%s" within plugin "%s"', cls, moduleName)
+        return
+    QualitySuite.add_suite(*plugin.get_suite_components())
+
+def _load_entry_point(entryPoint):
+    try:
+        with instrumentation.span('import plugin {}'.format(entryPoint.name)):
+            plugin = entryPoint.load()()
+    except (ImportError, AttributeError):
+        logging.getLogger(__name__).warning('Skipping unloadable plugin entry point "%s"', entryPoint.name)
+        return
+    QualitySuite.add_suite(*plugin.get_suite_components())
+
+def _iter_entry_points(group):
+    try:
+        from importlib.metadata import entry_points #pylint: disable=import-error, no-name-in-module
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return []
+        return pkg_resources.iter_entry_points(group)
+    entryPoints = entry_points()
+    if hasattr(entryPoints, 'select'):
+        return entryPoints.select(group=group)
+    return entryPoints.get(group, [])
+
+def _defer_entry_points():
+    for entryPoint in _iter_entry_points(EntryPointGroup):
+        try:
+            QualitySuite.defer_suite(entryPoint.name, partial(_load_entry_point, entryPoint))
+        except ValueError:
+            logging.getLogger(__name__).warning('Skipping plugin entry point "%s"; the quality suite already exists', entryPoint.name)
+
 def load_suites(plugins, disableDefaults=False):
-    """Loads all quality suites that should be made available to the Vigilance tool.
+    """Registers all quality suites that should be made available to the Vigilance tool.
+    Plugin modules are not imported by this function; each is imported only once one of its suites is needed.
+    Specifiers of the form 'key=module:Class' declare the key of the plugin's suite, so the plugin is imported only if
+    that suite is used. Plugins specified without a key, as well as plugins installed via the "vigilance.suites" entry
+    point group, are only loaded once a suite is requested that no keyed plugin provides.
+    Suites are registered once per process: specifiers that an earlier call has registered are skipped, so the
+    command line entry points can be run repeatedly within one process. A key that is already in use by another
+    specifier is logged and skipped.
     @param plugins A list of strings specifying the plugins that should be loaded (e.g. 'vigilance.default_suites.doxygen:Default').
     @param disableDefaults Whether the default suites should be disabled from the suite load.
+    @see vigilance.suite.QualitySuite.get_suite
     """
-    toLoad = plugins
+    toLoad = list(plugins)
     if not disableDefaults:
         toLoad += DefaultSuites
     for pluginSpecifier in toLoad:
+        key, _, target = pluginSpecifier.rpartition('=')
         try:
-            moduleName, cls = pluginSpecifier.split(':')
+            moduleName, cls = target.strip().split(':')
         except ValueError:
             logging.getLogger(__name__).warning('Skipping malformed plugin specifier "%s"', pluginSpecifier)
             continue
-        try:
-            module = importlib.import_module(moduleName)
-        except ImportError:
-            logging.getLogger(__name__).warning('Skipping missing plugin module "%s"', moduleName)
-            continue
-        try:
-            plugin = getattr(module, cls)()
-        except AttributeError:
-            logging.getLogger(__name__).warning('Skipping missing plugin implementation "%s" within plugin "%s"', cls, moduleName)
+        specifier = (key.strip(), moduleName, cls)
+        if specifier in _registered:
             continue
-        QualitySuite.add_suite(*plugin.get_suite_components())
+        if key.strip():
+            try:
+                QualitySuite.defer_suite(key.strip(), partial(_load_plugin, moduleName, cls))
+            except ValueError:
+                logging.getLogger(__name__).warning('Skipping plugin "%s"; the quality suite already exists', pluginSpecifier)
+                continue
+        else:
+            QualitySuite.defer_plugin(partial(_load_plugin, moduleName, cls))
+        _registered.add(specifier)
+    if EntryPointGroup not in _registered:
+        QualitySuite.defer_plugin(_defer_entry_points)
+        _registered.add(EntryPointGroup)
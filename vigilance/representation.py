@@ -4,20 +4,56 @@ Contains data structures to normalize the representation of code quality metrics
 """
 from abc import ABCMeta, abstractproperty
 from collections import namedtuple
+from itertools import islice
 import six
+from six.moves import cPickle as pickle #pylint: disable=import-error
+from vigilance import instrumentation
 
 _satisfaction = namedtuple('_satisfaction', ['satisfied', 'message'])
 
+class _Message(tuple):
+    """A message template together with its format arguments.
+    """
+    __slots__ = ()
+
+    def format(self):
+        """Formats the message.
+        @returns The formatted message string.
+        """
+        template, arguments = self
+        return template.format(*arguments)
+
 class Satisfaction(_satisfaction):
     """The result of a constraint validation.
+    Messages may be given as a str.format template followed by its arguments (e.g.
+    Satisfaction(False, 'Too low for {0.identifier}', item)), in which case the message is only formatted once the
+    message attribute is accessed. Constraints that are satisfied should return the shared Satisfied instance.
     """
-    def __new__(cls, satisfied, message=None):
+    __slots__ = ()
+
+    def __new__(cls, satisfied, message=None, *arguments):
+        if arguments:
+            message = _Message((message, arguments))
         return super(Satisfaction, cls).__new__(cls, satisfied, message)
 
+    @property
+    def message(self):
+        """Returns the message describing the result, formatting it first if necessary.
+        """
+        message = tuple.__getitem__(self, 1)
+        return message.format() if type(message) is _Message else message
+
+## The shared result of every satisfied constraint validation, which avoids an allocation per passing check.
+Satisfied = Satisfaction(True)
+
 @six.add_metaclass(ABCMeta)
 class QualityItem(object):
     """Represents a single item from a code quality report.
+    Reports may contain a very large number of items, so QualityItem declares __slots__; subclasses should declare
+    __slots__ for their own attributes as well to avoid a per-instance __dict__.
     """
+    __slots__ = ('_metrics',)
+
     def __init__(self, metrics):
         self._metrics = metrics
 
@@ -27,6 +63,14 @@ class QualityItem(object):
         """
         return self._metrics
 
+    def state(self):
+        """Returns a value that changes whenever the item or its metrics change, which snapshots use to recognize
+        items whose verdicts can be reused (see vigilance.snapshot).
+        The default implementation pickles the item; subclasses may override it with something cheaper.
+        @returns A string or bytes.
+        """
+        return pickle.dumps(self, 2)
+
     @abstractproperty
     def identifier(self):
         """Returns a string identifier for the item under test.
@@ -41,18 +85,73 @@ class QualityReport(object):
     def __init__(self, items):
         """Creates a new QualityReport instance.
         @param items A list of QualityItem instances that together comprise the full coverage report.
+        Lazily parsed reports may instead provide an iterator, which can only be scrutinized once.
         """
         self.items = items
 
-    def scrutinize(self, constraints):
+    def scrutinize(self, constraints, limit=None):
         """Vigilantly asserts that the provided constraints are satisfied by the quality report.
         @param constraints A vigilance.constraints.ConstraintSet instance.
+        @param limit The maximum number of dissatisfactions to collect; once reached, no further items are checked.
         @returns A list containing any failed vigilance.representation.Satisfaction instances generated by the constraint application.
         """
-        dissatifactions = []
+        if _overrides(self, 'iter_dissatisfactions'):
+            dissatisfactions = self.iter_dissatisfactions(constraints)
+        else:
+            dissatisfactions = self._iter_item_dissatisfactions(constraints)
+        return list(islice(dissatisfactions, limit))
+
+    def iter_dissatisfactions(self, constraints):
+        """Applies the provided constraints to the items of the quality report as they are consumed.
+        Items are resolved to their constraints and evaluated one at a time, so neither the items of a lazily parsed
+        report nor its dissatisfactions are ever held in memory as a whole. Reports that override scrutinize but not
+        this method are scrutinized as a whole instead, so that their own evaluation is never bypassed.
+        @param constraints A vigilance.constraints.ConstraintSet instance.
+        @returns An iterator of the failed vigilance.representation.Satisfaction instances, in report order.
+        """
+        if _overrides(self, 'scrutinize'):
+            return iter(self.scrutinize(constraints))
+        return self._iter_item_dissatisfactions(constraints)
+
+    def evaluates_items(self):
+        """Returns whether the report is evaluated item by item, i.e. whether its type uses the evaluation of
+        QualityReport rather than overriding scrutinize or iter_dissatisfactions (as e.g. columnar reports do).
+        """
+        return not _overrides(self, 'iter_dissatisfactions') and not _overrides(self, 'scrutinize')
+
+    def _iter_item_dissatisfactions(self, constraints):
+        constraints.reset()
+        recorder = instrumentation.active()
+        if recorder is not None:
+            for result in self._iter_timed_dissatisfactions(constraints, recorder):
+                yield result
+            return
         for item in self.items:
             for constraint in constraints.constraints_for(item):
                 result = constraint.satisfied_by(item)
                 if not result.satisfied:
-                    dissatifactions.append(result)
-        return dissatifactions
+                    yield result
+
+    def _iter_timed_dissatisfactions(self, constraints, recorder):
+        """The instrumented equivalent of iter_dissatisfactions, which records the time spent producing items ("parse"),
+        resolving their constraints ("constraints_for") and evaluating them ("satisfied_by").
+        """
+        constraintsFor = recorder.timed('constraints_for', constraints.constraints_for)
+        satisfiedBy = recorder.timed('satisfied_by', lambda constraint, item: constraint.satisfied_by(item))
+        for item in recorder.timed_iter('parse', self.items):
+            for constraint in constraintsFor(item):
+                result = satisfiedBy(constraint, item)
+                if not result.satisfied:
+                    yield result
+
+    def close(self):
+        """Releases the resources held by a lazily parsed report, stopping its parser.
+        """
+        close = getattr(self.items, 'close', None)
+        if close is not None:
+            close()
+
+def _overrides(report, name):
+    """Returns whether the type of a quality report overrides a method of QualityReport.
+    """
+    return six.get_unbound_function(getattr(type(report), name)) is not six.get_unbound_function(getattr(QualityReport, name))
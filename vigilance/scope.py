@@ -0,0 +1,96 @@
+"""@ingroup vigilance
+@file
+Contains the representation of a code change used to restrict quality enforcement to the files that it touches.
+"""
+import os
+import posixpath
+
+import six
+
+def normalize_path(path):
+    """Normalizes a file path so that paths from different tools can be compared.
+    @param path A file path using either forward or backward slashes.
+    @returns The normalized path with forward slashes and without any leading "./".
+    """
+    return posixpath.normpath(path.strip().replace('\\', '/'))
+
+def _is_absolute(path):
+    return path.startswith('/') or path[1:3] == ':/'
+
+class ChangedFiles(object):
+    """The set of files changed by a code change, such as a pull request.
+    Quality items are considered part of the change if their file path matches one of the changed files. Changed
+    paths are relative to the repository, while report paths may be absolute or relative to one of the report's
+    source roots (the current working directory unless the report names its own). A report path matches if it is
+    identical to a changed path after normalization, or if it resolves to a changed path below one of the source
+    roots or one of their parent directories (such as the repository root). Paths are only ever matched on whole
+    path components from such an anchor, so a changed setup.py does not match the setup.py of every subpackage.
+    """
+    def __init__(self, paths, roots=None):
+        """Creates a new ChangedFiles instance.
+        @param paths An iterable of changed file paths; blank entries are ignored.
+        @param roots An iterable of the directories that relative report paths are relative to; defaults to the
+        current working directory.
+        """
+        self.paths = frozenset(normalize_path(path) for path in paths if path.strip())
+        cwd = normalize_path(os.getcwd())
+        self.roots = []
+        for root in (normalize_path(root) for root in ([cwd] if roots is None else roots)):
+            root = root if _is_absolute(root) else posixpath.normpath(posixpath.join(cwd, root))
+            if root not in self.roots:
+                self.roots.append(root)
+        self.anchors = frozenset(self._iter_ancestors(self.roots))
+
+    @staticmethod
+    def _iter_ancestors(roots):
+        for root in roots:
+            root = root.rstrip('/')
+            while root:
+                yield root
+                root = root[:root.rfind('/')] if '/' in root else ''
+            yield ''
+
+    @classmethod
+    def from_file(cls, pathList):
+        """Reads a list of changed files, one path per line (e.g. the output of `git diff --name-only`).
+        @param cls
+        @param pathList An open file object.
+        @returns A ChangedFiles instance.
+        """
+        return cls(six.ensure_str(line) for line in pathList)
+
+    def rooted(self, roots):
+        """Returns the same change for a report whose relative paths are relative to other source roots.
+        @param roots An iterable of source root directories, such as the <source> elements of a Cobertura report.
+        @returns A ChangedFiles instance, or this instance if no roots are given.
+        """
+        roots = [root for root in roots if root.strip()]
+        return type(self)(self.paths, roots) if roots else self
+
+    def __contains__(self, path):
+        if not path:
+            return False
+        path = normalize_path(path)
+        if path in self.paths:
+            return True
+        for absolute in ([path] if _is_absolute(path) else [root.rstrip('/') + '/' + path for root in self.roots]):
+            separator = absolute.find('/')
+            while separator != -1:
+                if absolute[:separator] in self.anchors and absolute[separator + 1:] in self.paths:
+                    return True
+                separator = absolute.find('/', separator + 1)
+        return False
+
+    def __len__(self):
+        return len(self.paths)
+
+    def filter(self, items):
+        """Restricts quality items to those belonging to the change.
+        Items without a filePath attribute cannot be attributed to a file and are always retained.
+        @param items An iterable of vigilance.representation.QualityItem instances.
+        @returns A generator of the retained items.
+        """
+        for item in items:
+            filePath = getattr(item, 'filePath', None)
+            if filePath is None or filePath in self:
+                yield item
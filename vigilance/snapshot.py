@@ -0,0 +1,214 @@
+"""@ingroup vigilance
+@file
+Contains snapshots of the verdicts of a run, which let later runs evaluate only the items that have changed.
+A snapshot records, for every item of a quality suite, a digest of the item (see
+vigilance.representation.QualityItem.state), the signatures of the constraints that applied to it (see
+vigilance.constraint.Constraint.signature) and the messages of the constraints that it did not satisfy. When a
+snapshot is used as the baseline of a run, the recorded messages of an item are reused as long as neither the item
+nor its constraints have changed. If the constraints of a suite are unchanged as a whole, unchanged items are not
+even resolved to their constraints.
+"""
+import errno
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+
+import six
+from six.moves import cPickle as pickle #pylint: disable=import-error
+from vigilance import instrumentation
+from vigilance.cache import module_version
+from vigilance.representation import Satisfaction
+
+## Bumped whenever the format of snapshots changes so that stale snapshots are never used.
+FormatVersion = 1
+## The constraint set index recorded for items whose verdicts must never be reused.
+NotReusable = -1
+
+def digest(value):
+    """Computes the compact digest under which the verdicts of an item are recorded.
+    @param value A string or bytes, e.g. the state of a quality item.
+    @returns An 8 byte string.
+    """
+    if isinstance(value, six.text_type):
+        value = value.encode('utf-8')
+    return hashlib.md5(value).digest()[:8]
+
+class SuiteSnapshot(object):
+    """The verdicts of a single quality suite.
+    """
+    def __init__(self, fingerprint, constraintSets=None, verdicts=None):
+        """Creates a new SuiteSnapshot instance.
+        @param fingerprint A string identifying the constraints of the suite as a whole; see Snapshot.fingerprint.
+        @param constraintSets A list of tuples of constraint signatures, one for each distinct set of constraints
+        that applied to an item.
+        @param verdicts A dictionary mapping item digests to tuples of (index into @p constraintSets or NotReusable,
+        tuple of violation messages).
+        """
+        self.fingerprint = fingerprint
+        self.constraintSets = constraintSets if constraintSets is not None else []
+        self.verdicts = verdicts if verdicts is not None else {}
+        self._setIndices = {signatures: index for index, signatures in enumerate(self.constraintSets)}
+
+    def add_constraint_set(self, signatures):
+        """Records a set of constraint signatures.
+        @param signatures A tuple of constraint signatures.
+        @returns The index of the set within constraintSets.
+        """
+        index = self._setIndices.get(signatures)
+        if index is None:
+            index = self._setIndices[signatures] = len(self.constraintSets)
+            self.constraintSets.append(signatures)
+        return index
+
+class Snapshot(object):
+    """The verdicts of a run, keyed by quality suite, together with the baseline that the run reuses verdicts from.
+    Verdicts are only recorded for suites that were checked completely; for all other suites, the verdicts of the
+    baseline are carried over when the snapshot is saved.
+    """
+    def __init__(self, baseline=None):
+        """Creates a new Snapshot instance.
+        @param baseline A dictionary mapping suite keys to the SuiteSnapshot instances of an earlier run, if any.
+        """
+        self.baseline = baseline or {}
+        self.suites = {}
+        self._pending = {}
+
+    @classmethod
+    def load(cls, path):
+        """Loads a snapshot to use as the baseline of a run.
+        A snapshot that does not exist or cannot be read is logged and otherwise ignored, so every item is evaluated.
+        @param path The path of the snapshot file.
+        @returns A Snapshot instance.
+        """
+        try:
+            with open(path, 'rb') as snapshotFile:
+                version, suites = pickle.load(snapshotFile)
+            if version != FormatVersion:
+                raise ValueError('Unsupported snapshot format')
+            baseline = {suiteType: SuiteSnapshot(*suite) for suiteType, suite in six.iteritems(suites)}
+        except (IOError, OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            logging.getLogger(__name__).warning('Unable to read baseline snapshot "%s"; evaluating every item', path)
+            baseline = None
+        return cls(baseline)
+
+    def save(self, path):
+        """Writes the snapshot, replacing the file atomically.
+        Failures to write the snapshot are logged and otherwise ignored.
+        @param path The path of the snapshot file.
+        """
+        suites = dict(self.baseline)
+        suites.update(self.suites)
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            handle, temporaryPath = tempfile.mkstemp(prefix='.vigilance-snapshot-', dir=directory)
+        except (IOError, OSError):
+            logging.getLogger(__name__).warning('Unable to write snapshot "%s"', path)
+            return
+        try:
+            with os.fdopen(handle, 'wb') as snapshotFile:
+                pickle.dump((FormatVersion, {suiteType: (suite.fingerprint, suite.constraintSets, suite.verdicts)
+                                             for suiteType, suite in six.iteritems(suites)}), snapshotFile, pickle.HIGHEST_PROTOCOL)
+            getattr(os, 'replace', os.rename)(temporaryPath, path)
+        except (IOError, OSError):
+            logging.getLogger(__name__).warning('Unable to write snapshot "%s"', path)
+            try:
+                os.remove(temporaryPath)
+            except OSError as ex:
+                if ex.errno != errno.ENOENT:
+                    raise
+
+    @staticmethod
+    def fingerprint(constraints):
+        """Identifies the constraints of a suite as a whole.
+        Items whose digest is unchanged are resolved to the same constraints by constraint sets with equal fingerprints.
+        @param constraints A vigilance.constraint.ConstraintSet instance.
+        @returns A string.
+        """
+        constraintSuite = constraints.constraintSuite
+        modules = sorted(set(constraintType.__module__ for constraintType in constraintSuite.all_types()) | set(['vigilance.constraint']))
+        description = repr((FormatVersion,
+                            [(module, module_version(sys.modules.get(module))) for module in modules],
+                            [(constraintType.__name__, [constraint.signature() for constraint in constraints.globalConstraints[constraintType]])
+                             for constraintType in constraintSuite.all_types()],
+                            [constraint.signature() for constraint in constraints.index.constraints],
+                            [[constraintType.__name__ for constraintType in types] for types in constraints.constraintTypes]))
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def iter_dissatisfactions(self, suiteType, quality, constraints):
+        """Applies constraints to the items of a quality report, reusing the verdicts of the baseline where possible.
+        The verdicts of every item are recorded as they are consumed; call commit once all of them have been.
+        Reports that are not evaluated item by item (see vigilance.representation.QualityReport.evaluates_items), such
+        as columnar reports, are evaluated by their own iter_dissatisfactions instead; nothing is recorded for them,
+        so the baseline verdicts of the suite are kept.
+        @param suiteType The key of the quality suite.
+        @param quality A vigilance.representation.QualityReport instance.
+        @param constraints A vigilance.constraint.ConstraintSet instance.
+        @returns A generator of the failed vigilance.representation.Satisfaction instances, in report order.
+        """
+        if not quality.evaluates_items():
+            self._pending.pop(suiteType, None)
+            for result in quality.iter_dissatisfactions(constraints):
+                yield result
+            return
+        constraints.reset()
+        fingerprint = self.fingerprint(constraints)
+        baseline = self.baseline.get(suiteType)
+        unchanged = baseline is not None and baseline.fingerprint == fingerprint
+        recorded = self._pending[suiteType] = SuiteSnapshot(fingerprint)
+        signatures = {}
+        reused = evaluated = 0
+        for item in quality.items:
+            key = digest(item.state())
+            previous = baseline.verdicts.get(key) if baseline is not None else None
+            if previous is not None and previous[0] != NotReusable and unchanged:
+                setIndex = recorded.add_constraint_set(baseline.constraintSets[previous[0]])
+                messages = previous[1]
+                reused += 1
+            else:
+                applicable = constraints.constraints_for(item)
+                setSignatures = self._signatures(applicable, signatures)
+                if setSignatures is None:
+                    setIndex = NotReusable
+                else:
+                    setIndex = recorded.add_constraint_set(setSignatures)
+                if (previous is not None and previous[0] != NotReusable and setIndex != NotReusable
+                        and baseline.constraintSets[previous[0]] == setSignatures):
+                    messages = previous[1]
+                    reused += 1
+                else:
+                    messages = tuple(result.message for result in (constraint.satisfied_by(item) for constraint in applicable)
+                                     if not result.satisfied)
+                    evaluated += 1
+            recorded.verdicts[key] = (setIndex, messages)
+            for message in messages:
+                yield Satisfaction(False, message)
+        recorder = instrumentation.active()
+        if recorder is not None:
+            span = recorder.get_span('run', suiteType)
+            span.count('reused', reused)
+            span.count('evaluated', evaluated)
+
+    @staticmethod
+    def _signatures(applicable, signatures):
+        """Determines the signatures of a list of constraints, memoizing the signature of each constraint.
+        @returns A tuple of signatures, or None if any of the constraints has no signature.
+        """
+        result = []
+        for constraint in applicable:
+            signature = signatures.get(id(constraint), signatures)
+            if signature is signatures:
+                signature = signatures[id(constraint)] = constraint.signature()
+            if signature is None:
+                return None
+            result.append(signature)
+        return tuple(result)
+
+    def commit(self, suiteType):
+        """Marks the verdicts recorded for a suite as complete, so that they replace those of the baseline.
+        @param suiteType The key of the quality suite.
+        """
+        recorded = self._pending.pop(suiteType, None)
+        if recorded is not None:
+            self.suites[suiteType] = recorded
@@ -3,12 +3,16 @@
 Contains glue that relates all vigilance concepts together into "quality suites".
 These suites can be added by users as plugins and selected via the command line.
 """
-from __future__ import print_function
-import six
+import sys
 
+import six
+from six.moves.collections_abc import Iterator #pylint: disable=import-error
+from vigilance import instrumentation
+from vigilance.cache import module_version
 from vigilance.configuration import ConfigurationParser
-from vigilance.constraint import ConstraintSuite
-from vigilance.error import QualityViolationsDetected
+from vigilance.constraint import ConstraintSet, ConstraintSuite
+from vigilance.error import QualityViolationsDetected, UnknownSuite
+from vigilance.output import TextWriter
 
 class QualitySuite(object):
     """Represents a full set of quality metrics that should be enforced upon a codebase.
@@ -18,8 +22,13 @@ class QualitySuite(object):
     3. Parsers: the translators that turn raw metrics into vigilance-compatible quality items.
     4. Constraints: the requirements for the metrics collected for the various quality items in the codebase.
     5. Configuration stanzas: the configurations necessary for a user to model all of the above in a simple configuration file.
+    Suites may be registered lazily via defer_suite and defer_plugin so that plugin modules are only imported once needed.
     """
     Suites = {}
+    ## Loaders for suites whose keys are known but that have not been loaded yet, keyed by suite key.
+    DeferredSuites = {}
+    ## Loaders for plugins whose suite keys are only known once they have been loaded, in registration order.
+    DeferredPlugins = []
     def __init__(self, suiteType, parser, constraints, configurations):
         self.suiteType = suiteType
         self.reportParser = parser
@@ -27,20 +36,105 @@ class QualitySuite(object):
         stanzas = {key: config(self.constraints) for key, config in six.iteritems(configurations)}
         self.configurationParser = ConfigurationParser(stanzas, self.constraints)
 
-    def run(self, constraints, report):
+    def parse_constraints(self, constraints):
+        """Parses the configured constraints of the suite.
+        @param constraints A list of constraint stanza dictionaries from the vigilance configuration file.
+        @returns A vigilance.constraint.ConstraintSet instance.
+        """
+        return self.configurationParser.parse(constraints)
+
+    def version(self):
+        """Returns a string identifying the versions of all modules that implement the suite.
+        The version changes whenever the parser, constraints or configuration stanzas of the suite change, which
+        allows data produced by the suite (e.g. parsed constraints) to be cached safely.
+        """
+        modules = set(['vigilance.configuration', 'vigilance.constraint', type(self.reportParser).__module__])
+        modules.update(constraintType.__module__ for constraintType in self.constraints.all_types())
+        modules.update(type(stanza).__module__ for stanza in six.itervalues(self.configurationParser.stanzas))
+        return ';'.join('{}={}'.format(module, module_version(sys.modules.get(module))) for module in sorted(modules))
+
+    def parse_report(self, report, options=None, cache=None, scope=None, lazy=False): #pylint: disable=too-many-arguments
+        """Parses a quality report with the suite's parser.
+        @param report The quality report source; see vigilance.parser.Parser.parse_report for the accepted types.
+        @param options A dictionary of parser options for the suite, if any.
+        @param cache A vigilance.cache.ReportCache instance; if provided, previously parsed reports are loaded from it.
+        @param scope A vigilance.scope.ChangedFiles instance restricting the report to a change, if any.
+        Scoped reports are never cached, since they only contain part of the report, and neither are reports that
+        the parser does not consider cacheable; see vigilance.parser.Parser.is_cacheable.
+        @param lazy Whether the report may be parsed on demand as its items are consumed; see vigilance.parser.Parser.parse_report.
+        Lazily parsed reports are written to the cache as their items are consumed, and only once all of them have been.
+        @returns A vigilance.representation.QualityReport instance.
+        """
+        options = options or {}
+        if scope is not None:
+            return self.reportParser.parse_report(report, scope=scope, lazy=lazy, **options)
+        key = cache.key(self.reportParser, report, options) if cache is not None and self.reportParser.is_cacheable(report) else None
+        if key is None:
+            return self.reportParser.parse_report(report, lazy=lazy, **options)
+        quality = cache.load(key)
+        if quality is None:
+            quality = self.reportParser.parse_report(report, lazy=lazy, **options)
+            if isinstance(quality.items, Iterator):
+                quality.items = cache.stream(key, quality.items)
+            else:
+                cache.store(key, quality)
+        return quality
+
+    def run(self, constraints, report, options=None, output=None, cache=None, scope=None, limit=None, writer=None, snapshot=None): #pylint: disable=too-many-arguments
         """Runs the quality suite with the provided configuration on the provided quality report.
-        @param constraints A dictionary containing the configured constraints for the suite.
-        @param report The string contents of the quality report.
+        The report is parsed, checked and reported on as a stream: violations are handed to the writer as soon as they
+        are found, and neither the report nor its violations are held in memory as a whole (unless the parser does not
+        support lazy parsing). While instrumentation is recording, the phases of the run are recorded as spans of the
+        suite; see vigilance.instrumentation.
+        @param constraints A dictionary containing the configured constraints for the suite, or a
+        vigilance.constraint.ConstraintSet previously returned by parse_constraints.
+        @param report The quality report source; see vigilance.parser.Parser.parse_report for the accepted types.
+        @param options A dictionary of parser options for the suite, if any.
+        @param output The file object that results should be written to if no writer is given; defaults to stdout.
+        @param cache A vigilance.cache.ReportCache instance used to avoid re-parsing unchanged reports, if any.
+        @param scope A vigilance.scope.ChangedFiles instance; if provided, only the items affected by the change are checked.
+        @param limit The maximum number of violations to report. Once reached, the rest of the report is only parsed
+        and checked as far as needed to tell whether there are further violations.
+        @param writer The vigilance.output.ResultWriter that results are reported with; defaults to a
+        vigilance.output.TextWriter writing to output.
+        @param snapshot A vigilance.snapshot.Snapshot instance; if provided, the verdicts of its baseline are reused
+        for unchanged items and the verdicts of this run are recorded in it. Runs that are scoped or truncated by the
+        limit check only part of the report, so they leave the recorded verdicts of the suite unchanged.
         @throws vigilance.error.QualityViolationsDetected
         """
-        constraints = self.configurationParser.parse(constraints)
-        quality = self.reportParser.parse(report)
-        dissatisfactions = quality.scrutinize(constraints)
-        for failure in dissatisfactions:
-            print(failure.message)
-        if dissatisfactions:
+        writer = writer if writer is not None else TextWriter(output)
+        with instrumentation.suite(self.suiteType), instrumentation.span('run') as runSpan:
+            if not isinstance(constraints, ConstraintSet):
+                with instrumentation.span('configuration'):
+                    constraints = self.parse_constraints(constraints)
+            with instrumentation.span('load report'):
+                quality = self.parse_report(report, options, cache, scope, lazy=True)
+            reportViolation = writer.violation
+            recorder = instrumentation.active()
+            if recorder is not None:
+                reportViolation = recorder.timed('output', reportViolation)
+            if snapshot is not None:
+                failures = snapshot.iter_dissatisfactions(self.suiteType, quality, constraints)
+            else:
+                failures = quality.iter_dissatisfactions(constraints)
+            violations = 0
+            truncated = False
+            failures = iter(failures)
+            try:
+                for failure in failures:
+                    reportViolation(self.suiteType, failure.message)
+                    violations += 1
+                    if violations == limit:
+                        truncated = next(failures, None) is not None
+                        break
+            finally:
+                quality.close()
+            if snapshot is not None and scope is None and not truncated:
+                snapshot.commit(self.suiteType)
+            writer.finish_suite(self.suiteType, violations, limit if truncated else None)
+            runSpan.count('violations', violations)
+        if violations:
             raise QualityViolationsDetected('One or more quality violations detected')
-        print('Quality validation complete for {}'.format(self.suiteType))
 
     @classmethod
     def add_suite(cls, key, parser, constraints, configurations):
@@ -55,18 +149,66 @@ class QualitySuite(object):
         @see vigilance.configuration.ConfigurationStanza
         @see vigilance.constraint.Constraint
         """
-        if key in cls.Suites:
+        if key in cls.Suites or key in cls.DeferredSuites:
             raise ValueError('Quality suite "{}" already exists'.format(key))
         cls.Suites[key] = QualitySuite(key, parser, constraints, configurations)
 
+    @classmethod
+    def defer_suite(cls, key, loader):
+        """Adds a quality suite to the vigilance registry without loading it.
+        @param cls
+        @param key The string identifier of the quality suite.
+        @param loader A callable taking no arguments that loads the suite (i.e. calls add_suite for @p key) when it is first used.
+        @throws ValueError if @p key is already in use.
+        """
+        if key in cls.Suites or key in cls.DeferredSuites:
+            raise ValueError('Quality suite "{}" already exists'.format(key))
+        cls.DeferredSuites[key] = loader
+
+    @classmethod
+    def defer_plugin(cls, loader):
+        """Adds a loader for quality suites whose keys cannot be known without loading them.
+        Deferred plugins are only loaded once a suite is requested that is not otherwise known.
+        @param cls
+        @param loader A callable taking no arguments that registers any number of suites via add_suite or defer_suite.
+        """
+        cls.DeferredPlugins.append(loader)
+
+    @classmethod
+    def _load_deferred_plugins(cls):
+        while cls.DeferredPlugins:
+            cls.DeferredPlugins.pop(0)()
+
+    @classmethod
+    def has_suite(cls, key):
+        """Determines whether a quality suite is available without loading any suite whose key is already known.
+        @param cls
+        @param key The string identifier of the quality suite.
+        @returns True if the suite is available (though possibly not yet loaded).
+        """
+        if key not in cls.Suites and key not in cls.DeferredSuites:
+            cls._load_deferred_plugins()
+        return key in cls.Suites or key in cls.DeferredSuites
+
     @classmethod
     def available_suites(cls):
         """Returns a list of all available quality suite names.
+        Plugins whose suite keys are unknown are loaded; suites whose keys are known are not.
         """
-        return list(cls.Suites.keys())
+        cls._load_deferred_plugins()
+        return list(cls.Suites.keys()) + list(cls.DeferredSuites.keys())
 
     @classmethod
     def get_suite(cls, key):
-        """Returns the QualitySuite associated with @p key.
+        """Returns the QualitySuite associated with @p key, loading it first if necessary.
+        @throws vigilance.error.UnknownSuite if no suite is available for @p key.
         """
-        return cls.Suites[key]
+        if not cls.has_suite(key):
+            raise UnknownSuite('Quality suite "{}" is not available'.format(key))
+        loader = cls.DeferredSuites.pop(key, None)
+        if loader is not None:
+            loader()
+        try:
+            return cls.Suites[key]
+        except KeyError:
+            raise UnknownSuite('Quality suite "{}" could not be loaded'.format(key))